@@ -0,0 +1,5 @@
+import os
+
+# Benchmarks bring their own SQLite databases. Importing the app would otherwise create and
+# backfill ./raid_manager.db, so default it to an in-memory database before anything imports backend.db.
+os.environ.setdefault("RAID_MANAGER_DATABASE_URL", "sqlite://")
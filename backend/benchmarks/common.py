@@ -0,0 +1,105 @@
+from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, List, Optional
+import json
+import math
+import os
+import statistics
+
+from ..db import dependencies
+from ..db.async_database import ThreadPoolSession
+from ..services import gear_calculation, loot_planner, recommendations, reference_data
+
+def parse_size(size: str) -> int:
+    # "10k" -> 10000, "1m" -> 1000000
+    size = size.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(size[-1:], 1)
+    return int(float(size.rstrip("km")) * multiplier)
+
+def configure_app(engine):
+    """
+    Returns a new app with its request sessions bound to the given engine.
+    The in-process caches are cleared, since they may hold data of another database.
+    """
+    from ..main import create_app
+
+    # The warmup ranks the drops of the app's own database, not of this engine
+    recommendations.WARMUP = False
+    app = create_app()
+
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    async def get_db():
+        db = ThreadPoolSession(session_factory())
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+    app.dependency_overrides[dependencies.get_db] = get_db
+    reference_data.invalidate_items()
+    reference_data.invalidate_jobs()
+    reference_data.invalidate_raid_parties()
+    gear_calculation.invalidate_bis_needs()
+    loot_planner.invalidate_plan()
+    recommendations.invalidate_raid_party()
+    return app
+
+def make_client(engine):
+    from fastapi.testclient import TestClient
+    return TestClient(configure_app(engine))
+
+def percentile(sorted_samples: List[float], fraction: float) -> float:
+    # Nearest-rank percentile of already sorted samples
+    index = max(0, math.ceil(fraction * len(sorted_samples)) - 1)
+    return sorted_samples[index]
+
+def summarize(samples_ms: List[float]) -> Dict[str, Any]:
+    samples = sorted(samples_ms)
+    return {
+        "rounds": len(samples),
+        "min_ms": round(samples[0], 3),
+        "max_ms": round(samples[-1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "stddev_ms": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+    }
+
+def save_results(path: str, results: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+def load_results(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(
+    results: Dict[str, Dict[str, Dict[str, Any]]],
+    baseline: Dict[str, Dict[str, Dict[str, Any]]],
+    metric: str,
+    threshold: float
+) -> List[str]:
+    """
+    Compares results[group][name][metric] with the baseline and returns a line per measurement,
+    marking those that are more than `threshold` times slower as regressions.
+    """
+    lines = []
+    for group, measurements in results.items():
+        for name, result in measurements.items():
+            previous = baseline.get(group, {}).get(name)
+            if previous is None or metric not in previous or metric not in result:
+                continue
+            ratio = result[metric] / previous[metric] if previous[metric] else math.inf
+            status = "REGRESSION" if ratio > threshold else "ok"
+            lines.append(f"{status:10} {group:>8} {name:60} {previous[metric]:10.2f} -> {result[metric]:10.2f} ({ratio:.2f}x)")
+    return lines
@@ -0,0 +1,220 @@
+"""
+Load test of the raid-night hot paths: recipient recommendation, eat-and-go eligibility,
+chest assignment and loot recording, each alone and as a mix, with concurrent clients.
+Run from the repository root:
+
+    python -m backend.benchmarks.load_test
+    python -m backend.benchmarks.load_test --uvicorn --concurrency 32
+    python -m backend.benchmarks.load_test --save backend/benchmarks/baselines/load_test.json
+    python -m backend.benchmarks.load_test --compare backend/benchmarks/baselines/load_test.json
+
+By default the app runs in-process; --uvicorn starts it in a local uvicorn process instead.
+Every run works on a fresh copy of the cached synthetic database, so writes do not accumulate between runs.
+Queries per request are counted in a separate sequential pass, in-process only.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from typing import Any, Callable, Dict, Optional, Tuple
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+from . import common, synthetic
+from ..models import Item, ItemSource, Player, DistributionMethod
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "load_test.json")
+
+# Share of each scenario in the mixed phase, roughly what a raid night looks like:
+# many lookups while the chest is discussed, one write per item handed out
+MIXED_WEIGHTS = {
+    "recommend_recipient": 0.5,
+    "eat_and_go_eligibility": 0.2,
+    "assign_chest": 0.1,
+    "create_loot_record": 0.2,
+}
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]] # method, path, JSON body
+
+class Scenarios:
+    """Builds random requests against the parties, players and savage items of the database."""
+
+    def __init__(self, engine, seed: int):
+        self.rnd = random.Random(seed)
+        with sessionmaker(bind=engine)() as db:
+            self.party_player_ids = {}
+            for player_id, raid_party_id in db.query(Player.id, Player.raid_party_id).all():
+                self.party_player_ids.setdefault(raid_party_id, []).append(player_id)
+            self.item_ids = [item_id for item_id, in db.query(Item.id).filter(Item.source == ItemSource.SAVAGE_RAID).all()]
+        self.raid_party_ids = sorted(self.party_player_ids)
+
+    def recommend_recipient(self) -> Request:
+        return "GET", f"/distribution/recommend_recipient/{self.rnd.choice(self.raid_party_ids)}/{self.rnd.choice(self.item_ids)}", None
+
+    def eat_and_go_eligibility(self) -> Request:
+        raid_party_id = self.rnd.choice(self.raid_party_ids)
+        player_id = self.rnd.choice(self.party_player_ids[raid_party_id])
+        return "GET", f"/loot_records/eat_and_go_eligibility/{player_id}/{self.rnd.choice(self.item_ids)}/{raid_party_id}", None
+
+    def assign_chest(self) -> Request:
+        # A savage chest drops a few items at once; assignment only, nothing is recorded
+        item_ids = self.rnd.sample(self.item_ids, min(4, len(self.item_ids)))
+        return "POST", f"/distribution/assign_chest/{self.rnd.choice(self.raid_party_ids)}", {"item_ids": item_ids}
+
+    def create_loot_record(self) -> Request:
+        raid_party_id = self.rnd.choice(self.raid_party_ids)
+        return "POST", "/loot_records/", {
+            "player_id": self.rnd.choice(self.party_player_ids[raid_party_id]),
+            "item_id": self.rnd.choice(self.item_ids),
+            "raid_party_id": raid_party_id,
+            "distribution_method": DistributionMethod.PRIORITY.value,
+        }
+
+    def mixed(self) -> Request:
+        names = list(MIXED_WEIGHTS)
+        name = self.rnd.choices(names, weights=[MIXED_WEIGHTS[name] for name in names])[0]
+        return getattr(self, name)()
+
+SCENARIOS = list(MIXED_WEIGHTS) + ["mixed"]
+
+async def run_phase(client, make_request: Callable[[], Request], requests: int, concurrency: int) -> Dict[str, Any]:
+    # requests are built up front, so generating them is not part of the measured time
+    pending = [make_request() for _ in range(requests)]
+    pending.reverse()
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            method, path, body = pending.pop()
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = common.summarize(latencies)
+    result["errors"] = errors
+    result["throughput_rps"] = round(len(latencies) / elapsed, 1)
+    return result
+
+def count_queries(app, engine, make_request: Callable[[], Request], requests: int) -> float:
+    # Sequential, so that every statement executed belongs to the current request
+    from fastapi.testclient import TestClient
+
+    statements = [0]
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        with TestClient(app) as client:
+            for _ in range(requests):
+                method, path, body = make_request()
+                client.request(method, path, json=body)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return round(statements[0] / requests, 2)
+
+def _start_uvicorn(database_path: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, RAID_MANAGER_DATABASE_URL=f"sqlite:///{database_path}")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "backend.main:create_app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    import httpx
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+async def run(args) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    source_path = synthetic.build_database(args.data_dir, common.parse_size(args.size), seed=args.seed)
+    run_path = os.path.join(args.data_dir, "load_test_run.db")
+    for leftover in (run_path, run_path + "-wal", run_path + "-shm"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    shutil.copyfile(source_path, run_path)
+    engine = synthetic.create_engine_for(run_path)
+
+    process = None
+    if args.uvicorn:
+        process = _start_uvicorn(run_path, args.port)
+        app = None
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60)
+    else:
+        app = common.configure_app(engine)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60)
+
+    results = {}
+    try:
+        for name in args.scenarios:
+            scenarios = Scenarios(engine, args.seed)
+            make_request = getattr(scenarios, name)
+            await run_phase(client, make_request, args.warmup, args.concurrency)
+            result = await run_phase(client, make_request, args.requests, args.concurrency)
+            result["queries_per_request"] = count_queries(app, engine, make_request, args.query_sample) if app is not None else None
+            results[name] = result
+            print(
+                f"{name:24} {result['throughput_rps']:8.1f} req/s  p50 {result['median_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                f"p99 {result['p99_ms']:8.2f} ms  errors {result['errors']:4}  queries {result['queries_per_request']}"
+            )
+    finally:
+        await client.aclose()
+        engine.dispose()
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.load_test", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="100k", help="Loot records in the synthetic database")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--query-sample", type=int, default=50, help="Requests per scenario in the query count pass")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=".benchmarks")
+    parser.add_argument("--uvicorn", action="store_true", help="Run the app in a local uvicorn process")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--save", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", nargs="?", const=DEFAULT_BASELINE, help="Compare p95 latencies with saved results")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    results = {args.size: asyncio.run(run(args))}
+    if args.save:
+        common.save_results(args.save, results)
+
+    if args.compare:
+        baseline = common.load_results(args.compare)
+        if baseline is None:
+            parser.error(f"No results at {args.compare}")
+        lines = common.compare_results(results, baseline, "p95_ms", args.threshold)
+        print("\n".join(lines))
+        if any(line.startswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Latency of every /statistics/ endpoint on synthetic SQLite databases of increasing size.
+Run from the repository root:
+
+    python -m backend.benchmarks.statistics_benchmark --sizes 10k 100k 1m
+    python -m backend.benchmarks.statistics_benchmark --save baseline.json
+    python -m backend.benchmarks.statistics_benchmark --compare baseline.json
+
+Databases are generated once under --data-dir and reused by later runs.
+With --compare, the exit status is 1 if an endpoint's median got slower than --threshold times the baseline.
+"""
+import argparse
+import sys
+import time
+
+from . import common, synthetic
+
+DEFAULT_SIZES = ["10k", "100k", "1m"]
+
+# Paths relative to a database; {raid_party_id} is filled with an existing party
+ENDPOINTS = [
+    "/statistics/total_items_per_raid_party",
+    "/statistics/total_items_per_player",
+    "/statistics/total_items_per_player?raid_party_id={raid_party_id}",
+    "/statistics/items_per_type_and_slot",
+    "/statistics/weekly_distribution_per_player",
+    "/statistics/weekly_distribution_per_player?raid_party_id={raid_party_id}",
+    "/statistics/analytics/counts?group_by=raid_party_id&group_by=week_number",
+    "/statistics/analytics/counts?group_by=category&group_by=slot",
+    "/statistics/analytics/weekly_series",
+    "/statistics/analytics/weekly_series?raid_party_id={raid_party_id}",
+    "/statistics/analytics/fairness",
+    "/statistics/analytics/time_to_bis?raid_party_id={raid_party_id}",
+]
+
+def benchmark_endpoint(client, path: str, rounds: int, warmup: int):
+    for _ in range(warmup):
+        response = client.get(path)
+        if response.status_code != 200:
+            return None, response
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return common.summarize(samples), response
+
+def run(sizes, rounds: int, warmup: int, data_dir: str, seed: int):
+    results = {}
+    for size in sizes:
+        loot_records = common.parse_size(size)
+        started = time.perf_counter()
+        engine = synthetic.get_database(data_dir, loot_records, seed=seed)
+        print(f"# {size}: {loot_records} loot records, database ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        client = common.make_client(engine)
+        results[size] = {}
+        for endpoint in ENDPOINTS:
+            path = endpoint.format(raid_party_id=1)
+            summary, response = benchmark_endpoint(client, path, rounds, warmup)
+            if summary is None:
+                # e.g. 503 from the analytics routes without NumPy
+                print(f"{size:>6} {path:70} skipped: {response.status_code} {response.text[:80]}", file=sys.stderr)
+                continue
+            results[size][path] = summary
+            print(f"{size:>6} {path:70} median {summary['median_ms']:9.2f} ms  p95 {summary['p95_ms']:9.2f} ms  max {summary['max_ms']:9.2f} ms")
+        engine.dispose()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.statistics_benchmark", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Loot records per database, e.g. 10k 100k 1m")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=".benchmarks")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the medians with a saved result")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.rounds, args.warmup, args.data_dir, args.seed)
+    if args.save:
+        common.save_results(args.save, results)
+
+    if args.compare:
+        baseline = common.load_results(args.compare)
+        if baseline is None:
+            parser.error(f"No results at {args.compare}")
+        lines = common.compare_results(results, baseline, "median_ms", args.threshold)
+        print("\n".join(lines))
+        if any(line.startswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
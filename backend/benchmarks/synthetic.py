@@ -0,0 +1,208 @@
+"""
+Synthetic raid data for benchmarks and load tests: users, jobs, an item catalog, raid parties of
+players with starting and BiS gear sets, item priorities and a loot history spread over past weeks.
+Generation is deterministic for a given seed, and databases are cached as SQLite files by their parameters.
+"""
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, Iterator, List, Optional
+from datetime import datetime, timedelta
+import os
+import random
+
+from ..db.database import get_engine_options, configure_engine
+from ..models import (
+    Base, User, Job, JobRole, Item, ItemCategory, ItemSlot, ItemSource, RaidParty, Player,
+    GearSet, GearSetItem, GearSetType, PlayerItemPriority, LootRecord, DistributionMethod,
+)
+from ..crud import loot_record
+
+JOBS = [
+    ("PLD", JobRole.TANK), ("WAR", JobRole.TANK), ("DRK", JobRole.TANK), ("GNB", JobRole.TANK),
+    ("WHM", JobRole.HEALER), ("SCH", JobRole.HEALER), ("AST", JobRole.HEALER), ("SGE", JobRole.HEALER),
+    ("MNK", JobRole.MELEE_DPS), ("DRG", JobRole.MELEE_DPS), ("NIN", JobRole.MELEE_DPS), ("SAM", JobRole.MELEE_DPS),
+    ("RPR", JobRole.MELEE_DPS), ("VPR", JobRole.MELEE_DPS),
+    ("BRD", JobRole.RANGED_DPS), ("MCH", JobRole.RANGED_DPS), ("DNC", JobRole.RANGED_DPS),
+    ("BLM", JobRole.CASTER_DPS), ("SMN", JobRole.CASTER_DPS), ("RDM", JobRole.CASTER_DPS), ("PCT", JobRole.CASTER_DPS),
+]
+
+# Light party compositions, cycled through the players of a party
+PARTY_ROLES = [JobRole.TANK, JobRole.TANK, JobRole.HEALER, JobRole.HEALER, JobRole.MELEE_DPS, JobRole.MELEE_DPS, JobRole.RANGED_DPS, JobRole.CASTER_DPS]
+
+ARMOR_SLOTS = {ItemSlot.HEAD, ItemSlot.BODY, ItemSlot.HANDS, ItemSlot.LEGS, ItemSlot.FEET}
+STARTING_SOURCES = [ItemSource.TOMESTONE, ItemSource.CRAFTED]
+BIS_SOURCES = [ItemSource.SAVAGE_RAID, ItemSource.AUGMENTED_TOMESTONE]
+
+INSERT_CHUNK_SIZE = 50000
+
+def default_party_count(loot_records: int) -> int:
+    # Hundreds of parties at every size: 100 for 10k records, 250 for 100k, 500 for 1M
+    return max(100, min(500, loot_records // 400))
+
+def _category(slot: ItemSlot) -> ItemCategory:
+    if slot == ItemSlot.WEAPON:
+        return ItemCategory.WEAPON
+    if slot in ARMOR_SLOTS:
+        return ItemCategory.ARMOR
+    return ItemCategory.ACCESSORY
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int = INSERT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def populate(
+    db,
+    parties: int,
+    loot_records: int,
+    players_per_party: int = 8,
+    weeks: int = 52,
+    seed: int = 0,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Inserts a complete synthetic data set into an empty database with executemany inserts and explicit ids,
+    then rebuilds the tables derived from the loot history. Returns a summary of what was created.
+    """
+    rnd = random.Random(seed)
+    now = now or datetime.utcnow()
+
+    jobs = [{"id": job_id, "name": name, "role": role} for job_id, (name, role) in enumerate(JOBS, start=1)]
+    jobs_by_role = {}
+    for job in jobs:
+        jobs_by_role.setdefault(job["role"], []).append(job["id"])
+    db.execute(insert(Job), jobs)
+
+    items = []
+    for source in STARTING_SOURCES + BIS_SOURCES:
+        for slot in ItemSlot:
+            items.append({
+                "id": len(items) + 1,
+                "name": f"{source.name.lower()} {slot.name.lower()}",
+                "category": _category(slot),
+                "slot": slot,
+                "source": source,
+            })
+    db.execute(insert(Item), items)
+    items_by_source_and_slot = {(item["source"], item["slot"]): item["id"] for item in items}
+    savage_item_ids = [item["id"] for item in items if item["source"] == ItemSource.SAVAGE_RAID]
+
+    db.execute(insert(RaidParty), [{"id": party_id, "name": f"Party {party_id}"} for party_id in range(1, parties + 1)])
+
+    users, players, gear_sets, gear_set_items, priorities = [], [], [], [], []
+    party_player_ids = {}
+    for party_id in range(1, parties + 1):
+        for index in range(players_per_party):
+            player_id = len(players) + 1
+            users.append({"id": player_id, "username": f"user{player_id}", "email": f"user{player_id}@example.com", "hashed_password": "password"})
+            players.append({
+                "id": player_id,
+                "user_id": player_id,
+                "job_id": rnd.choice(jobs_by_role[PARTY_ROLES[index % len(PARTY_ROLES)]]),
+                "raid_party_id": party_id,
+                "character_nickname": f"Player {player_id}",
+            })
+            party_player_ids.setdefault(party_id, []).append(player_id)
+
+            # Starting set from tomestone and crafted gear, BiS from savage and augmented tomestone gear,
+            # so every BiS item is needed
+            for set_type, sources in ((GearSetType.STARTING, STARTING_SOURCES), (GearSetType.BIS, BIS_SOURCES)):
+                gear_set_id = len(gear_sets) + 1
+                gear_sets.append({"id": gear_set_id, "player_id": player_id, "set_type": set_type})
+                for slot in ItemSlot:
+                    gear_set_items.append({
+                        "id": len(gear_set_items) + 1,
+                        "gear_set_id": gear_set_id,
+                        "item_id": items_by_source_and_slot[(rnd.choice(sources), slot)],
+                    })
+
+        # Priorities for half of the savage items, ordering the whole party
+        for item_id in rnd.sample(savage_item_ids, len(savage_item_ids) // 2):
+            for order, player_id in enumerate(rnd.sample(party_player_ids[party_id], players_per_party), start=1):
+                priorities.append({
+                    "id": len(priorities) + 1,
+                    "player_id": player_id,
+                    "item_id": item_id,
+                    "raid_party_id": party_id,
+                    "priority_order": order,
+                })
+
+    for model, rows in ((User, users), (Player, players), (GearSet, gear_sets), (GearSetItem, gear_set_items), (PlayerItemPriority, priorities)):
+        for chunk in _chunks(iter(rows)):
+            db.execute(insert(model), chunk)
+
+    # Loot history, spread evenly over the parties and uniformly over the past weeks
+    start = now - timedelta(weeks=weeks)
+    history_seconds = weeks * 7 * 24 * 3600
+    def loot_rows():
+        for record_id in range(1, loot_records + 1):
+            party_id = (record_id - 1) % parties + 1
+            yield {
+                "id": record_id,
+                "player_id": rnd.choice(party_player_ids[party_id]),
+                "item_id": rnd.choice(savage_item_ids),
+                "raid_party_id": party_id,
+                "distribution_date": start + timedelta(seconds=rnd.uniform(0, history_seconds)),
+                "distribution_method": DistributionMethod.PRIORITY if rnd.random() < 0.7 else DistributionMethod.EAT_AND_GO,
+            }
+    for chunk in _chunks(loot_rows()):
+        db.execute(insert(LootRecord), chunk)
+    db.commit()
+
+    loot_record.rebuild_weekly_lockouts(db)
+    loot_record.rebuild_eat_and_go_cycles(db)
+    loot_record.rebuild_loot_rollups(db)
+
+    return {
+        "parties": parties,
+        "players": len(players),
+        "items": len(items),
+        "gear_sets": len(gear_sets),
+        "priorities": len(priorities),
+        "loot_records": loot_records,
+        "weeks": weeks,
+        "seed": seed,
+    }
+
+def create_engine_for(path: str):
+    # Same engine options and SQLite pragmas as the app
+    url = f"sqlite:///{path}"
+    return configure_engine(create_engine(url, **get_engine_options(url)))
+
+def build_database(
+    data_dir: str,
+    loot_records: int,
+    parties: Optional[int] = None,
+    players_per_party: int = 8,
+    weeks: int = 52,
+    seed: int = 0
+) -> str:
+    """
+    Returns the path of a synthetic SQLite database with these parameters,
+    generating it under data_dir unless a previous run already did.
+    """
+    parties = parties or default_party_count(loot_records)
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"loot{loot_records}_parties{parties}_players{players_per_party}_weeks{weeks}_seed{seed}.db")
+    if not os.path.exists(path):
+        # Built under a temporary name, so an interrupted run does not leave a partial database behind
+        building_path = path + ".building"
+        for leftover in (building_path, building_path + "-wal", building_path + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        engine = create_engine_for(building_path)
+        Base.metadata.create_all(engine)
+        with sessionmaker(bind=engine)() as db:
+            populate(db, parties, loot_records, players_per_party, weeks, seed)
+        engine.dispose()
+        os.replace(building_path, path)
+    return path
+
+def get_database(data_dir: str, loot_records: int, **options):
+    # Engine for build_database; only for reading, as writes would change the cached database
+    return create_engine_for(build_database(data_dir, loot_records, **options))
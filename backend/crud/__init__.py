@@ -0,0 +1,9 @@
+from . import gear_set
+from . import item
+from . import job
+from . import loot_record
+from . import player
+from . import player_item_priority
+from . import raid_party
+from . import raid_schedule
+from . import user
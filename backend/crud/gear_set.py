@@ -1,20 +1,69 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 from ..models.gear_set import GearSet, GearSetItem, GearSetType
+from ..models.player import Player
 from ..schemas.gear_set import GearSetCreate
+from ..services import gear_calculation, listing, recommendations
+from ..db.unit_of_work import after_commit
+
+# The items of schemas.GearSet, in one extra query for all loaded sets
+GEAR_SET_LOAD_OPTIONS = (selectinload(GearSet.gear_set_items).joinedload(GearSetItem.item),)
+
+def get_gear_set(db: Session, gear_set_id: int):
+    return db.query(GearSet).options(*GEAR_SET_LOAD_OPTIONS).filter(GearSet.id == gear_set_id).first()
 
 def get_gear_set_by_player_and_type(db: Session, player_id: int, set_type: GearSetType):
     return db.query(GearSet).filter(GearSet.player_id == player_id, GearSet.set_type == set_type).first()
 
 def create_gear_set(db: Session, gear_set: GearSetCreate):
-    db_gear_set = GearSet(player_id=gear_set.player_id, set_type=gear_set.set_type)
+    # The set and its items are inserted in a single flush
+    db_gear_set = GearSet(
+        player_id=gear_set.player_id,
+        set_type=gear_set.set_type,
+        gear_set_items=[GearSetItem(item_id=item_data.item_id) for item_data in gear_set.items]
+    )
     db.add(db_gear_set)
-    db.commit()
-    db.refresh(db_gear_set)
-
-    for item_data in gear_set.items:
-        db_gear_set_item = GearSetItem(gear_set_id=db_gear_set.id, item_id=item_data.item_id)
-        db.add(db_gear_set_item)
-    db.commit()
-    db.refresh(db_gear_set)
+    db.flush()
+    after_commit(db, gear_calculation.invalidate_bis_needs, db_gear_set.player_id)
+    # BiS needs count for every item the raid party ranks the player for
+    after_commit(db, recommendations.invalidate_raid_party, db_gear_set.player.raid_party_id)
 
     return db_gear_set
+
+def create_gear_sets(db: Session, gear_sets: List[GearSetCreate]) -> List[GearSet]:
+    # The sets and then all of their items are each inserted in one batch
+    db_gear_sets = [
+        GearSet(
+            player_id=gear_set.player_id,
+            set_type=gear_set.set_type,
+            gear_set_items=[GearSetItem(item_id=item_data.item_id) for item_data in gear_set.items]
+        )
+        for gear_set in gear_sets
+    ]
+    db.add_all(db_gear_sets)
+    db.flush()
+    player_ids = {db_gear_set.player_id for db_gear_set in db_gear_sets}
+    for player_id in player_ids:
+        after_commit(db, gear_calculation.invalidate_bis_needs, player_id)
+    if player_ids:
+        raid_party_ids = db.query(Player.raid_party_id).filter(Player.id.in_(player_ids)).distinct().all()
+        for raid_party_id, in raid_party_ids:
+            after_commit(db, recommendations.invalidate_raid_party, raid_party_id)
+    return db_gear_sets
+
+def get_gear_sets_page(
+    db: Session,
+    player_id: Optional[int] = None,
+    set_type: Optional[GearSetType] = None,
+    cursor: Optional[str] = None,
+    limit: int = listing.DEFAULT_PAGE_SIZE,
+    load_relationships: bool = True
+):
+    filters = []
+    if player_id is not None:
+        filters.append(GearSet.player_id == player_id)
+    if set_type is not None:
+        filters.append(GearSet.set_type == set_type)
+    # Lean responses still need the item ids of each set
+    options = GEAR_SET_LOAD_OPTIONS if load_relationships else (selectinload(GearSet.gear_set_items),)
+    return listing.get_page(db, GearSet, filters, cursor, limit, options)
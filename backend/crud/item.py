@@ -1,6 +1,10 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from ..models.item import Item
+from typing import List, Optional
+from ..models.item import Item, ItemCategory, ItemSlot, ItemSource
 from ..schemas.item import ItemCreate
+from ..services import listing, reference_data
+from ..db.unit_of_work import after_commit
 
 def get_item_by_name(db: Session, name: str):
     return db.query(Item).filter(Item.name == name).first()
@@ -8,6 +12,32 @@ def get_item_by_name(db: Session, name: str):
 def create_item(db: Session, item: ItemCreate):
     db_item = Item(**item.dict())
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    db.flush()
+    after_commit(db, reference_data.invalidate_items)
     return db_item
+
+def create_items(db: Session, items: List[ItemCreate]):
+    # Single executemany insert; the caller has already checked the names
+    if items:
+        db.execute(insert(Item), [item.dict() for item in items])
+        after_commit(db, reference_data.invalidate_items)
+
+def get_items_page(
+    db: Session,
+    name: Optional[str] = None,
+    category: Optional[ItemCategory] = None,
+    slot: Optional[ItemSlot] = None,
+    source: Optional[ItemSource] = None,
+    cursor: Optional[str] = None,
+    limit: int = listing.DEFAULT_PAGE_SIZE
+):
+    filters = []
+    if name is not None:
+        filters.append(Item.name == name)
+    if category is not None:
+        filters.append(Item.category == category)
+    if slot is not None:
+        filters.append(Item.slot == slot)
+    if source is not None:
+        filters.append(Item.source == source)
+    return listing.get_page(db, Item, filters, cursor, limit)
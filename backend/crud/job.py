@@ -1,6 +1,9 @@
 from sqlalchemy.orm import Session
-from ..models.job import Job
+from typing import Optional
+from ..models.job import Job, JobRole
 from ..schemas.job import JobCreate
+from ..services import listing, reference_data
+from ..db.unit_of_work import after_commit
 
 def get_job_by_name(db: Session, name: str):
     return db.query(Job).filter(Job.name == name).first()
@@ -8,6 +11,14 @@ def get_job_by_name(db: Session, name: str):
 def create_job(db: Session, job: JobCreate):
     db_job = Job(name=job.name, role=job.role)
     db.add(db_job)
-    db.commit()
-    db.refresh(db_job)
+    db.flush()
+    after_commit(db, reference_data.invalidate_jobs)
     return db_job
+
+def get_jobs_page(db: Session, name: Optional[str] = None, role: Optional[JobRole] = None, cursor: Optional[str] = None, limit: int = listing.DEFAULT_PAGE_SIZE):
+    filters = []
+    if name is not None:
+        filters.append(Job.name == name)
+    if role is not None:
+        filters.append(Job.role == role)
+    return listing.get_page(db, Job, filters, cursor, limit)
@@ -1,58 +1,361 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, Iterable, List, Optional, Set
 from ..models.loot_record import LootRecord
 from ..schemas.loot_record import LootRecordCreate
 from ..models.player import Player
+from ..models.weekly_lockout import PlayerWeeklyLockout
+from ..models.eat_and_go_cycle import EatAndGoCycleMember
+from ..models.item import Item
+from ..models.loot_rollup import LootWeeklyPlayerCount, LootItemTypeCount
+from ..services import gear_calculation, listing, loot_feed, recommendations, reference_data
+from ..db.unit_of_work import after_commit
+from .player import PLAYER_LOAD_OPTIONS
+from .raid_party import RAID_PARTY_LOAD_OPTIONS
 from datetime import datetime, timedelta
 
+# Weekly reset is on Tuesday 08:00 UTC; week numbers count resets since this one
+WEEK_NUMBER_EPOCH = datetime(1970, 1, 6, 8, 0)
+
+# Everything schemas.LootRecord nests, in a fixed number of queries for any number of records
+LOOT_RECORD_LOAD_OPTIONS = (
+    joinedload(LootRecord.player).options(*PLAYER_LOAD_OPTIONS),
+    joinedload(LootRecord.item),
+    joinedload(LootRecord.raid_party).options(*RAID_PARTY_LOAD_OPTIONS),
+)
+
+def get_loot_record(db: Session, loot_record_id: int):
+    return db.query(LootRecord).options(*LOOT_RECORD_LOAD_OPTIONS).filter(LootRecord.id == loot_record_id).first()
+
+def get_loot_records_page(
+    db: Session,
+    raid_party_id: Optional[int] = None,
+    player_id: Optional[int] = None,
+    item_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = listing.DEFAULT_PAGE_SIZE,
+    load_relationships: bool = True
+):
+    filters = []
+    if raid_party_id is not None:
+        filters.append(LootRecord.raid_party_id == raid_party_id)
+    if player_id is not None:
+        filters.append(LootRecord.player_id == player_id)
+    if item_id is not None:
+        filters.append(LootRecord.item_id == item_id)
+    if start_date is not None:
+        filters.append(LootRecord.distribution_date >= start_date)
+    if end_date is not None:
+        filters.append(LootRecord.distribution_date < end_date)
+    return listing.get_page(db, LootRecord, filters, cursor, limit, LOOT_RECORD_LOAD_OPTIONS if load_relationships else ())
+
 def create_loot_record(db: Session, loot_record: LootRecordCreate):
     db_loot_record = LootRecord(**loot_record.dict())
     db.add(db_loot_record)
-    db.commit()
-    db.refresh(db_loot_record)
+    db.flush()
+    lockouts = update_weekly_lockouts(db, [db_loot_record])
+    update_eat_and_go_cycles(db, [db_loot_record])
+    update_loot_rollups(db, [db_loot_record])
+    # Before the feed, which recommends a recipient of the item again once it is published
+    after_commit(db, recommendations.invalidate_raid_party, db_loot_record.raid_party_id)
+    loot_feed.record_loot(db, [db_loot_record], lockouts)
+    after_commit(db, gear_calculation.invalidate_bis_needs, db_loot_record.player_id)
     return db_loot_record
 
-def is_eligible_for_eat_and_go(db: Session, player_id: int, item_id: int, raid_party_id: int) -> bool:
-    # Get all players in the raid party
-    all_players_in_party = db.query(Player).filter(Player.raid_party_id == raid_party_id).all()
-    all_player_ids_in_party = {p.id for p in all_players_in_party}
-
-    # Get all loot records for this item in this raid party
-    item_loot_records = db.query(LootRecord).filter(
-        LootRecord.item_id == item_id,
-        LootRecord.raid_party_id == raid_party_id
-    ).all()
+def create_loot_records(db: Session, loot_records: List[LootRecordCreate]) -> List[LootRecord]:
+    db_loot_records = [LootRecord(**loot_record.dict()) for loot_record in loot_records]
+    db.add_all(db_loot_records)
+    db.flush()
+    lockouts = update_weekly_lockouts(db, db_loot_records)
+    update_eat_and_go_cycles(db, db_loot_records)
+    update_loot_rollups(db, db_loot_records)
+    for raid_party_id in {db_loot_record.raid_party_id for db_loot_record in db_loot_records}:
+        after_commit(db, recommendations.invalidate_raid_party, raid_party_id)
+    loot_feed.record_loot(db, db_loot_records, lockouts)
+    for player_id in {db_loot_record.player_id for db_loot_record in db_loot_records}:
+        after_commit(db, gear_calculation.invalidate_bis_needs, player_id)
+    return db_loot_records
 
-    # Identify players who have received this item
-    players_who_received_item = {lr.player_id for lr in item_loot_records}
-
-    # Check if the current player has received this item
-    if player_id not in players_who_received_item:
+def is_eat_and_go_eligible(player_id: int, cycle_member_ids: Set[int], all_player_ids_in_party: Set[int]) -> bool:
+    # Check if the current player has received this item in the current cycle
+    if player_id not in cycle_member_ids:
         # If the player has not received it, they are eligible
         return True
     else:
         # If the player has received it, check if all other players have also received it
-        # This means checking if the set of players who received the item is equal to the set of all players in the party
-        # If they are equal, it means a full cycle has completed, and the player is eligible again.
-        return players_who_received_item == all_player_ids_in_party
+        # If they have, a full cycle has completed (e.g. after a roster change), and the player is eligible again.
+        return cycle_member_ids >= all_player_ids_in_party
+
+def is_eligible_for_eat_and_go(db: Session, player_id: int, item_id: int, raid_party_id: int) -> bool:
+    is_member = db.query(EatAndGoCycleMember.player_id).filter(
+        EatAndGoCycleMember.raid_party_id == raid_party_id,
+        EatAndGoCycleMember.item_id == item_id,
+        EatAndGoCycleMember.player_id == player_id
+    ).first() is not None
+    if not is_member:
+        return True
+
+    # Only members of the current cycle need the roster to know whether the cycle is complete
+    all_player_ids_in_party = {p.id for p in db.query(Player.id).filter(Player.raid_party_id == raid_party_id).all()}
+    cycle_member_ids = get_eat_and_go_cycle_members(db, raid_party_id, [item_id])[item_id]
+    return is_eat_and_go_eligible(player_id, cycle_member_ids, all_player_ids_in_party)
+
+def get_eat_and_go_cycle_members(db: Session, raid_party_id: int, item_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    item_ids = list(item_ids)
+    cycle_members = {item_id: set() for item_id in item_ids}
+    if not item_ids:
+        return cycle_members
+
+    rows = db.query(EatAndGoCycleMember.item_id, EatAndGoCycleMember.player_id).filter(
+        EatAndGoCycleMember.raid_party_id == raid_party_id,
+        EatAndGoCycleMember.item_id.in_(item_ids)
+    ).all()
+    for item_id, player_id in rows:
+        cycle_members[item_id].add(player_id)
+    return cycle_members
+
+def _advance_eat_and_go_cycles(cycle_members: Dict, party_player_ids: Dict[int, Set[int]], loot_records: Iterable):
+    # Adds each (raid_party_id, item_id, player_id) in order, starting a new cycle whenever one completes
+    for raid_party_id, item_id, player_id in loot_records:
+        members = cycle_members.setdefault((raid_party_id, item_id), set())
+        members.add(player_id)
+        if members >= party_player_ids.get(raid_party_id, set()):
+            members.clear()
+
+def _get_party_player_ids(db: Session, raid_party_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    party_player_ids = {}
+    rows = db.query(Player.raid_party_id, Player.id).filter(Player.raid_party_id.in_(list(raid_party_ids))).all()
+    for raid_party_id, player_id in rows:
+        party_player_ids.setdefault(raid_party_id, set()).add(player_id)
+    return party_player_ids
+
+def update_eat_and_go_cycles(db: Session, db_loot_records: List[LootRecord]):
+    # Must run in the same transaction as the insert of the loot records
+    raid_party_ids = {db_loot_record.raid_party_id for db_loot_record in db_loot_records}
+    item_ids = {db_loot_record.item_id for db_loot_record in db_loot_records}
+
+    current_members = {}
+    rows = db.query(EatAndGoCycleMember.raid_party_id, EatAndGoCycleMember.item_id, EatAndGoCycleMember.player_id).filter(
+        EatAndGoCycleMember.raid_party_id.in_(raid_party_ids),
+        EatAndGoCycleMember.item_id.in_(item_ids)
+    ).all()
+    for raid_party_id, item_id, player_id in rows:
+        current_members.setdefault((raid_party_id, item_id), set()).add(player_id)
+
+    cycle_members = {key: set(members) for key, members in current_members.items()}
+    _advance_eat_and_go_cycles(
+        cycle_members,
+        _get_party_player_ids(db, raid_party_ids),
+        [(r.raid_party_id, r.item_id, r.player_id) for r in db_loot_records]
+    )
+
+    for (raid_party_id, item_id), members in cycle_members.items():
+        previous_members = current_members.get((raid_party_id, item_id), set())
+        removed_player_ids = previous_members - members
+        if removed_player_ids:
+            db.query(EatAndGoCycleMember).filter(
+                EatAndGoCycleMember.raid_party_id == raid_party_id,
+                EatAndGoCycleMember.item_id == item_id,
+                EatAndGoCycleMember.player_id.in_(removed_player_ids)
+            ).delete(synchronize_session=False)
+        db.add_all([
+            EatAndGoCycleMember(raid_party_id=raid_party_id, item_id=item_id, player_id=player_id)
+            for player_id in members - previous_members
+        ])
+
+def rebuild_eat_and_go_cycles(db: Session):
+    # Replays the loot history against the current rosters, for databases that predate the cycle table
+    db.query(EatAndGoCycleMember).delete(synchronize_session=False)
+
+    rows = db.query(LootRecord.raid_party_id, LootRecord.item_id, LootRecord.player_id).order_by(
+        LootRecord.distribution_date, LootRecord.id
+    ).yield_per(1000)
+    raid_party_ids = {raid_party_id for raid_party_id, in db.query(LootRecord.raid_party_id).distinct().all()}
+
+    cycle_members = {}
+    _advance_eat_and_go_cycles(cycle_members, _get_party_player_ids(db, raid_party_ids), rows)
+
+    db.bulk_insert_mappings(EatAndGoCycleMember, [
+        {"raid_party_id": raid_party_id, "item_id": item_id, "player_id": player_id}
+        for (raid_party_id, item_id), members in cycle_members.items()
+        for player_id in members
+    ])
+    db.commit()
+
+def backfill_eat_and_go_cycles(db: Session):
+    # Only rebuilds when no cycle is tracked yet but loot was already recorded
+    if db.query(EatAndGoCycleMember.player_id).first() is None and db.query(LootRecord.id).first() is not None:
+        rebuild_eat_and_go_cycles(db)
+
+def get_start_of_week(now_utc: Optional[datetime] = None) -> datetime:
+    # Start of the week (Tuesday 08:00 UTC) containing now_utc
+    return WEEK_NUMBER_EPOCH + timedelta(weeks=get_week_number(now_utc))
+
+def get_week_number(moment: Optional[datetime] = None) -> int:
+    if moment is None:
+        moment = datetime.utcnow()
+    return (moment - WEEK_NUMBER_EPOCH) // timedelta(weeks=1)
+
+def update_weekly_lockouts(db: Session, db_loot_records: List[LootRecord]) -> Dict[int, PlayerWeeklyLockout]:
+    # Must run in the same transaction as the insert of the loot records, after they are flushed.
+    # Returns the lockouts of the players of the records.
+    player_ids = {db_loot_record.player_id for db_loot_record in db_loot_records}
+    lockouts = {
+        lockout.player_id: lockout
+        for lockout in db.query(PlayerWeeklyLockout).filter(PlayerWeeklyLockout.player_id.in_(player_ids)).all()
+    }
+
+    for db_loot_record in db_loot_records:
+        week_number = get_week_number(db_loot_record.distribution_date)
+        lockout = lockouts.get(db_loot_record.player_id)
+        if lockout is None:
+            lockout = PlayerWeeklyLockout(
+                player_id=db_loot_record.player_id,
+                raid_party_id=db_loot_record.raid_party_id,
+                week_number=week_number,
+                items_received=1
+            )
+            db.add(lockout)
+            lockouts[db_loot_record.player_id] = lockout
+        elif lockout.week_number < week_number:
+            lockout.week_number = week_number
+            lockout.items_received = 1
+        elif lockout.week_number == week_number:
+            lockout.items_received += 1
+        # Records dated before the last locked week do not change the lockout
+    return lockouts
+
+def rebuild_weekly_lockouts(db: Session):
+    # Recomputes every lockout from the loot history, for databases that predate the lockout table
+    db.query(PlayerWeeklyLockout).delete(synchronize_session=False)
+
+    lockouts = {}
+    rows = db.query(LootRecord.player_id, LootRecord.raid_party_id, LootRecord.distribution_date).filter(
+        LootRecord.distribution_date.isnot(None)
+    ).yield_per(1000)
+    for player_id, raid_party_id, distribution_date in rows:
+        week_number = get_week_number(distribution_date)
+        lockout = lockouts.get(player_id)
+        if lockout is None or lockout["week_number"] < week_number:
+            lockouts[player_id] = {
+                "player_id": player_id,
+                "raid_party_id": raid_party_id,
+                "week_number": week_number,
+                "items_received": 1
+            }
+        elif lockout["week_number"] == week_number:
+            lockout["items_received"] += 1
+
+    db.bulk_insert_mappings(PlayerWeeklyLockout, list(lockouts.values()))
+    db.commit()
+
+def backfill_weekly_lockouts(db: Session):
+    # Only rebuilds when the lockout table is still empty but loot was already recorded
+    if db.query(PlayerWeeklyLockout.player_id).first() is None and db.query(LootRecord.id).first() is not None:
+        rebuild_weekly_lockouts(db)
+
+def _increment_counts(db: Session, model, key_columns: List[str], counts: Dict[tuple, int]):
+    # Adds to the items_received of each key, creating missing rows, without reading them first
+    rows = [dict(zip(key_columns, key), items_received=count) for key, count in counts.items()]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        statement = insert(model)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={"items_received": model.items_received + statement.excluded.items_received}
+        )
+        db.execute(statement, rows)
+        return
+
+    for row in rows:
+        key = {column: row[column] for column in key_columns}
+        updated = db.query(model).filter_by(**key).update(
+            {model.items_received: model.items_received + row["items_received"]}, synchronize_session=False
+        )
+        if not updated:
+            db.add(model(**row))
+
+def update_loot_rollups(db: Session, db_loot_records: List[LootRecord]):
+    # Must run in the same transaction as the insert of the loot records, after they are flushed
+    weekly_counts = {}
+    item_type_counts = {}
+    items = reference_data.get_items(db, {db_loot_record.item_id for db_loot_record in db_loot_records})
+    for db_loot_record in db_loot_records:
+        # Undated records are not in any week, but still count by item type
+        if db_loot_record.distribution_date is not None:
+            key = (db_loot_record.raid_party_id, db_loot_record.player_id, get_week_number(db_loot_record.distribution_date))
+            weekly_counts[key] = weekly_counts.get(key, 0) + 1
+        item = items[db_loot_record.item_id]
+        if item is not None:
+            key = (item["category"], item["slot"])
+            item_type_counts[key] = item_type_counts.get(key, 0) + 1
+
+    _increment_counts(db, LootWeeklyPlayerCount, ["raid_party_id", "player_id", "week_number"], weekly_counts)
+    _increment_counts(db, LootItemTypeCount, ["category", "slot"], item_type_counts)
+
+def rebuild_loot_rollups(db: Session):
+    # Recomputes the statistics rollups from the loot history
+    db.query(LootWeeklyPlayerCount).delete(synchronize_session=False)
+    db.query(LootItemTypeCount).delete(synchronize_session=False)
+
+    weekly_counts = {}
+    rows = db.query(LootRecord.raid_party_id, LootRecord.player_id, LootRecord.distribution_date).filter(
+        LootRecord.distribution_date.isnot(None)
+    ).yield_per(1000)
+    for raid_party_id, player_id, distribution_date in rows:
+        key = (raid_party_id, player_id, get_week_number(distribution_date))
+        weekly_counts[key] = weekly_counts.get(key, 0) + 1
+
+    db.bulk_insert_mappings(LootWeeklyPlayerCount, [
+        {"raid_party_id": raid_party_id, "player_id": player_id, "week_number": week_number, "items_received": count}
+        for (raid_party_id, player_id, week_number), count in weekly_counts.items()
+    ])
+    db.bulk_insert_mappings(LootItemTypeCount, [
+        {"category": category, "slot": slot, "items_received": count}
+        for category, slot, count in db.query(Item.category, Item.slot, func.count(LootRecord.id)).join(
+            LootRecord, Item.id == LootRecord.item_id
+        ).group_by(Item.category, Item.slot).all()
+    ])
+    db.commit()
+
+def backfill_loot_rollups(db: Session):
+    # Only rebuilds when the rollups are still empty but loot was already recorded
+    if db.query(LootItemTypeCount.category).first() is None and db.query(LootRecord.id).first() is not None:
+        rebuild_loot_rollups(db)
 
 def has_received_item_this_week(db: Session, player_id: int) -> bool:
-    now_utc = datetime.utcnow()
-
-    # Calculate the start of the week (Tuesday 08:00 UTC)
-    # Find the most recent Tuesday
-    # isoweekday(): Monday is 1, Sunday is 7
-    # Tuesday is 2
-    days_since_tuesday = (now_utc.isoweekday() - 2 + 7) % 7
-    start_of_week = now_utc - timedelta(days=days_since_tuesday)
-    start_of_week = start_of_week.replace(hour=8, minute=0, second=0, microsecond=0)
-
-    # If current time is before Tuesday 08:00 UTC, then the start of the week is the Tuesday of the *previous* week
-    if now_utc < start_of_week:
-        start_of_week -= timedelta(weeks=1)
-
-    records_this_week = db.query(LootRecord).filter(
-        LootRecord.player_id == player_id,
-        LootRecord.distribution_date >= start_of_week
-    ).count()
-
-    return records_this_week > 0
+    lockout = db.query(PlayerWeeklyLockout.week_number).filter(PlayerWeeklyLockout.player_id == player_id).first()
+    return lockout is not None and lockout.week_number >= get_week_number()
+
+def get_players_who_received_item_this_week(db: Session, player_ids: Iterable[int]) -> Set[int]:
+    player_ids = list(player_ids)
+    if not player_ids:
+        return set()
+
+    rows = db.query(PlayerWeeklyLockout.player_id).filter(
+        PlayerWeeklyLockout.player_id.in_(player_ids),
+        PlayerWeeklyLockout.week_number >= get_week_number()
+    ).all()
+    return {player_id for player_id, in rows}
+
+def get_item_recipients_by_raid_party(db: Session, raid_party_id: int, item_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    # Same data as is_eligible_for_eat_and_go loads, but for several items in a single query
+    item_ids = list(item_ids)
+    recipients = {item_id: set() for item_id in item_ids}
+    if not item_ids:
+        return recipients
+
+    rows = db.query(LootRecord.item_id, LootRecord.player_id).filter(
+        LootRecord.raid_party_id == raid_party_id,
+        LootRecord.item_id.in_(item_ids)
+    ).distinct().all()
+    for item_id, player_id in rows:
+        recipients[item_id].add(player_id)
+    return recipients
@@ -1,6 +1,15 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from typing import Optional
 from ..models.player import Player
 from ..schemas.player import PlayerCreate
+from ..services import listing, recommendations
+from ..db.unit_of_work import after_commit
+
+# Relationships serialized by schemas.Player, loaded with the player instead of one lazy load each
+PLAYER_LOAD_OPTIONS = (joinedload(Player.user), joinedload(Player.job))
+
+def get_player(db: Session, player_id: int):
+    return db.query(Player).options(*PLAYER_LOAD_OPTIONS).filter(Player.id == player_id).first()
 
 def get_player_by_nickname_and_raid_party(db: Session, nickname: str, raid_party_id: int):
     return db.query(Player).filter(Player.character_nickname == nickname, Player.raid_party_id == raid_party_id).first()
@@ -8,6 +17,27 @@ def get_player_by_nickname_and_raid_party(db: Session, nickname: str, raid_party
 def create_player(db: Session, player: PlayerCreate):
     db_player = Player(**player.dict())
     db.add(db_player)
-    db.commit()
-    db.refresh(db_player)
+    db.flush()
+    after_commit(db, recommendations.invalidate_raid_party, db_player.raid_party_id)
     return db_player
+
+def get_players_page(
+    db: Session,
+    raid_party_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+    character_nickname: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = listing.DEFAULT_PAGE_SIZE,
+    load_relationships: bool = True
+):
+    filters = []
+    if raid_party_id is not None:
+        filters.append(Player.raid_party_id == raid_party_id)
+    if user_id is not None:
+        filters.append(Player.user_id == user_id)
+    if job_id is not None:
+        filters.append(Player.job_id == job_id)
+    if character_nickname is not None:
+        filters.append(Player.character_nickname == character_nickname)
+    return listing.get_page(db, Player, filters, cursor, limit, PLAYER_LOAD_OPTIONS if load_relationships else ())
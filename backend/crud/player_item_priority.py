@@ -1,6 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, Iterable, List, Optional, Tuple
 from ..models.player_item_priority import PlayerItemPriority
 from ..schemas.player_item_priority import PlayerItemPriorityCreate
+from ..services import listing, recommendations
+from ..db.unit_of_work import after_commit
+from .player import PLAYER_LOAD_OPTIONS
+from .raid_party import RAID_PARTY_LOAD_OPTIONS
+
+# Everything schemas.PlayerItemPriority nests
+PLAYER_ITEM_PRIORITY_LOAD_OPTIONS = (
+    joinedload(PlayerItemPriority.player).options(*PLAYER_LOAD_OPTIONS),
+    joinedload(PlayerItemPriority.item),
+    joinedload(PlayerItemPriority.raid_party).options(*RAID_PARTY_LOAD_OPTIONS),
+)
+
+def get_player_item_priority_by_id(db: Session, priority_id: int):
+    return db.query(PlayerItemPriority).options(*PLAYER_ITEM_PRIORITY_LOAD_OPTIONS).filter(PlayerItemPriority.id == priority_id).first()
 
 def get_player_item_priority(db: Session, player_id: int, item_id: int, raid_party_id: int):
     return db.query(PlayerItemPriority).filter(
@@ -9,9 +25,55 @@ def get_player_item_priority(db: Session, player_id: int, item_id: int, raid_par
         PlayerItemPriority.raid_party_id == raid_party_id
     ).first()
 
+def get_priority_orders_by_raid_party(db: Session, raid_party_id: int, item_ids: Iterable[int]) -> Dict[Tuple[int, int], int]:
+    # Maps (player_id, item_id) to priority_order for every priority set in the raid party
+    item_ids = list(item_ids)
+    if not item_ids:
+        return {}
+
+    rows = db.query(
+        PlayerItemPriority.player_id,
+        PlayerItemPriority.item_id,
+        PlayerItemPriority.priority_order
+    ).filter(
+        PlayerItemPriority.raid_party_id == raid_party_id,
+        PlayerItemPriority.item_id.in_(item_ids)
+    ).order_by(PlayerItemPriority.id).all()
+
+    priority_orders = {}
+    for player_id, item_id, priority_order in rows:
+        # Keep the first row, as get_player_item_priority would
+        priority_orders.setdefault((player_id, item_id), priority_order)
+    return priority_orders
+
 def create_player_item_priority(db: Session, priority: PlayerItemPriorityCreate):
     db_priority = PlayerItemPriority(**priority.dict())
     db.add(db_priority)
-    db.commit()
-    db.refresh(db_priority)
+    db.flush()
+    after_commit(db, recommendations.invalidate_item, db_priority.raid_party_id, db_priority.item_id)
     return db_priority
+
+def create_player_item_priorities(db: Session, priorities: List[PlayerItemPriorityCreate]):
+    # Single executemany insert; the caller has already checked for existing priorities
+    if priorities:
+        db.execute(insert(PlayerItemPriority), [priority.dict() for priority in priorities])
+    for raid_party_id, item_id in {(priority.raid_party_id, priority.item_id) for priority in priorities}:
+        after_commit(db, recommendations.invalidate_item, raid_party_id, item_id)
+
+def get_player_item_priorities_page(
+    db: Session,
+    raid_party_id: Optional[int] = None,
+    player_id: Optional[int] = None,
+    item_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = listing.DEFAULT_PAGE_SIZE,
+    load_relationships: bool = True
+):
+    filters = []
+    if raid_party_id is not None:
+        filters.append(PlayerItemPriority.raid_party_id == raid_party_id)
+    if player_id is not None:
+        filters.append(PlayerItemPriority.player_id == player_id)
+    if item_id is not None:
+        filters.append(PlayerItemPriority.item_id == item_id)
+    return listing.get_page(db, PlayerItemPriority, filters, cursor, limit, PLAYER_ITEM_PRIORITY_LOAD_OPTIONS if load_relationships else ())
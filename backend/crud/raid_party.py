@@ -1,6 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
 from ..models.raid_party import RaidParty
 from ..schemas.raid_party import RaidPartyCreate
+from ..services import listing, reference_data
+from ..db.unit_of_work import after_commit
+from .player import PLAYER_LOAD_OPTIONS
+
+# schemas.RaidParty lists every player; one extra query for the players of all loaded parties
+RAID_PARTY_LOAD_OPTIONS = (selectinload(RaidParty.players).options(*PLAYER_LOAD_OPTIONS),)
+
+def get_raid_party(db: Session, raid_party_id: int):
+    return db.query(RaidParty).options(*RAID_PARTY_LOAD_OPTIONS).filter(RaidParty.id == raid_party_id).first()
 
 def get_raid_party_by_name(db: Session, name: str):
     return db.query(RaidParty).filter(RaidParty.name == name).first()
@@ -8,6 +18,12 @@ def get_raid_party_by_name(db: Session, name: str):
 def create_raid_party(db: Session, raid_party: RaidPartyCreate):
     db_raid_party = RaidParty(name=raid_party.name)
     db.add(db_raid_party)
-    db.commit()
-    db.refresh(db_raid_party)
+    db.flush()
+    after_commit(db, reference_data.invalidate_raid_parties)
     return db_raid_party
+
+def get_raid_parties_page(db: Session, name: Optional[str] = None, cursor: Optional[str] = None, limit: int = listing.DEFAULT_PAGE_SIZE, load_relationships: bool = True):
+    filters = []
+    if name is not None:
+        filters.append(RaidParty.name == name)
+    return listing.get_page(db, RaidParty, filters, cursor, limit, RAID_PARTY_LOAD_OPTIONS if load_relationships else ())
@@ -1,26 +1,35 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 
 from ..models.raid_schedule import RaidSchedule
 from ..schemas.raid_schedule import RaidScheduleCreate
+from .raid_party import RAID_PARTY_LOAD_OPTIONS
+
+# The raid party of schemas.RaidSchedule, with its players
+RAID_SCHEDULE_LOAD_OPTIONS = (joinedload(RaidSchedule.raid_party).options(*RAID_PARTY_LOAD_OPTIONS),)
 
 def create_raid_schedule(db: Session, schedule: RaidScheduleCreate):
     db_schedule = RaidSchedule(**schedule.dict())
     db.add(db_schedule)
-    db.commit()
-    db.refresh(db_schedule)
+    db.flush()
     return db_schedule
 
 def get_raid_schedule(db: Session, schedule_id: int) -> Optional[RaidSchedule]:
-    return db.query(RaidSchedule).filter(RaidSchedule.id == schedule_id).first()
+    return db.query(RaidSchedule).options(*RAID_SCHEDULE_LOAD_OPTIONS).filter(RaidSchedule.id == schedule_id).first()
 
-def get_raid_schedules_by_raid_party(db: Session, raid_party_id: int) -> List[RaidSchedule]:
-    return db.query(RaidSchedule).filter(RaidSchedule.raid_party_id == raid_party_id).all()
+def get_raid_schedules_by_raid_party(db: Session, raid_party_id: int, load_relationships: bool = True) -> List[RaidSchedule]:
+    # Lean responses only need the columns
+    query = db.query(RaidSchedule)
+    if load_relationships:
+        query = query.options(*RAID_SCHEDULE_LOAD_OPTIONS)
+    return query.filter(RaidSchedule.raid_party_id == raid_party_id).all()
 
-def delete_raid_schedule(db: Session, schedule_id: int):
+def delete_raid_schedule(db: Session, schedule_id: int) -> Optional[int]:
+    # Returns the raid party of the deleted schedule, or None if it does not exist
     db_schedule = db.query(RaidSchedule).filter(RaidSchedule.id == schedule_id).first()
     if db_schedule:
+        raid_party_id = db_schedule.raid_party_id
         db.delete(db_schedule)
-        db.commit()
-        return True
-    return False
+        db.flush()
+        return raid_party_id
+    return None
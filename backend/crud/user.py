@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
+from typing import Optional
 from ..models.user import User
 from ..schemas.user import UserCreate
+from ..services import listing
 
 # In a real app, you'd use a proper password hashing library like passlib
 # For simplicity, we'll just store the password as is for now.
@@ -16,6 +18,13 @@ def create_user(db: Session, user: UserCreate):
     # fake_hashed_password = user.password + "notreallyhashed"
     db_user = User(email=user.email, username=user.username, hashed_password=user.password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()
     return db_user
+
+def get_users_page(db: Session, username: Optional[str] = None, email: Optional[str] = None, cursor: Optional[str] = None, limit: int = listing.DEFAULT_PAGE_SIZE):
+    filters = []
+    if username is not None:
+        filters.append(User.username == username)
+    if email is not None:
+        filters.append(User.email == email)
+    return listing.get_page(db, User, filters, cursor, limit)
@@ -0,0 +1,48 @@
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from .database import SQLALCHEMY_DATABASE_URL, configure_engine, get_engine_options
+
+# Async mode runs the ORM on SQLAlchemy's async engine, so that database I/O no longer
+# holds a threadpool worker. It needs an async driver: aiosqlite for SQLite, asyncpg for PostgreSQL.
+ASYNC_DATABASE_ENABLED = os.getenv("RAID_MANAGER_ASYNC_DB", "0").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE_ENABLED:
+    async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), **get_engine_options(SQLALCHEMY_DATABASE_URL, is_async=True))
+    configure_engine(async_engine.sync_engine)
+    AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, autocommit=False, autoflush=False)
+
+class ThreadPoolSession:
+    """
+    Stands in for AsyncSession when async mode is off.
+    run_sync runs the callable on a regular Session in the threadpool, so routes are written the same way in both modes.
+    """
+
+    def __init__(self, sync_session):
+        self.sync_session = sync_session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
@@ -1,12 +1,68 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from .instrumentation import TimedAsyncAdaptedQueuePool, TimedQueuePool
+
+SQLALCHEMY_DATABASE_URL = os.getenv("RAID_MANAGER_DATABASE_URL", "sqlite:///./raid_manager.db")
+
+# Connection pool of server databases (and of SQLite files)
+DB_POOL_SIZE = int(os.getenv("RAID_MANAGER_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("RAID_MANAGER_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("RAID_MANAGER_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("RAID_MANAGER_DB_POOL_RECYCLE", "1800")) # Seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("RAID_MANAGER_DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+
+# Applied to every new SQLite connection. WAL lets readers run while a loot record is written,
+# and busy_timeout makes concurrent writers wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("RAID_MANAGER_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("RAID_MANAGER_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("RAID_MANAGER_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("RAID_MANAGER_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+}
+
+def is_sqlite_url(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def is_sqlite_memory_url(url: str) -> bool:
+    database = url.partition("://")[2].lstrip("/")
+    return is_sqlite_url(url) and database in ("", ":memory:")
+
+def get_engine_options(url: str, is_async: bool = False) -> dict:
+    if is_sqlite_memory_url(url):
+        # Every connection to an in-memory database is a new, empty database, so share a single one
+        return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+
+    options = {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+    if is_sqlite_url(url):
+        options["connect_args"] = {"check_same_thread": False}
+    else:
+        options["pool_pre_ping"] = DB_POOL_PRE_PING
+        options["pool_recycle"] = DB_POOL_RECYCLE
+    return options
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./raid_manager.db"
+def configure_engine(engine):
+    # Takes a sync engine; for an async engine pass its sync_engine
+    if is_sqlite_url(str(engine.url)):
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = configure_engine(create_engine(SQLALCHEMY_DATABASE_URL, **get_engine_options(SQLALCHEMY_DATABASE_URL)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,23 @@
+from .database import SessionLocal
+from .async_database import ASYNC_DATABASE_ENABLED, AsyncSessionLocal, ThreadPoolSession
+from . import unit_of_work # Registers the after_commit hooks
+
+# Dependency
+# One session, and one transaction, per request: committed when the route returns, rolled back if it raises.
+# Routes declare it with Depends(get_db, scope="function"), so that the commit, and the after_commit callbacks,
+# run before the response is sent: a failed commit is answered with a 500, and the next request sees the write.
+# Routes pass their sync CRUD and service calls to db.run_sync. In async mode these run on the event loop
+# with the async driver, so anything lazy-loaded (e.g. while serializing the response) must happen inside run_sync.
+async def get_db():
+    if ASYNC_DATABASE_ENABLED:
+        db = AsyncSessionLocal()
+    else:
+        db = ThreadPoolSession(SessionLocal())
+    try:
+        yield db
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
@@ -0,0 +1,110 @@
+import contextvars
+import heapq
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from ..services import metrics
+
+# Slowest statements kept per request
+SLOWEST_STATEMENTS = 5
+# Fails every request that executes more statements, 0 disables. Meant for tests and load tests.
+QUERY_BUDGET = int(os.getenv("RAID_MANAGER_QUERY_BUDGET", "0"))
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+class QueryStats:
+    """
+    Statements executed within a track_queries block, e.g. by one request.
+    Shared with the threadpool and greenlet the ORM runs in, as they inherit the context they are started from.
+    """
+
+    def __init__(self, max_queries: Optional[int] = None):
+        self.max_queries = max_queries
+        self.count = 0
+        self.total_ms = 0.0
+        self._slowest: List[tuple] = [] # min-heap of (duration_ms, count, statement)
+
+    def record(self, statement: str, duration_ms: float):
+        self.total_ms += duration_ms
+        entry = (duration_ms, self.count, statement)
+        if len(self._slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self._slowest, entry)
+        elif duration_ms > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self) -> List[Dict[str, Any]]:
+        return [
+            {"statement": statement, "duration_ms": round(duration_ms, 3)}
+            for duration_ms, _, statement in sorted(self._slowest, reverse=True)
+        ]
+
+_current_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+@contextmanager
+def track_queries(max_queries: Optional[int] = None):
+    """
+    Counts and times the statements executed on any engine inside the block.
+    With max_queries, the statement over the budget raises QueryBudgetExceeded before it is executed:
+
+        with track_queries(max_queries=5) as stats:
+            distribution_algorithm.determine_item_recipient(db, raid_party_id, item_id)
+    """
+    stats = QueryStats(max_queries)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.count += 1
+    if stats.max_queries and stats.count > stats.max_queries:
+        raise QueryBudgetExceeded(f"More than {stats.max_queries} statements, the last one being: {statement}")
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.record(statement, (time.perf_counter() - started.pop()) * 1000)
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement has no after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        metrics.register_pool(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,26 @@
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# CRUD functions only flush; the request-scoped session (db.dependencies.get_db) commits once, when the route returns.
+# Side effects outside the database, such as cache invalidation, are deferred with after_commit so that
+# they run only if, and once, the transaction is committed.
+
+def after_commit(db: Session, callback: Callable, *args, **kwargs):
+    if not db.in_transaction():
+        # Ties the callback to a transaction, so that a rollback before anything was executed still discards it
+        db.begin()
+    db.info.setdefault("after_commit", []).append((callback, args, kwargs))
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    callbacks = session.info.pop("after_commit", [])
+    for callback, args, kwargs in callbacks:
+        callback(*args, **kwargs)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_commit_callbacks(session, previous_transaction):
+    # Also fires when a savepoint is rolled back; only the outermost transaction discards the callbacks
+    if previous_transaction.parent is None:
+        session.info.pop("after_commit", None)
@@ -1,25 +1,90 @@
+"""
+The app is built by create_app, which is what process managers should run:
+
+    uvicorn --factory backend.main:create_app
+
+`backend.main:app` also works, and creates the app on first access.
+"""
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from .routers import users, jobs, items, raid_parties, players, gear_sets, loot_records, player_item_priorities, distribution, raid_schedules, statistics
-from .db.database import engine
-from . import models
-
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-
-app.include_router(users.router)
-app.include_router(jobs.router)
-app.include_router(items.router)
-app.include_router(raid_parties.router)
-app.include_router(players.router)
-app.include_router(gear_sets.router)
-app.include_router(loot_records.router)
-app.include_router(player_item_priorities.router)
-app.include_router(distribution.router)
-app.include_router(raid_schedules.router)
-app.include_router(statistics.router)
-
-@app.get("/")
-def read_root():
-    return {"message": "FF14 Raid Manager API"}
+from .db.database import SQLALCHEMY_DATABASE_URL, engine, is_sqlite_memory_url
+from .services import invalidation, metrics as prometheus, recommendations
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    if is_sqlite_memory_url(SQLALCHEMY_DATABASE_URL):
+        # The schema is managed by migrations (python -m backend.manage migrate), not at startup.
+        # An in-memory database starts empty on every run, so it is created from the models.
+        from . import models
+        models.Base.metadata.create_all(bind=engine)
+    else:
+        # Pooled connections opened before a worker was forked (e.g. gunicorn --preload) belong to the parent
+        engine.dispose(close=False)
+    invalidation.start()
+    recommendations.start()
+    _record_startup(app, "lifespan", time.perf_counter() - started)
+    logger.info(
+        "Started in %.0f ms (imports %.0f ms, create_app %.0f ms, lifespan %.0f ms)",
+        sum(app.state.startup_seconds.values()) * 1000,
+        *(app.state.startup_seconds[phase] * 1000 for phase in ("import", "create_app", "lifespan"))
+    )
+    yield
+
+    recommendations.stop()
+    invalidation.stop()
+    engine.dispose()
+    from .db.async_database import async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+
+def _record_startup(app: FastAPI, phase: str, seconds: float):
+    app.state.startup_seconds[phase] = seconds
+    prometheus.record_startup(phase, seconds)
+
+def create_app() -> FastAPI:
+    started = time.perf_counter()
+    # Imported here rather than at module level, so that importing backend.main stays cheap
+    from .routers import users, jobs, items, raid_parties, players, gear_sets, loot_records, player_item_priorities, distribution, raid_schedules, statistics, metrics
+    from .services.request_metrics import RequestMetricsMiddleware
+    imported = time.perf_counter()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.startup_seconds = {}
+    app.add_middleware(RequestMetricsMiddleware)
+
+    app.include_router(users.router)
+    app.include_router(jobs.router)
+    app.include_router(items.router)
+    app.include_router(raid_parties.router)
+    app.include_router(players.router)
+    app.include_router(gear_sets.router)
+    app.include_router(loot_records.router)
+    app.include_router(player_item_priorities.router)
+    app.include_router(distribution.router)
+    app.include_router(raid_schedules.router)
+    app.include_router(statistics.router)
+    app.include_router(metrics.router)
+
+    @app.get("/")
+    def read_root():
+        return {"message": "FF14 Raid Manager API"}
+
+    # Imports are only slow the first time, in a process that has not loaded the routers yet
+    _record_startup(app, "import", imported - started)
+    _record_startup(app, "create_app", time.perf_counter() - imported)
+    return app
+
+def __getattr__(name):
+    # backend.main:app, created on first access
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,59 @@
+"""
+Maintenance commands, run from the repository root:
+
+    python -m backend.manage migrate
+    python -m backend.manage rebuild-rollups
+"""
+import argparse
+import os
+
+from alembic import command
+from alembic.config import Config
+
+from .db.database import SessionLocal
+from .crud import loot_record
+
+ALEMBIC_CONFIG = os.path.join(os.path.dirname(__file__), "alembic.ini")
+
+# Derived tables that are maintained on every loot record, and can be recomputed from the loot history
+REBUILD_COMMANDS = {
+    "rebuild-lockouts": (loot_record.rebuild_weekly_lockouts, "Recompute the weekly lockouts"),
+    "rebuild-eat-and-go-cycles": (loot_record.rebuild_eat_and_go_cycles, "Recompute the eat-and-go cycles"),
+    "rebuild-rollups": (loot_record.rebuild_loot_rollups, "Recompute the statistics rollups"),
+}
+
+def migrate(revision: str = "head"):
+    """
+    Brings the schema up to date, then fills the derived tables from the loot history
+    if they were just created (on a database from before they existed).
+    """
+    command.upgrade(Config(ALEMBIC_CONFIG), revision)
+    with SessionLocal() as db:
+        loot_record.backfill_weekly_lockouts(db)
+        loot_record.backfill_eat_and_go_cycles(db)
+        loot_record.backfill_loot_rollups(db)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.manage", description="FF14 Raid Manager maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help) in REBUILD_COMMANDS.items():
+        subparsers.add_parser(name, help=help)
+    subparsers.add_parser("rebuild-all", help="Run every rebuild command")
+    migrate_parser = subparsers.add_parser("migrate", help="Create or upgrade the database schema")
+    migrate_parser.add_argument("revision", nargs="?", default="head", help="Migration to upgrade to (default: head)")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        migrate(args.revision)
+        print("migrate: done")
+        return
+
+    commands = list(REBUILD_COMMANDS) if args.command == "rebuild-all" else [args.command]
+    for command in commands:
+        with SessionLocal() as db:
+            rebuild, _ = REBUILD_COMMANDS[command]
+            rebuild(db)
+        print(f"{command}: done")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from backend.db.database import SQLALCHEMY_DATABASE_URL, engine, is_sqlite_url
+from backend.models import Base
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    # Writes the SQL instead of running it: alembic upgrade head --sql
+    context.configure(
+        url=SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=is_sqlite_url(SQLALCHEMY_DATABASE_URL),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # A connection passed in by backend.manage, or the app's engine
+    connection = config.attributes.get("connection")
+    if connection is None:
+        with engine.connect() as connection:
+            _run_migrations(connection)
+    else:
+        _run_migrations(connection)
+
+def _run_migrations(connection):
+    # SQLite cannot alter most constraints in place, so tables are copied in batch mode
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=connection.dialect.name == "sqlite")
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
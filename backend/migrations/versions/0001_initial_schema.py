@@ -0,0 +1,199 @@
+"""initial schema
+
+Tables and single-column indexes of the schema as it was created by Base.metadata.create_all
+before migrations were introduced. Every statement is skipped when the table or index already
+exists, so upgrading a database created that way (from any earlier version) adopts it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 03:39:10.429249
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('category', sa.Enum('WEAPON', 'ARMOR', 'ACCESSORY', name='itemcategory'), nullable=False),
+    sa.Column('slot', sa.Enum('WEAPON', 'HEAD', 'BODY', 'HANDS', 'LEGS', 'FEET', 'EARRINGS', 'NECKLACE', 'BRACELET', 'RING', name='itemslot'), nullable=False),
+    sa.Column('source', sa.Enum('NORMAL_RAID', 'SAVAGE_RAID', 'TOMESTONE', 'AUGMENTED_TOMESTONE', 'CRAFTED', 'EXTREME_TRIAL', name='itemsource'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_items_id', 'items', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_items_name', 'items', ['name'], unique=True, if_not_exists=True)
+
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('role', sa.Enum('TANK', 'HEALER', 'MELEE_DPS', 'RANGED_DPS', 'CASTER_DPS', name='jobrole'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_jobs_id', 'jobs', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_jobs_name', 'jobs', ['name'], unique=True, if_not_exists=True)
+
+    op.create_table('loot_item_type_counts',
+    sa.Column('category', sa.Enum('WEAPON', 'ARMOR', 'ACCESSORY', name='itemcategory'), nullable=False),
+    sa.Column('slot', sa.Enum('WEAPON', 'HEAD', 'BODY', 'HANDS', 'LEGS', 'FEET', 'EARRINGS', 'NECKLACE', 'BRACELET', 'RING', name='itemslot'), nullable=False),
+    sa.Column('items_received', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('category', 'slot'),
+    if_not_exists=True
+    )
+
+    op.create_table('raid_parties',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_raid_parties_id', 'raid_parties', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_raid_parties_name', 'raid_parties', ['name'], unique=False, if_not_exists=True)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True, if_not_exists=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True, if_not_exists=True)
+
+    op.create_table('players',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.Column('raid_party_id', sa.Integer(), nullable=True),
+    sa.Column('character_nickname', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_players_character_nickname', 'players', ['character_nickname'], unique=False, if_not_exists=True)
+    op.create_index('ix_players_id', 'players', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('raid_schedules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('raid_party_id', sa.Integer(), nullable=True),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_raid_schedules_id', 'raid_schedules', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('eat_and_go_cycle_members',
+    sa.Column('raid_party_id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.PrimaryKeyConstraint('raid_party_id', 'item_id', 'player_id'),
+    if_not_exists=True
+    )
+
+    op.create_table('gear_sets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=True),
+    sa.Column('set_type', sa.Enum('STARTING', 'BIS', name='gearsettype'), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_gear_sets_id', 'gear_sets', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('loot_records',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=True),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('raid_party_id', sa.Integer(), nullable=True),
+    sa.Column('distribution_date', sa.DateTime(), nullable=True),
+    sa.Column('distribution_method', sa.Enum('PRIORITY', 'EAT_AND_GO', name='distributionmethod'), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_loot_records_id', 'loot_records', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('loot_weekly_player_counts',
+    sa.Column('raid_party_id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('week_number', sa.Integer(), nullable=False),
+    sa.Column('items_received', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.PrimaryKeyConstraint('raid_party_id', 'player_id', 'week_number'),
+    if_not_exists=True
+    )
+    op.create_index('ix_loot_weekly_player_counts_week_number', 'loot_weekly_player_counts', ['week_number'], unique=False, if_not_exists=True)
+
+    op.create_table('player_item_priorities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('player_id', sa.Integer(), nullable=True),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('raid_party_id', sa.Integer(), nullable=True),
+    sa.Column('priority_order', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_player_item_priorities_id', 'player_item_priorities', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('player_weekly_lockouts',
+    sa.Column('player_id', sa.Integer(), nullable=False),
+    sa.Column('raid_party_id', sa.Integer(), nullable=True),
+    sa.Column('week_number', sa.Integer(), nullable=False),
+    sa.Column('items_received', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['player_id'], ['players.id'], ),
+    sa.ForeignKeyConstraint(['raid_party_id'], ['raid_parties.id'], ),
+    sa.PrimaryKeyConstraint('player_id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_player_weekly_lockouts_raid_party_id_week_number', 'player_weekly_lockouts', ['raid_party_id', 'week_number'], unique=False, if_not_exists=True)
+
+    op.create_table('gear_set_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('gear_set_id', sa.Integer(), nullable=True),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['gear_set_id'], ['gear_sets.id'], ),
+    sa.ForeignKeyConstraint(['item_id'], ['items.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_gear_set_items_id', 'gear_set_items', ['id'], unique=False, if_not_exists=True)
+
+def downgrade():
+    op.drop_table('gear_set_items')
+    op.drop_table('player_weekly_lockouts')
+    op.drop_table('player_item_priorities')
+    op.drop_table('loot_weekly_player_counts')
+    op.drop_table('loot_records')
+    op.drop_table('gear_sets')
+    op.drop_table('eat_and_go_cycle_members')
+    op.drop_table('raid_schedules')
+    op.drop_table('players')
+    op.drop_table('users')
+    op.drop_table('raid_parties')
+    op.drop_table('loot_item_type_counts')
+    op.drop_table('jobs')
+    op.drop_table('items')
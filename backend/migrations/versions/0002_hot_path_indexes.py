@@ -0,0 +1,77 @@
+"""hot path indexes and unique constraints
+
+Composite indexes for the lookups of the distribution rules, statistics and list endpoints,
+and unique indexes for the rules the API already checks before inserting:
+one priority per (player, item, raid party), one gear set per (player, set type)
+and one character nickname per raid party.
+
+The single-column indexes on players.raid_party_id, gear_sets.player_id and
+player_item_priorities.player_id, created by earlier versions, are dropped as they
+are prefixes of the unique indexes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 03:52:41.118204
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def _check_no_duplicates(table, columns, detail):
+    # Rows the unique index would reject have to be merged by hand, as other tables reference them
+    column_list = ", ".join(columns)
+    duplicates = op.get_bind().execute(sa.text(
+        f"SELECT {column_list}, COUNT(*) FROM {table} "
+        f"WHERE {' AND '.join(f'{column} IS NOT NULL' for column in columns)} "
+        f"GROUP BY {column_list} HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicates:
+        raise RuntimeError(f"{detail} ({column_list}, count): {', '.join(str(tuple(row)) for row in duplicates[:10])}")
+
+def upgrade():
+    op.create_index('ix_loot_records_player_id_distribution_date', 'loot_records', ['player_id', 'distribution_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_loot_records_raid_party_id_item_id', 'loot_records', ['raid_party_id', 'item_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_loot_records_raid_party_id_distribution_date', 'loot_records', ['raid_party_id', 'distribution_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_loot_records_distribution_date_id', 'loot_records', ['distribution_date', 'id'], unique=False, if_not_exists=True)
+    op.create_index('ix_player_item_priorities_raid_party_id_item_id', 'player_item_priorities', ['raid_party_id', 'item_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_players_user_id', 'players', ['user_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_players_job_id', 'players', ['job_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_gear_set_items_gear_set_id', 'gear_set_items', ['gear_set_id'], unique=False, if_not_exists=True)
+
+    # Nothing references priorities, so duplicates keep the first one, which is the one distribution used
+    op.execute(
+        "DELETE FROM player_item_priorities WHERE id NOT IN ("
+        "SELECT MIN(id) FROM player_item_priorities GROUP BY player_id, item_id, raid_party_id)"
+    )
+    _check_no_duplicates('gear_sets', ['player_id', 'set_type'], "Players with several gear sets of the same type")
+    _check_no_duplicates('players', ['raid_party_id', 'character_nickname'], "Character nicknames used more than once in a raid party")
+
+    op.create_index('uq_player_item_priorities_player_id_item_id_raid_party_id', 'player_item_priorities', ['player_id', 'item_id', 'raid_party_id'], unique=True, if_not_exists=True)
+    op.create_index('uq_gear_sets_player_id_set_type', 'gear_sets', ['player_id', 'set_type'], unique=True, if_not_exists=True)
+    op.create_index('uq_players_raid_party_id_character_nickname', 'players', ['raid_party_id', 'character_nickname'], unique=True, if_not_exists=True)
+
+    op.drop_index('ix_player_item_priorities_player_id', table_name='player_item_priorities', if_exists=True)
+    op.drop_index('ix_gear_sets_player_id', table_name='gear_sets', if_exists=True)
+    op.drop_index('ix_players_raid_party_id', table_name='players', if_exists=True)
+
+def downgrade():
+    op.create_index('ix_players_raid_party_id', 'players', ['raid_party_id'], unique=False)
+    op.create_index('ix_gear_sets_player_id', 'gear_sets', ['player_id'], unique=False)
+    op.create_index('ix_player_item_priorities_player_id', 'player_item_priorities', ['player_id'], unique=False)
+
+    op.drop_index('uq_players_raid_party_id_character_nickname', table_name='players')
+    op.drop_index('uq_gear_sets_player_id_set_type', table_name='gear_sets')
+    op.drop_index('uq_player_item_priorities_player_id_item_id_raid_party_id', table_name='player_item_priorities')
+
+    op.drop_index('ix_gear_set_items_gear_set_id', table_name='gear_set_items')
+    op.drop_index('ix_players_job_id', table_name='players')
+    op.drop_index('ix_players_user_id', table_name='players')
+    op.drop_index('ix_player_item_priorities_raid_party_id_item_id', table_name='player_item_priorities')
+    op.drop_index('ix_loot_records_distribution_date_id', table_name='loot_records')
+    op.drop_index('ix_loot_records_raid_party_id_distribution_date', table_name='loot_records')
+    op.drop_index('ix_loot_records_raid_party_id_item_id', table_name='loot_records')
+    op.drop_index('ix_loot_records_player_id_distribution_date', table_name='loot_records')
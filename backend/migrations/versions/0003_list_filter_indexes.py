@@ -0,0 +1,28 @@
+"""list filter indexes
+
+Indexes for the filters of GET /items/ (category, slot, source) and GET /jobs/ (role).
+items.source is also how the distribution rules find the savage raid drops.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:12:05.402117
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_items_category', 'items', ['category'], unique=False, if_not_exists=True)
+    op.create_index('ix_items_slot', 'items', ['slot'], unique=False, if_not_exists=True)
+    op.create_index('ix_items_source', 'items', ['source'], unique=False, if_not_exists=True)
+    op.create_index('ix_jobs_role', 'jobs', ['role'], unique=False, if_not_exists=True)
+
+def downgrade():
+    op.drop_index('ix_jobs_role', table_name='jobs')
+    op.drop_index('ix_items_source', table_name='items')
+    op.drop_index('ix_items_slot', table_name='items')
+    op.drop_index('ix_items_category', table_name='items')
@@ -0,0 +1,13 @@
+from ..db.database import Base
+from .eat_and_go_cycle import *
+from .gear_set import *
+from .item import *
+from .job import *
+from .loot_record import *
+from .loot_rollup import *
+from .player import *
+from .player_item_priority import *
+from .raid_party import *
+from .raid_schedule import *
+from .user import *
+from .weekly_lockout import *
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from ..db.database import Base
+
+class EatAndGoCycleMember(Base):
+    """
+    Players who received an item in the current "Eat and Go" cycle of a raid party.
+    Maintained by crud.loot_record; the rows of a (raid_party_id, item_id) pair are removed
+    once every player of the party has received the item, which starts the next cycle.
+    """
+    __tablename__ = "eat_and_go_cycle_members"
+
+    raid_party_id = Column(Integer, ForeignKey("raid_parties.id"), primary_key=True)
+    item_id = Column(Integer, ForeignKey("items.id"), primary_key=True)
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
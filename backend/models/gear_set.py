@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Enum
+from sqlalchemy import Column, Integer, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from ..db.database import Base
 import enum
@@ -9,6 +9,10 @@ class GearSetType(str, enum.Enum):
 
 class GearSet(Base):
     __tablename__ = "gear_sets"
+    __table_args__ = (
+        # One set of each type per player
+        Index("uq_gear_sets_player_id_set_type", "player_id", "set_type", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.id"))
@@ -21,7 +25,7 @@ class GearSetItem(Base):
     __tablename__ = "gear_set_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    gear_set_id = Column(Integer, ForeignKey("gear_sets.id"))
+    gear_set_id = Column(Integer, ForeignKey("gear_sets.id"), index=True)
     item_id = Column(Integer, ForeignKey("items.id"))
 
     gear_set = relationship("GearSet", back_populates="gear_set_items")
@@ -32,6 +32,6 @@ class Item(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)
-    category = Column(Enum(ItemCategory), nullable=False)
-    slot = Column(Enum(ItemSlot), nullable=False)
-    source = Column(Enum(ItemSource), nullable=False)
+    category = Column(Enum(ItemCategory), nullable=False, index=True)
+    slot = Column(Enum(ItemSlot), nullable=False, index=True)
+    source = Column(Enum(ItemSource), nullable=False, index=True)
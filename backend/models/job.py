@@ -15,6 +15,6 @@ class Job(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)
-    role = Column(Enum(JobRole), nullable=False)
+    role = Column(Enum(JobRole), nullable=False, index=True)
 
     players = relationship("Player", back_populates="job")
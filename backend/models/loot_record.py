@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from ..db.database import Base
 import enum
@@ -10,6 +10,12 @@ class DistributionMethod(str, enum.Enum):
 
 class LootRecord(Base):
     __tablename__ = "loot_records"
+    __table_args__ = (
+        Index("ix_loot_records_player_id_distribution_date", "player_id", "distribution_date"),
+        Index("ix_loot_records_raid_party_id_item_id", "raid_party_id", "item_id"),
+        Index("ix_loot_records_distribution_date_id", "distribution_date", "id"), # Export keyset
+        Index("ix_loot_records_raid_party_id_distribution_date", "raid_party_id", "distribution_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.id"))
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, ForeignKey, Enum, Index
+from ..db.database import Base
+from .item import ItemCategory, ItemSlot
+
+class LootWeeklyPlayerCount(Base):
+    """
+    Number of items a player received in a raid party during a week (see crud.loot_record.get_week_number).
+    Maintained by crud.loot_record in the transaction that records the loot, so statistics read these
+    counts instead of grouping every loot record.
+    """
+    __tablename__ = "loot_weekly_player_counts"
+    __table_args__ = (
+        Index("ix_loot_weekly_player_counts_week_number", "week_number"),
+    )
+
+    raid_party_id = Column(Integer, ForeignKey("raid_parties.id"), primary_key=True)
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    week_number = Column(Integer, primary_key=True)
+    items_received = Column(Integer, nullable=False, default=0)
+
+class LootItemTypeCount(Base):
+    """
+    Number of items distributed per item category and slot, maintained like LootWeeklyPlayerCount.
+    """
+    __tablename__ = "loot_item_type_counts"
+
+    category = Column(Enum(ItemCategory), primary_key=True)
+    slot = Column(Enum(ItemSlot), primary_key=True)
+    items_received = Column(Integer, nullable=False, default=0)
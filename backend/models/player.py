@@ -1,13 +1,17 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Integer, ForeignKey, String, Index
 from sqlalchemy.orm import relationship
 from ..db.database import Base
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (
+        # A nickname is unique within its raid party
+        Index("uq_players_raid_party_id_character_nickname", "raid_party_id", "character_nickname", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    job_id = Column(Integer, ForeignKey("jobs.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id"), index=True)
     raid_party_id = Column(Integer, ForeignKey("raid_parties.id"))
     character_nickname = Column(String, index=True, nullable=False)
 
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from ..db.database import Base
 
 class PlayerItemPriority(Base):
     __tablename__ = "player_item_priorities"
+    __table_args__ = (
+        Index("ix_player_item_priorities_raid_party_id_item_id", "raid_party_id", "item_id"),
+        # One priority per player, item and raid party
+        Index("uq_player_item_priorities_player_id_item_id_raid_party_id", "player_id", "item_id", "raid_party_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.id"))
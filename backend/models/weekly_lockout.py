@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from ..db.database import Base
+
+class PlayerWeeklyLockout(Base):
+    """
+    Last week (see crud.loot_record.get_week_number) in which a player received an item,
+    maintained by crud.loot_record so that the "one item per week" check is a point lookup.
+    """
+    __tablename__ = "player_weekly_lockouts"
+    __table_args__ = (
+        Index("ix_player_weekly_lockouts_raid_party_id_week_number", "raid_party_id", "week_number"),
+    )
+
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    raid_party_id = Column(Integer, ForeignKey("raid_parties.id"))
+    week_number = Column(Integer, nullable=False)
+    items_received = Column(Integer, nullable=False, default=0) # Items received during week_number
+
+    player = relationship("Player")
@@ -1,27 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Dict, Any, List
 
-from ..db.database import SessionLocal
-from ..services import distribution_algorithm
+from .. import crud, schemas
+from ..db.dependencies import get_db
+from ..db.unit_of_work import after_commit
+from ..services import distribution_algorithm, loot_planner
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _assign_chest(db: Session, raid_party_id: int, chest: schemas.ChestDistributionCreate):
+    assignments = distribution_algorithm.determine_chest_assignment(db, raid_party_id, chest.item_ids)
+    if assignments is None:
+        raise HTTPException(status_code=404, detail="Raid party not found")
+
+    if chest.persist:
+        assigned = [assignment for assignment in assignments if assignment["player_id"] is not None]
+        db_loot_records = crud.loot_record.create_loot_records(db, [
+            schemas.LootRecordCreate(
+                player_id=assignment["player_id"],
+                item_id=assignment["item_id"],
+                raid_party_id=raid_party_id,
+                distribution_method=chest.distribution_method
+            )
+            for assignment in assigned
+        ])
+        for assignment, db_loot_record in zip(assigned, db_loot_records):
+            assignment["loot_record_id"] = db_loot_record.id
+            after_commit(db, loot_planner.apply_loot_record, raid_party_id, db_loot_record.player_id, db_loot_record.item_id, db_loot_record.distribution_date)
+
+    return {"raid_party_id": raid_party_id, "assignments": assignments}
 
 @router.get("/distribution/recommend_recipient/{raid_party_id}/{item_id}", response_model=Optional[Dict[str, Any]])
-def recommend_recipient(
+async def recommend_recipient(
     raid_party_id: int,
     item_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
-    recipient = distribution_algorithm.determine_item_recipient(db, raid_party_id, item_id)
+    recipient = await db.run_sync(distribution_algorithm.determine_item_recipient, raid_party_id, item_id)
     if recipient is None:
         raise HTTPException(status_code=404, detail="No eligible recipient found or invalid IDs")
     return recipient
+
+def _rank_candidates(db: Session, raid_party_id: int, item_id: int):
+    rankings = distribution_algorithm.get_ranked_candidates(db, raid_party_id, [item_id])
+    if rankings is None:
+        raise HTTPException(status_code=404, detail="Raid party not found")
+    if item_id not in rankings:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return rankings[item_id]
+
+@router.get("/distribution/candidates/{raid_party_id}/{item_id}", response_model=List[Dict[str, Any]])
+async def rank_candidates(
+    raid_party_id: int,
+    item_id: int,
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    # Every eligible player, best candidate first; the first one is the recommended recipient
+    return await db.run_sync(_rank_candidates, raid_party_id, item_id)
+
+@router.post("/distribution/assign_chest/{raid_party_id}", response_model=schemas.ChestDistribution)
+async def assign_chest(
+    raid_party_id: int,
+    chest: schemas.ChestDistributionCreate,
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    return await db.run_sync(_assign_chest, raid_party_id, chest)
+
+@router.get("/distribution/loot_plan/{raid_party_id}", response_model=Dict[str, Any])
+async def get_loot_plan(
+    raid_party_id: int,
+    time_budget_ms: int = Query(loot_planner.DEFAULT_TIME_BUDGET_MS, ge=1, le=loot_planner.MAX_TIME_BUDGET_MS),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    plan = await db.run_sync(loot_planner.get_loot_plan, raid_party_id, time_budget_ms)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Raid party not found")
+    return plan
@@ -1,23 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from .. import crud, schemas
-from ..db.database import SessionLocal
+from .. import crud, models, schemas
+from ..db.dependencies import get_db
+from ..db.unit_of_work import after_commit
+from ..schemas.orm import from_orm
+from ..models.gear_set import GearSetType
+from ..services import bulk_import, listing, loot_planner
+from ..services.sideload import sideload
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of gear sets reads, including nested and sideloaded records
+LIST_MODELS = (models.GearSet, models.GearSetItem, models.Item, models.Player, models.Job)
 
 
-@router.post("/gear_sets/", response_model=schemas.GearSet)
-def create_gear_set(gear_set: schemas.GearSetCreate, db: Session = Depends(get_db)):
+def _create_gear_set(db: Session, gear_set: schemas.GearSetCreate):
     db_gear_set = crud.gear_set.get_gear_set_by_player_and_type(db, player_id=gear_set.player_id, set_type=gear_set.set_type)
     if db_gear_set:
         raise HTTPException(status_code=400, detail="Gear set of this type already exists for this player")
-    return crud.gear_set.create_gear_set(db=db, gear_set=gear_set)
+    db_gear_set = crud.gear_set.create_gear_set(db=db, gear_set=gear_set)
+    after_commit(db, loot_planner.invalidate_plan, db_gear_set.player.raid_party_id)
+    return from_orm(schemas.GearSet, crud.gear_set.get_gear_set(db, db_gear_set.id))
+
+@router.post("/gear_sets/", response_model=schemas.GearSet)
+async def create_gear_set(gear_set: schemas.GearSetCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_gear_set, gear_set)
+
+@router.post("/gear_sets/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_gear_sets(request: Request, db: AsyncSession = Depends(get_db, scope="function")):
+    # Body is a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) with a header row
+    return await bulk_import.import_request(request, db, bulk_import.import_gear_sets)
+
+def _list_gear_sets(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str], lean: bool):
+    schema = schemas.GearSetLean if lean else schemas.GearSet
+    field_names = listing.parse_fields(fields, schema)
+    db_gear_sets, next_cursor = crud.gear_set.get_gear_sets_page(db, **filters, cursor=cursor, limit=limit, load_relationships=not lean)
+    if not lean:
+        return {"data": listing.serialize(schema, db_gear_sets, field_names), "next_cursor": next_cursor}
+
+    gear_sets = [
+        {
+            "id": db_gear_set.id,
+            "player_id": db_gear_set.player_id,
+            "set_type": db_gear_set.set_type,
+            "item_ids": [gear_set_item.item_id for gear_set_item in db_gear_set.gear_set_items],
+        }
+        for db_gear_set in db_gear_sets
+    ]
+    return {
+        "data": listing.serialize(schema, gear_sets, field_names),
+        "next_cursor": next_cursor,
+        **sideload(
+            db,
+            player_ids={gear_set["player_id"] for gear_set in gear_sets},
+            item_ids={item_id for gear_set in gear_sets for item_id in gear_set["item_ids"]}
+        ),
+    }
+
+@router.get("/gear_sets/", response_model=Union[schemas.GearSetPage, schemas.GearSetLeanPage])
+async def list_gear_sets(
+    request: Request,
+    player_id: Optional[int] = None,
+    set_type: Optional[GearSetType] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    lean: bool = Query(False, description=listing.LEAN_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"player_id": player_id, "set_type": set_type}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_gear_sets, filters, cursor, limit, fields, lean)
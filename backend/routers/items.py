@@ -1,23 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
-from .. import crud, schemas
-from ..db.database import SessionLocal
+from .. import crud, models, schemas
+from ..db.dependencies import get_db
+from ..schemas.orm import from_orm
+from ..models.item import ItemCategory, ItemSlot, ItemSource
+from ..services import bulk_import, listing, reference_data
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of items reads, including nested and sideloaded records
+LIST_MODELS = (models.Item,)
 
 
-@router.post("/items/", response_model=schemas.Item)
-def create_item(item: schemas.ItemCreate, db: Session = Depends(get_db)):
-    db_item = crud.item.get_item_by_name(db, name=item.name)
+def _create_item(db: Session, item: schemas.ItemCreate):
+    db_item = reference_data.get_item_by_name(db, name=item.name)
     if db_item:
         raise HTTPException(status_code=400, detail="Item already registered")
-    return crud.item.create_item(db=db, item=item)
+    return from_orm(schemas.Item, crud.item.create_item(db=db, item=item))
+
+@router.post("/items/", response_model=schemas.Item)
+async def create_item(item: schemas.ItemCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_item, item)
+
+@router.post("/items/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_items(request: Request, db: AsyncSession = Depends(get_db, scope="function")):
+    # Body is a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) with a header row
+    return await bulk_import.import_request(request, db, bulk_import.import_items)
+
+def _list_items(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str]):
+    field_names = listing.parse_fields(fields, schemas.Item)
+    db_items, next_cursor = crud.item.get_items_page(db, **filters, cursor=cursor, limit=limit)
+    return {"data": listing.serialize(schemas.Item, db_items, field_names), "next_cursor": next_cursor}
+
+@router.get("/items/", response_model=schemas.ItemPage)
+async def list_items(
+    request: Request,
+    name: Optional[str] = None,
+    category: Optional[ItemCategory] = None,
+    slot: Optional[ItemSlot] = None,
+    source: Optional[ItemSource] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"name": name, "category": category, "slot": slot, "source": source}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_items, filters, cursor, limit, fields)
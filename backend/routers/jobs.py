@@ -1,23 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
-from .. import crud, schemas
-from ..db.database import SessionLocal
+from .. import crud, models, schemas
+from ..db.dependencies import get_db
+from ..schemas.orm import from_orm
+from ..models.job import JobRole
+from ..services import listing, reference_data
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of jobs reads, including nested and sideloaded records
+LIST_MODELS = (models.Job,)
 
 
-@router.post("/jobs/", response_model=schemas.Job)
-def create_job(job: schemas.JobCreate, db: Session = Depends(get_db)):
-    db_job = crud.job.get_job_by_name(db, name=job.name)
+def _create_job(db: Session, job: schemas.JobCreate):
+    db_job = reference_data.get_job_by_name(db, name=job.name)
     if db_job:
         raise HTTPException(status_code=400, detail="Job already registered")
-    return crud.job.create_job(db=db, job=job)
+    return from_orm(schemas.Job, crud.job.create_job(db=db, job=job))
+
+@router.post("/jobs/", response_model=schemas.Job)
+async def create_job(job: schemas.JobCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_job, job)
+
+def _list_jobs(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str]):
+    field_names = listing.parse_fields(fields, schemas.Job)
+    db_jobs, next_cursor = crud.job.get_jobs_page(db, **filters, cursor=cursor, limit=limit)
+    return {"data": listing.serialize(schemas.Job, db_jobs, field_names), "next_cursor": next_cursor}
+
+@router.get("/jobs/", response_model=schemas.JobPage)
+async def list_jobs(
+    request: Request,
+    name: Optional[str] = None,
+    role: Optional[JobRole] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"name": name, "role": role}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_jobs, filters, cursor, limit, fields)
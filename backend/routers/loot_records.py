@@ -1,29 +1,141 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
+from datetime import datetime
+import asyncio
 
-from .. import crud, schemas
+from .. import crud, models, schemas
 from ..db.database import SessionLocal
+from ..db.dependencies import get_db
+from ..db.unit_of_work import after_commit
+from ..schemas.orm import from_orm
+from ..services import bulk_import, listing, loot_export, loot_feed, loot_planner, reference_data
+from ..services.sideload import sideload
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of loot records reads, including nested and sideloaded records
+LIST_MODELS = (models.LootRecord, models.Player, models.User, models.Job, models.Item, models.RaidParty)
 
 
+def _create_loot_record(db: Session, loot_record: schemas.LootRecordCreate):
+    db_loot_record = crud.loot_record.create_loot_record(db=db, loot_record=loot_record)
+    after_commit(db, loot_planner.apply_loot_record, db_loot_record.raid_party_id, db_loot_record.player_id, db_loot_record.item_id, db_loot_record.distribution_date)
+    return from_orm(schemas.LootRecord, crud.loot_record.get_loot_record(db, db_loot_record.id))
+
 @router.post("/loot_records/", response_model=schemas.LootRecord)
-def create_loot_record(loot_record: schemas.LootRecordCreate, db: Session = Depends(get_db)):
-    return crud.loot_record.create_loot_record(db=db, loot_record=loot_record)
+async def create_loot_record(loot_record: schemas.LootRecordCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_loot_record, loot_record)
+
+@router.post("/loot_records/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_loot_records(request: Request, db: AsyncSession = Depends(get_db, scope="function")):
+    # Body is a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) with a header row
+    return await bulk_import.import_request(request, db, bulk_import.import_loot_records, finish=bulk_import.finish_loot_record_import)
+
+@router.get("/loot_records/export")
+async def export_loot_records(
+    format: str = "ndjson",
+    raid_party_id: Optional[int] = None,
+    player_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
+    # Streams flat rows ordered by distribution date; the rows are read page by page while the response is sent
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+
+    rows = loot_export.iter_loot_record_rows(SessionLocal, raid_party_id, player_id, start_date, end_date)
+    if format == "csv":
+        return StreamingResponse(
+            loot_export.iter_csv(rows),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="loot_records.csv"'}
+        )
+    return StreamingResponse(loot_export.iter_ndjson(rows), media_type="application/x-ndjson")
 
 @router.get("/loot_records/eat_and_go_eligibility/{player_id}/{item_id}/{raid_party_id}", response_model=bool)
-def check_eat_and_go_eligibility(
+async def check_eat_and_go_eligibility(
     player_id: int,
     item_id: int,
     raid_party_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db, scope="function")
 ):
-    return crud.loot_record.is_eligible_for_eat_and_go(db, player_id, item_id, raid_party_id)
+    return await db.run_sync(crud.loot_record.is_eligible_for_eat_and_go, player_id, item_id, raid_party_id)
+
+def _list_loot_records(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str], lean: bool):
+    schema = schemas.LootRecordLean if lean else schemas.LootRecord
+    field_names = listing.parse_fields(fields, schema)
+    db_loot_records, next_cursor = crud.loot_record.get_loot_records_page(db, **filters, cursor=cursor, limit=limit, load_relationships=not lean)
+    page = {"data": listing.serialize(schema, db_loot_records, field_names), "next_cursor": next_cursor}
+    if lean:
+        page.update(sideload(
+            db,
+            player_ids={db_loot_record.player_id for db_loot_record in db_loot_records},
+            item_ids={db_loot_record.item_id for db_loot_record in db_loot_records},
+            raid_party_ids={db_loot_record.raid_party_id for db_loot_record in db_loot_records}
+        ))
+    return page
+
+@router.get("/loot_records/", response_model=Union[schemas.LootRecordPage, schemas.LootRecordLeanPage])
+async def list_loot_records(
+    request: Request,
+    raid_party_id: Optional[int] = None,
+    player_id: Optional[int] = None,
+    item_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    lean: bool = Query(False, description=listing.LEAN_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    # Pages in id order; use /loot_records/export for the whole history by date
+    filters = {"raid_party_id": raid_party_id, "player_id": player_id, "item_id": item_id, "start_date": start_date, "end_date": end_date}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_loot_records, filters, cursor, limit, fields, lean)
+
+def _raid_party_exists(raid_party_id: int) -> bool:
+    # A short session of its own, as the feed itself stays open for hours
+    with SessionLocal() as db:
+        return reference_data.get_raid_party(db, raid_party_id) is not None
+
+@router.get("/loot_records/feed/{raid_party_id}")
+async def loot_feed_events(raid_party_id: int):
+    # Server-sent events: new loot records, weekly lockouts and recommendations of the raid party
+    if not await run_in_threadpool(_raid_party_exists, raid_party_id):
+        raise HTTPException(status_code=404, detail="Raid party not found")
+    return StreamingResponse(
+        loot_feed.iter_sse(raid_party_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/loot_records/feed/{raid_party_id}/ws")
+async def loot_feed_websocket(websocket: WebSocket, raid_party_id: int):
+    # The same events as /loot_records/feed/{raid_party_id}, as JSON messages
+    if not await run_in_threadpool(_raid_party_exists, raid_party_id):
+        await websocket.close(code=1008, reason="Raid party not found")
+        return
+    await websocket.accept()
+    subscription = loot_feed.subscribe(raid_party_id)
+    # Messages from the client are ignored; receiving them tells when it disconnects
+    receive = asyncio.ensure_future(websocket.receive())
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({receive, next_event}, return_when=asyncio.FIRST_COMPLETED)
+            if receive in done:
+                if receive.result()["type"] == "websocket.disconnect":
+                    next_event.cancel()
+                    break
+                receive = asyncio.ensure_future(websocket.receive())
+            if next_event in done:
+                await websocket.send_json(next_event.result())
+            else:
+                next_event.cancel()
+    finally:
+        receive.cancel()
+        loot_feed.unsubscribe(subscription)
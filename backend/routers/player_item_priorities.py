@@ -1,22 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from .. import crud, schemas
-from ..db.database import SessionLocal
+from .. import crud, models, schemas
+from ..db.dependencies import get_db
+from ..db.unit_of_work import after_commit
+from ..schemas.orm import from_orm
+from ..services import bulk_import, listing, loot_planner
+from ..services.sideload import sideload
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of priorities reads, including nested and sideloaded records
+LIST_MODELS = (models.PlayerItemPriority, models.Player, models.User, models.Job, models.Item, models.RaidParty)
 
 
-@router.post("/player_item_priorities/", response_model=schemas.PlayerItemPriority)
-def create_player_item_priority(priority: schemas.PlayerItemPriorityCreate, db: Session = Depends(get_db)):
+def _create_player_item_priority(db: Session, priority: schemas.PlayerItemPriorityCreate):
     db_priority = crud.player_item_priority.get_player_item_priority(
         db, 
         player_id=priority.player_id, 
@@ -25,4 +25,44 @@ def create_player_item_priority(priority: schemas.PlayerItemPriorityCreate, db:
     )
     if db_priority:
         raise HTTPException(status_code=400, detail="Priority for this player, item, and raid party already exists")
-    return crud.player_item_priority.create_player_item_priority(db=db, priority=priority)
+    db_priority = crud.player_item_priority.create_player_item_priority(db=db, priority=priority)
+    after_commit(db, loot_planner.invalidate_plan, db_priority.raid_party_id)
+    return from_orm(schemas.PlayerItemPriority, crud.player_item_priority.get_player_item_priority_by_id(db, db_priority.id))
+
+@router.post("/player_item_priorities/", response_model=schemas.PlayerItemPriority)
+async def create_player_item_priority(priority: schemas.PlayerItemPriorityCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_player_item_priority, priority)
+
+@router.post("/player_item_priorities/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_player_item_priorities(request: Request, db: AsyncSession = Depends(get_db, scope="function")):
+    # Body is a JSON array, NDJSON (application/x-ndjson) or CSV (text/csv) with a header row
+    return await bulk_import.import_request(request, db, bulk_import.import_player_item_priorities)
+
+def _list_player_item_priorities(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str], lean: bool):
+    schema = schemas.PlayerItemPriorityLean if lean else schemas.PlayerItemPriority
+    field_names = listing.parse_fields(fields, schema)
+    db_priorities, next_cursor = crud.player_item_priority.get_player_item_priorities_page(db, **filters, cursor=cursor, limit=limit, load_relationships=not lean)
+    page = {"data": listing.serialize(schema, db_priorities, field_names), "next_cursor": next_cursor}
+    if lean:
+        page.update(sideload(
+            db,
+            player_ids={db_priority.player_id for db_priority in db_priorities},
+            item_ids={db_priority.item_id for db_priority in db_priorities},
+            raid_party_ids={db_priority.raid_party_id for db_priority in db_priorities}
+        ))
+    return page
+
+@router.get("/player_item_priorities/", response_model=Union[schemas.PlayerItemPriorityPage, schemas.PlayerItemPriorityLeanPage])
+async def list_player_item_priorities(
+    request: Request,
+    raid_party_id: Optional[int] = None,
+    player_id: Optional[int] = None,
+    item_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    lean: bool = Query(False, description=listing.LEAN_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"raid_party_id": raid_party_id, "player_id": player_id, "item_id": item_id}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_player_item_priorities, filters, cursor, limit, fields, lean)
@@ -1,23 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from .. import crud, schemas
-from ..db.database import SessionLocal
+from .. import crud, models, schemas
+from ..db.dependencies import get_db
+from ..db.unit_of_work import after_commit
+from ..schemas.orm import from_orm
+from ..services import listing, loot_planner
+from ..services.sideload import sideload
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of players reads, including nested and sideloaded records
+LIST_MODELS = (models.Player, models.User, models.Job, models.RaidParty)
 
 
-@router.post("/players/", response_model=schemas.Player)
-def create_player(player: schemas.PlayerCreate, db: Session = Depends(get_db)):
+def _create_player(db: Session, player: schemas.PlayerCreate):
     db_player = crud.player.get_player_by_nickname_and_raid_party(db, nickname=player.character_nickname, raid_party_id=player.raid_party_id)
     if db_player:
         raise HTTPException(status_code=400, detail="Character nickname already exists in this raid party")
-    return crud.player.create_player(db=db, player=player)
+    db_player = crud.player.create_player(db=db, player=player)
+    after_commit(db, loot_planner.invalidate_plan, db_player.raid_party_id)
+    return from_orm(schemas.Player, crud.player.get_player(db, db_player.id))
+
+@router.post("/players/", response_model=schemas.Player)
+async def create_player(player: schemas.PlayerCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_player, player)
+
+def _list_players(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str], lean: bool):
+    schema = schemas.PlayerLean if lean else schemas.Player
+    field_names = listing.parse_fields(fields, schema)
+    db_players, next_cursor = crud.player.get_players_page(db, **filters, cursor=cursor, limit=limit, load_relationships=not lean)
+    page = {"data": listing.serialize(schema, db_players, field_names), "next_cursor": next_cursor}
+    if lean:
+        page.update(sideload(
+            db,
+            job_ids={db_player.job_id for db_player in db_players},
+            raid_party_ids={db_player.raid_party_id for db_player in db_players}
+        ))
+    return page
+
+@router.get("/players/", response_model=Union[schemas.PlayerPage, schemas.PlayerLeanPage])
+async def list_players(
+    request: Request,
+    raid_party_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+    character_nickname: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    lean: bool = Query(False, description=listing.LEAN_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"raid_party_id": raid_party_id, "user_id": user_id, "job_id": job_id, "character_nickname": character_nickname}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_players, filters, cursor, limit, fields, lean)
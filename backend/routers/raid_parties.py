@@ -1,23 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
 
-from .. import crud, schemas
-from ..db.database import SessionLocal
+from .. import crud, models, schemas
+from ..db.dependencies import get_db
+from ..schemas.orm import from_orm
+from ..services import listing, reference_data
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of raid parties reads, including nested and sideloaded records
+LIST_MODELS = (models.RaidParty, models.Player, models.User, models.Job)
 
 
-@router.post("/raid_parties/", response_model=schemas.RaidParty)
-def create_raid_party(raid_party: schemas.RaidPartyCreate, db: Session = Depends(get_db)):
-    db_raid_party = crud.raid_party.get_raid_party_by_name(db, name=raid_party.name)
+def _create_raid_party(db: Session, raid_party: schemas.RaidPartyCreate):
+    db_raid_party = reference_data.get_raid_party_by_name(db, name=raid_party.name)
     if db_raid_party:
         raise HTTPException(status_code=400, detail="Raid party already registered")
-    return crud.raid_party.create_raid_party(db=db, raid_party=raid_party)
+    return from_orm(schemas.RaidParty, crud.raid_party.create_raid_party(db=db, raid_party=raid_party))
+
+@router.post("/raid_parties/", response_model=schemas.RaidParty)
+async def create_raid_party(raid_party: schemas.RaidPartyCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_raid_party, raid_party)
+
+def _list_raid_parties(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str], lean: bool):
+    # Lean parties leave out their players
+    schema = schemas.RaidPartyLean if lean else schemas.RaidParty
+    field_names = listing.parse_fields(fields, schema)
+    db_raid_parties, next_cursor = crud.raid_party.get_raid_parties_page(db, **filters, cursor=cursor, limit=limit, load_relationships=not lean)
+    return {"data": listing.serialize(schema, db_raid_parties, field_names), "next_cursor": next_cursor}
+
+@router.get("/raid_parties/", response_model=Union[schemas.RaidPartyPage, schemas.RaidPartyLeanPage])
+async def list_raid_parties(
+    request: Request,
+    name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    lean: bool = Query(False, description=listing.LEAN_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"name": name}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_raid_parties, filters, cursor, limit, fields, lean)
@@ -1,37 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Union
 
 from .. import crud, schemas
-from ..db.database import SessionLocal
+from ..db.dependencies import get_db
+from ..db.unit_of_work import after_commit
+from ..schemas.orm import from_orm
+from ..services import loot_planner
+from ..services.sideload import sideload
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _create_raid_schedule(db: Session, schedule: schemas.RaidScheduleCreate):
+    db_schedule = crud.raid_schedule.create_raid_schedule(db=db, schedule=schedule)
+    # Schedules decide the planning horizon of the loot plan
+    after_commit(db, loot_planner.invalidate_plan, db_schedule.raid_party_id)
+    return from_orm(schemas.RaidSchedule, crud.raid_schedule.get_raid_schedule(db, db_schedule.id))
 
-@router.post("/raid_schedules/", response_model=schemas.RaidSchedule)
-def create_raid_schedule(schedule: schemas.RaidScheduleCreate, db: Session = Depends(get_db)):
-    return crud.raid_schedule.create_raid_schedule(db=db, schedule=schedule)
-
-@router.get("/raid_schedules/{schedule_id}", response_model=schemas.RaidSchedule)
-def get_raid_schedule(schedule_id: int, db: Session = Depends(get_db)):
+def _get_raid_schedule(db: Session, schedule_id: int):
     db_schedule = crud.raid_schedule.get_raid_schedule(db, schedule_id=schedule_id)
     if db_schedule is None:
         raise HTTPException(status_code=404, detail="Raid schedule not found")
-    return db_schedule
+    return from_orm(schemas.RaidSchedule, db_schedule)
 
-@router.get("/raid_schedules/by_raid_party/{raid_party_id}", response_model=List[schemas.RaidSchedule])
-def get_raid_schedules_by_raid_party(raid_party_id: int, db: Session = Depends(get_db)):
-    return crud.raid_schedule.get_raid_schedules_by_raid_party(db, raid_party_id=raid_party_id)
+def _get_raid_schedules_by_raid_party(db: Session, raid_party_id: int, lean: bool):
+    db_schedules = crud.raid_schedule.get_raid_schedules_by_raid_party(db, raid_party_id=raid_party_id, load_relationships=not lean)
+    if lean:
+        return {
+            "data": [from_orm(schemas.RaidScheduleLean, db_schedule) for db_schedule in db_schedules],
+            **sideload(db, raid_party_ids={db_schedule.raid_party_id for db_schedule in db_schedules}),
+        }
+    return [from_orm(schemas.RaidSchedule, db_schedule) for db_schedule in db_schedules]
 
-@router.delete("/raid_schedules/{schedule_id}")
-def delete_raid_schedule(schedule_id: int, db: Session = Depends(get_db)):
-    if not crud.raid_schedule.delete_raid_schedule(db, schedule_id=schedule_id):
+@router.post("/raid_schedules/", response_model=schemas.RaidSchedule)
+async def create_raid_schedule(schedule: schemas.RaidScheduleCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_raid_schedule, schedule)
+
+@router.get("/raid_schedules/{schedule_id}", response_model=schemas.RaidSchedule)
+async def get_raid_schedule(schedule_id: int, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_get_raid_schedule, schedule_id)
+
+@router.get("/raid_schedules/by_raid_party/{raid_party_id}", response_model=Union[List[schemas.RaidSchedule], schemas.RaidScheduleLeanList])
+async def get_raid_schedules_by_raid_party(raid_party_id: int, lean: bool = False, db: AsyncSession = Depends(get_db, scope="function")):
+    # lean=true returns ids with each referenced record once, instead of nesting the raid party into every schedule
+    return await db.run_sync(_get_raid_schedules_by_raid_party, raid_party_id, lean)
+
+def _delete_raid_schedule(db: Session, schedule_id: int):
+    raid_party_id = crud.raid_schedule.delete_raid_schedule(db, schedule_id)
+    if raid_party_id is None:
         raise HTTPException(status_code=404, detail="Raid schedule not found")
+    after_commit(db, loot_planner.invalidate_plan, raid_party_id)
+
+@router.delete("/raid_schedules/{schedule_id}")
+async def delete_raid_schedule(schedule_id: int, db: AsyncSession = Depends(get_db, scope="function")):
+    await db.run_sync(_delete_raid_schedule, schedule_id)
     return {"message": "Raid schedule deleted successfully"}
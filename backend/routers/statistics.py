@@ -1,32 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 
-from ..db.database import SessionLocal
-from ..services import statistics
+from ..db.dependencies import get_db
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# The statistics and analytics services are imported by the first request that needs them,
+# so that workers which never serve these reports don't load them.
+def _statistics():
+    from ..services import statistics
+    return statistics
+
+def _analytics():
+    from ..services import analytics
+    return analytics
 
 @router.get("/statistics/total_items_per_raid_party", response_model=List[Dict[str, Any]])
-def get_total_items_per_raid_party(db: Session = Depends(get_db)):
-    return statistics.get_total_items_distributed_per_raid_party(db)
+async def get_total_items_per_raid_party(db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_statistics().get_total_items_distributed_per_raid_party)
 
 @router.get("/statistics/total_items_per_player", response_model=List[Dict[str, Any]])
-def get_total_items_per_player(raid_party_id: Optional[int] = None, db: Session = Depends(get_db)):
-    return statistics.get_total_items_distributed_per_player(db, raid_party_id)
+async def get_total_items_per_player(raid_party_id: Optional[int] = None, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_statistics().get_total_items_distributed_per_player, raid_party_id)
 
 @router.get("/statistics/items_per_type_and_slot", response_model=List[Dict[str, Any]])
-def get_items_per_type_and_slot(db: Session = Depends(get_db)):
-    return statistics.get_items_distributed_per_item_type_and_slot(db)
+async def get_items_per_type_and_slot(db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_statistics().get_items_distributed_per_item_type_and_slot)
 
 @router.get("/statistics/weekly_distribution_per_player", response_model=List[Dict[str, Any]])
-def get_weekly_distribution_per_player(raid_party_id: Optional[int] = None, db: Session = Depends(get_db)):
-    return statistics.get_weekly_distribution_count_per_player(db, raid_party_id)
+async def get_weekly_distribution_per_player(raid_party_id: Optional[int] = None, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_statistics().get_weekly_distribution_count_per_player, raid_party_id)
+
+def _analytics_unavailable(e: RuntimeError):
+    return HTTPException(status_code=503, detail=str(e))
+
+@router.get("/statistics/analytics/counts", response_model=List[Dict[str, Any]])
+async def get_analytics_counts(
+    group_by: List[str] = Query(["raid_party_id", "week_number"]),
+    raid_party_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    analytics = _analytics()
+    unknown_columns = [column for column in group_by if column not in analytics.GROUP_BY_COLUMNS]
+    if unknown_columns or not group_by:
+        raise HTTPException(status_code=400, detail=f"group_by must be one or more of {', '.join(analytics.GROUP_BY_COLUMNS)}")
+    try:
+        return await db.run_sync(analytics.get_grouped_counts, group_by, raid_party_id, start_date, end_date)
+    except analytics.AnalyticsUnavailableError as e:
+        raise _analytics_unavailable(e)
+
+@router.get("/statistics/analytics/weekly_series", response_model=List[Dict[str, Any]])
+async def get_analytics_weekly_series(
+    raid_party_id: Optional[int] = None,
+    window: Optional[int] = Query(None, ge=1, description="Weeks in the rolling average, 4 by default"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    analytics = _analytics()
+    try:
+        return await db.run_sync(analytics.get_weekly_series, raid_party_id, window or analytics.DEFAULT_ROLLING_WINDOW_WEEKS, start_date, end_date)
+    except analytics.AnalyticsUnavailableError as e:
+        raise _analytics_unavailable(e)
+
+@router.get("/statistics/analytics/fairness", response_model=List[Dict[str, Any]])
+async def get_analytics_fairness(raid_party_id: Optional[int] = None, db: AsyncSession = Depends(get_db, scope="function")):
+    analytics = _analytics()
+    try:
+        return await db.run_sync(analytics.get_fairness, raid_party_id)
+    except analytics.AnalyticsUnavailableError as e:
+        raise _analytics_unavailable(e)
+
+@router.get("/statistics/analytics/time_to_bis", response_model=List[Dict[str, Any]])
+async def get_analytics_time_to_bis(raid_party_id: Optional[int] = None, db: AsyncSession = Depends(get_db, scope="function")):
+    analytics = _analytics()
+    try:
+        return await db.run_sync(analytics.get_time_to_bis, raid_party_id)
+    except analytics.AnalyticsUnavailableError as e:
+        raise _analytics_unavailable(e)
@@ -1,26 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 from .. import crud, models, schemas
-from ..db.database import SessionLocal
+from ..db.dependencies import get_db
+from ..schemas.orm import from_orm
+from ..services import listing
 
 router = APIRouter()
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Every table a page of users reads, including nested and sideloaded records
+LIST_MODELS = (models.User,)
 
 
-@router.post("/users/", response_model=schemas.User)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def _create_user(db: Session, user: schemas.UserCreate):
     db_user_email = crud.user.get_user_by_email(db, email=user.email)
     if db_user_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     db_user_username = crud.user.get_user_by_username(db, username=user.username)
     if db_user_username:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud.user.create_user(db=db, user=user)
+    return from_orm(schemas.User, crud.user.create_user(db=db, user=user))
+
+@router.post("/users/", response_model=schemas.User)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db, scope="function")):
+    return await db.run_sync(_create_user, user)
+
+def _list_users(db: Session, filters: dict, cursor: Optional[str], limit: int, fields: Optional[str]):
+    field_names = listing.parse_fields(fields, schemas.User)
+    db_users, next_cursor = crud.user.get_users_page(db, **filters, cursor=cursor, limit=limit)
+    return {"data": listing.serialize(schemas.User, db_users, field_names), "next_cursor": next_cursor}
+
+@router.get("/users/", response_model=schemas.UserPage)
+async def list_users(
+    request: Request,
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(listing.DEFAULT_PAGE_SIZE, ge=1, le=listing.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description=listing.FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db, scope="function")
+):
+    filters = {"username": username, "email": email}
+    return await listing.etag_page(request, db, LIST_MODELS, _list_users, filters, cursor, limit, fields)
@@ -0,0 +1,13 @@
+from .bulk_import import *
+from .distribution import *
+from .gear_set import *
+from .item import *
+from .job import *
+from .loot_record import *
+from .pagination import *
+from .player import *
+from .player_item_priority import *
+from .raid_party import *
+from .raid_schedule import *
+from .sideload import *
+from .user import *
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import List
+
+class BulkImportError(BaseModel):
+    row: int # 1-based position of the record in the upload
+    detail: str
+
+class BulkImportResult(BaseModel):
+    received: int
+    imported: int
+    errors: List[BulkImportError] = []
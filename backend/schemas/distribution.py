@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from ..models.loot_record import DistributionMethod
+
+class ChestDistributionCreate(BaseModel):
+    item_ids: List[int]
+    distribution_method: DistributionMethod = DistributionMethod.PRIORITY
+    persist: bool = False # Also record the assignment as loot records
+
+class ChestAssignment(BaseModel):
+    item_id: int
+    player_id: Optional[int] = None
+    character_nickname: Optional[str] = None
+    user_id: Optional[int] = None
+    job_id: Optional[int] = None
+    score: Optional[int] = None
+    loot_record_id: Optional[int] = None
+
+class ChestDistribution(BaseModel):
+    raid_party_id: int
+    assignments: List[ChestAssignment] = []
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from typing import List
 from ..models.gear_set import GearSetType
 from .item import Item
+from .sideload import Sideloaded
 
 class GearSetItemBase(BaseModel):
     item_id: int
@@ -29,3 +30,10 @@ class GearSet(GearSetBase):
 
     class Config:
         orm_mode = True
+
+class GearSetLean(GearSetBase):
+    id: int
+    item_ids: List[int] = []
+
+class GearSetLeanList(Sideloaded):
+    data: List[GearSetLean]
@@ -1,9 +1,11 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 from ..models.loot_record import DistributionMethod
 from .player import Player
 from .item import Item
 from .raid_party import RaidParty
+from .sideload import Sideloaded
 
 class LootRecordBase(BaseModel):
     player_id: int
@@ -14,6 +16,9 @@ class LootRecordBase(BaseModel):
 class LootRecordCreate(LootRecordBase):
     pass
 
+class LootRecordImport(LootRecordBase):
+    distribution_date: Optional[datetime] = None # Defaults to the time of the import
+
 class LootRecord(LootRecordBase):
     id: int
     distribution_date: datetime
@@ -23,3 +28,13 @@ class LootRecord(LootRecordBase):
 
     class Config:
         orm_mode = True
+
+class LootRecordLean(LootRecordBase):
+    id: int
+    distribution_date: datetime
+
+    class Config:
+        orm_mode = True
+
+class LootRecordLeanList(Sideloaded):
+    data: List[LootRecordLean]
@@ -0,0 +1,10 @@
+from typing import Any, Type, TypeVar
+from pydantic import BaseModel
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+def from_orm(schema: Type[Schema], obj: Any) -> Schema:
+    # Builds a response model from an ORM object, with pydantic 2 as well as 1
+    if hasattr(schema, "model_validate"):
+        return schema.model_validate(obj, from_attributes=True)
+    return schema.from_orm(obj)
@@ -0,0 +1,53 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from .user import User
+from .job import Job
+from .item import Item
+from .player import Player, PlayerLean
+from .raid_party import RaidParty, RaidPartyLean
+from .gear_set import GearSet, GearSetLeanList
+from .player_item_priority import PlayerItemPriority, PlayerItemPriorityLeanList
+from .loot_record import LootRecord, LootRecordLeanList
+from .sideload import Sideloaded
+
+class Page(BaseModel):
+    next_cursor: Optional[str] = None # Pass as cursor to get the next page; None on the last page
+
+class UserPage(Page):
+    data: List[User]
+
+class JobPage(Page):
+    data: List[Job]
+
+class ItemPage(Page):
+    data: List[Item]
+
+class PlayerPage(Page):
+    data: List[Player]
+
+class PlayerLeanPage(Sideloaded, Page):
+    data: List[PlayerLean]
+
+class RaidPartyPage(Page):
+    data: List[RaidParty]
+
+class RaidPartyLeanPage(Page):
+    data: List[RaidPartyLean]
+
+class GearSetPage(Page):
+    data: List[GearSet]
+
+class GearSetLeanPage(GearSetLeanList, Page):
+    pass
+
+class PlayerItemPriorityPage(Page):
+    data: List[PlayerItemPriority]
+
+class PlayerItemPriorityLeanPage(PlayerItemPriorityLeanList, Page):
+    pass
+
+class LootRecordPage(Page):
+    data: List[LootRecord]
+
+class LootRecordLeanPage(LootRecordLeanList, Page):
+    pass
@@ -11,6 +11,12 @@ class PlayerBase(BaseModel):
 class PlayerCreate(PlayerBase):
     pass
 
+class PlayerLean(PlayerBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
 class Player(PlayerBase):
     id: int
     user: User
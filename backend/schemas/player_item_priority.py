@@ -1,7 +1,9 @@
 from pydantic import BaseModel
+from typing import List
 from .player import Player
 from .item import Item
 from .raid_party import RaidParty
+from .sideload import Sideloaded
 
 class PlayerItemPriorityBase(BaseModel):
     player_id: int
@@ -20,3 +22,12 @@ class PlayerItemPriority(PlayerItemPriorityBase):
 
     class Config:
         orm_mode = True
+
+class PlayerItemPriorityLean(PlayerItemPriorityBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class PlayerItemPriorityLeanList(Sideloaded):
+    data: List[PlayerItemPriorityLean]
@@ -8,6 +8,12 @@ class RaidPartyBase(BaseModel):
 class RaidPartyCreate(RaidPartyBase):
     pass
 
+class RaidPartyLean(RaidPartyBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
 class RaidParty(RaidPartyBase):
     id: int
     players: List[Player] = []
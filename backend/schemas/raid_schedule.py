@@ -1,8 +1,9 @@
 from pydantic import BaseModel
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 from .raid_party import RaidParty
+from .sideload import Sideloaded
 
 class RaidScheduleBase(BaseModel):
     raid_party_id: int
@@ -20,3 +21,12 @@ class RaidSchedule(RaidScheduleBase):
 
     class Config:
         orm_mode = True
+
+class RaidScheduleLean(RaidScheduleBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class RaidScheduleLeanList(Sideloaded):
+    data: List[RaidScheduleLean]
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import Dict
+from .item import Item
+from .job import Job
+from .player import PlayerLean
+from .raid_party import RaidPartyLean
+
+class Sideloaded(BaseModel):
+    # Records referenced by a lean list, each once, keyed by id
+    players: Dict[int, PlayerLean] = {}
+    jobs: Dict[int, Job] = {}
+    items: Dict[int, Item] = {}
+    raid_parties: Dict[int, RaidPartyLean] = {}
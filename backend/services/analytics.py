@@ -0,0 +1,292 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Sequence
+from datetime import datetime, timedelta
+
+from ..models.loot_record import LootRecord
+from ..models.item import Item, ItemCategory, ItemSlot, ItemSource
+from ..models.player import Player
+from ..models.raid_party import RaidParty
+from ..models.raid_schedule import RaidSchedule
+from ..crud.loot_record import WEEK_NUMBER_EPOCH
+from ..services import gear_calculation
+
+# Reports over the whole loot history. The history is loaded once into NumPy column arrays,
+# and every report is computed with vectorized operations on them instead of one query per group.
+# NumPy is optional: only these reports need it.
+
+LOAD_BATCH_SIZE = 10000
+DEFAULT_ROLLING_WINDOW_WEEKS = 4
+
+# Enum columns are stored as their index in these lists
+CATEGORIES = list(ItemCategory)
+SLOTS = list(ItemSlot)
+SOURCES = list(ItemSource)
+
+GROUP_BY_COLUMNS = ["raid_party_id", "player_id", "item_id", "category", "slot", "source", "week_number"]
+ENUM_COLUMNS = {"category": CATEGORIES, "slot": SLOTS, "source": SOURCES}
+
+class AnalyticsUnavailableError(RuntimeError):
+    pass
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise AnalyticsUnavailableError("Analytics need NumPy, install it with: pip install numpy")
+    return numpy
+
+def load_loot_columns(
+    db: Session,
+    raid_party_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Reads the dated loot records joined with their item in one pass, into one array per column.
+    start_date is inclusive and end_date exclusive.
+    """
+    np = _numpy()
+    query = db.query(
+        LootRecord.raid_party_id,
+        LootRecord.player_id,
+        LootRecord.item_id,
+        LootRecord.distribution_date,
+        Item.category,
+        Item.slot,
+        Item.source
+    ).join(Item, Item.id == LootRecord.item_id).filter(LootRecord.distribution_date.isnot(None))
+
+    if raid_party_id is not None:
+        query = query.filter(LootRecord.raid_party_id == raid_party_id)
+    if start_date is not None:
+        query = query.filter(LootRecord.distribution_date >= start_date)
+    if end_date is not None:
+        query = query.filter(LootRecord.distribution_date < end_date)
+
+    category_codes = {category: code for code, category in enumerate(CATEGORIES)}
+    slot_codes = {slot: code for code, slot in enumerate(SLOTS)}
+    source_codes = {source: code for code, source in enumerate(SOURCES)}
+    columns = {name: [] for name in ["raid_party_id", "player_id", "item_id", "distribution_date", "category", "slot", "source"]}
+    for raid_party_id_, player_id, item_id, distribution_date, category, slot, source in query.yield_per(LOAD_BATCH_SIZE):
+        columns["raid_party_id"].append(raid_party_id_)
+        columns["player_id"].append(player_id)
+        columns["item_id"].append(item_id)
+        columns["distribution_date"].append(distribution_date)
+        columns["category"].append(category_codes[category])
+        columns["slot"].append(slot_codes[slot])
+        columns["source"].append(source_codes[source])
+
+    distribution_dates = np.array(columns.pop("distribution_date"), dtype="datetime64[us]")
+    arrays = {name: np.array(values, dtype=np.int32 if name.endswith("_id") else np.int8) for name, values in columns.items()}
+    arrays["distribution_date"] = distribution_dates
+    # Same week numbers as crud.loot_record.get_week_number
+    arrays["week_number"] = ((distribution_dates - np.datetime64(WEEK_NUMBER_EPOCH, "us")) // np.timedelta64(7, "D")).astype(np.int32)
+    return arrays
+
+def _week_start(week_number: int) -> datetime:
+    return WEEK_NUMBER_EPOCH + timedelta(weeks=int(week_number))
+
+def _get_raid_party_names(db: Session, raid_party_ids) -> Dict[int, str]:
+    raid_party_ids = [int(raid_party_id) for raid_party_id in raid_party_ids]
+    if not raid_party_ids:
+        return {}
+    return dict(db.query(RaidParty.id, RaidParty.name).filter(RaidParty.id.in_(raid_party_ids)).all())
+
+def _gini(np, values) -> Optional[float]:
+    # 0 when every player received the same number of items, towards 1 when one player received everything
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    n = len(values)
+    total = values.sum()
+    if n == 0 or total == 0:
+        return None
+    ranks = np.arange(1, n + 1)
+    return float(2 * (ranks * values).sum() / (n * total) - (n + 1) / n)
+
+def get_grouped_counts(
+    db: Session,
+    group_by: Sequence[str],
+    raid_party_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    np = _numpy()
+    columns = load_loot_columns(db, raid_party_id, start_date, end_date)
+    if len(columns["item_id"]) == 0:
+        return []
+
+    keys = np.stack([columns[name].astype(np.int64) for name in group_by], axis=1)
+    groups, counts = np.unique(keys, axis=0, return_counts=True)
+
+    results = []
+    for group, count in zip(groups.tolist(), counts.tolist()):
+        result = {}
+        for name, value in zip(group_by, group):
+            result[name] = ENUM_COLUMNS[name][value].value if name in ENUM_COLUMNS else value
+        result["total_items"] = count
+        results.append(result)
+    return results
+
+def get_weekly_series(
+    db: Session,
+    raid_party_id: Optional[int] = None,
+    window: int = DEFAULT_ROLLING_WINDOW_WEEKS,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """
+    Items distributed per week for each raid party, from its first to its last week with loot,
+    including weeks without loot, with the mean over the last `window` weeks.
+    """
+    np = _numpy()
+    columns = load_loot_columns(db, raid_party_id, start_date, end_date)
+    raid_party_ids = np.unique(columns["raid_party_id"])
+    names = _get_raid_party_names(db, raid_party_ids)
+
+    series = []
+    for party_id in raid_party_ids.tolist():
+        weeks = columns["week_number"][columns["raid_party_id"] == party_id]
+        first_week = int(weeks.min())
+        counts = np.bincount(weeks - first_week)
+        # Rolling mean over the weeks so far, with fewer weeks at the start of the series
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+        indices = np.arange(1, len(counts) + 1)
+        starts = np.maximum(indices - window, 0)
+        rolling_means = (cumulative[indices] - cumulative[starts]) / (indices - starts)
+
+        series.append({
+            "raid_party_id": party_id,
+            "raid_party_name": names.get(party_id),
+            "weeks": [
+                {
+                    "week_number": first_week + offset,
+                    "week_start": _week_start(first_week + offset),
+                    "items": count,
+                    "rolling_mean": round(rolling_mean, 3),
+                }
+                for offset, (count, rolling_mean) in enumerate(zip(counts.tolist(), rolling_means.tolist()))
+            ],
+        })
+    return series
+
+def _fairness(np, player_ids, loot_player_ids) -> Dict[str, Any]:
+    # Items per player of the roster, including players who received nothing
+    counts = np.zeros(len(player_ids), dtype=np.int64)
+    if len(player_ids) and len(loot_player_ids):
+        positions = np.searchsorted(player_ids, loot_player_ids)
+        positions = np.minimum(positions, len(player_ids) - 1)
+        on_roster = player_ids[positions] == loot_player_ids
+        counts = np.bincount(positions[on_roster], minlength=len(player_ids))
+    return {
+        "items": int(counts.sum()),
+        "mean_items_per_player": float(counts.mean()) if len(counts) else None,
+        "variance": float(counts.var()) if len(counts) else None,
+        "gini": _gini(np, counts),
+    }
+
+def get_fairness(db: Session, raid_party_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    How evenly loot is spread over the current roster of each raid party, over all time
+    and within each raid schedule (season) of the party.
+    """
+    np = _numpy()
+    columns = load_loot_columns(db, raid_party_id)
+
+    roster_query = db.query(Player.raid_party_id, Player.id)
+    schedule_query = db.query(RaidSchedule)
+    if raid_party_id is not None:
+        roster_query = roster_query.filter(Player.raid_party_id == raid_party_id)
+        schedule_query = schedule_query.filter(RaidSchedule.raid_party_id == raid_party_id)
+    rosters = {}
+    for party_id, player_id in roster_query.all():
+        rosters.setdefault(party_id, []).append(player_id)
+    schedules = {}
+    for schedule in schedule_query.order_by(RaidSchedule.start_date).all():
+        schedules.setdefault(schedule.raid_party_id, []).append(schedule)
+    names = _get_raid_party_names(db, rosters)
+
+    results = []
+    for party_id in sorted(rosters):
+        player_ids = np.array(sorted(rosters[party_id]), dtype=np.int32)
+        in_party = columns["raid_party_id"] == party_id
+        result = {"raid_party_id": party_id, "raid_party_name": names.get(party_id), "players": len(player_ids)}
+        result.update(_fairness(np, player_ids, columns["player_id"][in_party]))
+
+        seasons = []
+        for schedule in schedules.get(party_id, []):
+            in_season = in_party & (columns["distribution_date"] >= np.datetime64(schedule.start_date, "us"))
+            if schedule.end_date is not None:
+                # end_date is the last day of the schedule
+                in_season &= columns["distribution_date"] < np.datetime64(schedule.end_date + timedelta(days=1), "us")
+            season = {
+                "raid_schedule_id": schedule.id,
+                "description": schedule.description,
+                "start_date": schedule.start_date,
+                "end_date": schedule.end_date,
+            }
+            season.update(_fairness(np, player_ids, columns["player_id"][in_season]))
+            seasons.append(season)
+        result["seasons"] = seasons
+        results.append(result)
+    return results
+
+def get_time_to_bis(db: Session, raid_party_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    For each player with a BiS set, the number of weeks from the first loot of their raid party
+    until they had received every item they need, or the items still missing.
+    weeks_to_bis is None if their raid party has no loot of its own, e.g. when their loot was recorded
+    under another raid party.
+    """
+    np = _numpy()
+    columns = load_loot_columns(db, raid_party_id)
+
+    roster_query = db.query(Player.id, Player.raid_party_id, Player.character_nickname)
+    if raid_party_id is not None:
+        roster_query = roster_query.filter(Player.raid_party_id == raid_party_id)
+    players = roster_query.order_by(Player.id).all()
+    needed_item_ids = gear_calculation.get_bis_needed_item_ids(db, [player.id for player in players])
+
+    # First week in which each (player, item) was received; a player belongs to a single party
+    keys = (columns["player_id"].astype(np.int64) << 32) | columns["item_id"].astype(np.int64)
+    order = np.lexsort((columns["week_number"], keys))
+    sorted_keys = keys[order]
+    is_first = np.ones(len(sorted_keys), dtype=bool)
+    is_first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    first_keys = sorted_keys[is_first]
+    first_weeks = columns["week_number"][order][is_first]
+
+    # Week of the first loot of each party
+    party_ids, party_indices = np.unique(columns["raid_party_id"], return_inverse=True)
+    party_start_weeks = np.full(len(party_ids), np.iinfo(np.int32).max, dtype=np.int64)
+    np.minimum.at(party_start_weeks, party_indices, columns["week_number"])
+    party_start_weeks = dict(zip(party_ids.tolist(), party_start_weeks.tolist()))
+
+    results = []
+    for player_id, player_party_id, nickname in players:
+        item_ids = sorted(needed_item_ids.get(player_id, ()))
+        if not item_ids:
+            continue # No BiS set, or nothing needed
+
+        wanted = (np.int64(player_id) << 32) | np.array(item_ids, dtype=np.int64)
+        if len(first_keys):
+            positions = np.minimum(np.searchsorted(first_keys, wanted), len(first_keys) - 1)
+            received = first_keys[positions] == wanted
+        else:
+            received = np.zeros(len(wanted), dtype=bool)
+        result = {
+            "player_id": player_id,
+            "character_nickname": nickname,
+            "raid_party_id": player_party_id,
+            "needed_items": len(item_ids),
+            "received_items": int(received.sum()),
+            "missing_item_ids": [item_id for item_id, is_received in zip(item_ids, received.tolist()) if not is_received],
+            "bis_week_number": None,
+            "weeks_to_bis": None,
+        }
+        if received.all():
+            bis_week = int(first_weeks[positions].max())
+            result["bis_week_number"] = bis_week
+            party_start_week = party_start_weeks.get(player_party_id)
+            if party_start_week is not None:
+                result["weeks_to_bis"] = bis_week - party_start_week + 1
+        results.append(result)
+    return results
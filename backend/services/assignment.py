@@ -0,0 +1,79 @@
+from typing import List, Optional
+import time
+
+def solve_max_weight_assignment(weights: List[List[Optional[float]]], deadline: Optional[float] = None) -> List[Optional[int]]:
+    """
+    Assigns every row (e.g. an item) to at most one column (e.g. a player), using each column at most once.
+    weights[row][column] is the value of that pairing, or None if the pairing is not allowed.
+    The result maximizes the number of assigned rows first and the total weight second.
+    Returns, for each row, the assigned column index or None.
+    Raises TimeoutError once time.monotonic() passes deadline, if one is given.
+    """
+    rows = len(weights)
+    if rows == 0:
+        return []
+    columns = max(len(row) for row in weights)
+
+    # Any allowed pairing must be worth more than every possible total of weights, so that
+    # assigning one more row always beats a better total with fewer rows.
+    allowed = [w for row in weights for w in row if w is not None]
+    if not allowed:
+        return [None] * rows
+    bonus = sum(abs(w) for w in allowed) + 1
+
+    # Hungarian algorithm on a minimization matrix with at least as many columns as rows.
+    # Forbidden cells and padding columns cost 0, which is the same as leaving the row unassigned.
+    size = max(rows, columns)
+    cost = [
+        [-(bonus + row[j]) if j < len(row) and row[j] is not None else 0 for j in range(size)]
+        for row in weights
+    ]
+
+    INF = float('inf')
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (size + 1)
+    p = [0] * (size + 1) # p[j] is the row (1-based) assigned to column j
+    way = [0] * (size + 1)
+    for i in range(1, rows + 1):
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("Assignment not solved before the deadline")
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (size + 1)
+        used = [False] * (size + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = INF
+            j1 = 0
+            for j in range(1, size + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(size + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    assignment = [None] * rows
+    for j in range(1, size + 1):
+        row = p[j] - 1
+        if row >= 0 and j - 1 < len(weights[row]) and weights[row][j - 1] is not None:
+            assignment[row] = j - 1
+    return assignment
@@ -0,0 +1,318 @@
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type
+from datetime import datetime, timezone
+import csv
+import json
+
+from .. import crud, schemas
+from ..models.gear_set import GearSet
+from ..models.item import Item
+from ..models.loot_record import LootRecord
+from ..models.player import Player
+from ..models.player_item_priority import PlayerItemPriority
+from ..models.raid_party import RaidParty
+from ..db.unit_of_work import after_commit
+from ..services import loot_planner, recommendations, reference_data
+
+# Records are validated and inserted this many at a time, each chunk in its own transaction,
+# so a large upload neither holds the write lock for long nor has to fit in memory
+BULK_IMPORT_CHUNK_SIZE = 1000
+
+JSON_CONTENT_TYPES = {"application/json"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+
+# A parsed record, or the error that kept it from being parsed, with its 1-based position in the upload
+Record = Tuple[int, Any]
+
+class RecordError(Exception):
+    pass
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig") + "\n"
+    if buffer:
+        yield buffer.decode("utf-8-sig")
+
+async def _iter_ndjson_records(request: Request) -> AsyncIterator[Record]:
+    row = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, RecordError(f"Invalid JSON: {e}")
+
+async def _iter_csv_records(request: Request) -> AsyncIterator[Record]:
+    header = None
+    row = 0
+    pending = ""
+    async for line in _iter_lines(request):
+        # A quoted field may span lines; the record is complete once its quotes are balanced
+        pending += line
+        if pending.count('"') % 2:
+            continue
+        values, pending = next(csv.reader([pending])), ""
+        if not any(value.strip() for value in values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) > len(header):
+            yield row, RecordError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells are left out, so optional fields fall back to their defaults
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+    if pending:
+        yield row + 1, RecordError("Unterminated quoted field")
+
+async def iter_records(request: Request) -> AsyncIterator[Record]:
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if content_type in NDJSON_CONTENT_TYPES:
+        records = _iter_ndjson_records(request)
+    elif content_type in CSV_CONTENT_TYPES:
+        records = _iter_csv_records(request)
+    elif content_type in JSON_CONTENT_TYPES:
+        try:
+            data = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+        for row, record in enumerate(data, start=1):
+            yield row, record
+        return
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type {content_type}, expected JSON, NDJSON or CSV")
+
+    async for record in records:
+        yield record
+
+async def import_request(
+    request: Request,
+    db,
+    import_chunk: Callable[[Session, List[Record]], Dict[str, Any]],
+    finish: Optional[Callable[[Session, List[Dict[str, Any]]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Reads the records of the request body and passes them to import_chunk in chunks,
+    committing after each one. Rows of committed chunks stay imported if a later chunk fails.
+    import_chunk returns a dict with the number of imported rows and the per-row errors;
+    finish, if given, runs once after the last chunk with all of these dicts.
+    """
+    result = {"received": 0, "imported": 0, "errors": []}
+    chunk_results = []
+
+    async def run(chunk: List[Record]):
+        chunk_result = await db.run_sync(import_chunk, chunk)
+        await db.commit()
+        chunk_results.append(chunk_result)
+        result["received"] += len(chunk)
+        result["imported"] += chunk_result["imported"]
+        result["errors"].extend(sorted(chunk_result["errors"], key=lambda error: error["row"]))
+
+    chunk = []
+    async for record in iter_records(request):
+        chunk.append(record)
+        if len(chunk) >= BULK_IMPORT_CHUNK_SIZE:
+            await run(chunk)
+            chunk = []
+    if chunk:
+        await run(chunk)
+
+    if finish is not None:
+        await db.run_sync(finish, chunk_results)
+    return result
+
+def _validate(records: List[Record], schema: Type[BaseModel], errors: List[Dict[str, Any]]) -> List[Tuple[int, BaseModel]]:
+    valid = []
+    for row, record in records:
+        if isinstance(record, RecordError):
+            errors.append({"row": row, "detail": str(record)})
+            continue
+        if not isinstance(record, dict):
+            errors.append({"row": row, "detail": "Expected an object"})
+            continue
+        try:
+            valid.append((row, schema(**record)))
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors())
+            errors.append({"row": row, "detail": detail})
+    return valid
+
+def _get_existing_values(db: Session, column, ids) -> set:
+    ids = list(set(ids))
+    if not ids:
+        return set()
+    return {value for value, in db.query(column).filter(column.in_(ids)).all()}
+
+def import_items(db: Session, records: List[Record]) -> Dict[str, Any]:
+    errors = []
+    items = _validate(records, schemas.ItemCreate, errors)
+
+    existing_names = _get_existing_values(db, Item.name, [item.name for _, item in items])
+    new_items = []
+    for row, item in items:
+        if item.name in existing_names:
+            errors.append({"row": row, "detail": "Item already registered"})
+            continue
+        existing_names.add(item.name) # Also rejects repeats within the upload
+        new_items.append(item)
+
+    crud.item.create_items(db, new_items)
+    return {"imported": len(new_items), "errors": errors}
+
+def _normalize_gear_set_record(record: Any) -> Any:
+    # CSV rows list the items of a set as "item_ids", separated by semicolons
+    if isinstance(record, dict) and "item_ids" in record and "items" not in record:
+        record = dict(record)
+        item_ids = record.pop("item_ids")
+        if isinstance(item_ids, str):
+            item_ids = [item_id.strip() for item_id in item_ids.split(";") if item_id.strip()]
+        record["items"] = [{"item_id": item_id} for item_id in item_ids]
+    return record
+
+def import_gear_sets(db: Session, records: List[Record]) -> Dict[str, Any]:
+    errors = []
+    gear_sets = _validate([(row, _normalize_gear_set_record(record)) for row, record in records], schemas.GearSetCreate, errors)
+
+    player_ids = {gear_set.player_id for _, gear_set in gear_sets}
+    raid_party_ids = dict(db.query(Player.id, Player.raid_party_id).filter(Player.id.in_(player_ids)).all()) if player_ids else {}
+    items = reference_data.get_items(db, {item.item_id for _, gear_set in gear_sets for item in gear_set.items})
+    existing_sets = set(db.query(GearSet.player_id, GearSet.set_type).filter(GearSet.player_id.in_(player_ids)).all()) if player_ids else set()
+
+    new_gear_sets = []
+    for row, gear_set in gear_sets:
+        if gear_set.player_id not in raid_party_ids:
+            errors.append({"row": row, "detail": "Player not found"})
+        elif any(items[item.item_id] is None for item in gear_set.items):
+            errors.append({"row": row, "detail": "Item not found"})
+        elif (gear_set.player_id, gear_set.set_type) in existing_sets:
+            errors.append({"row": row, "detail": "Gear set of this type already exists for this player"})
+        else:
+            existing_sets.add((gear_set.player_id, gear_set.set_type))
+            new_gear_sets.append(gear_set)
+
+    crud.gear_set.create_gear_sets(db, new_gear_sets)
+    for raid_party_id in {raid_party_ids[gear_set.player_id] for gear_set in new_gear_sets}:
+        after_commit(db, loot_planner.invalidate_plan, raid_party_id)
+    return {"imported": len(new_gear_sets), "errors": errors}
+
+def import_player_item_priorities(db: Session, records: List[Record]) -> Dict[str, Any]:
+    errors = []
+    priorities = _validate(records, schemas.PlayerItemPriorityCreate, errors)
+
+    player_ids = {priority.player_id for _, priority in priorities}
+    existing_player_ids = _get_existing_values(db, Player.id, player_ids)
+    existing_raid_party_ids = _get_existing_values(db, RaidParty.id, [priority.raid_party_id for _, priority in priorities])
+    items = reference_data.get_items(db, {priority.item_id for _, priority in priorities})
+    existing_keys = set(db.query(
+        PlayerItemPriority.player_id,
+        PlayerItemPriority.item_id,
+        PlayerItemPriority.raid_party_id
+    ).filter(PlayerItemPriority.player_id.in_(player_ids)).all()) if player_ids else set()
+
+    new_priorities = []
+    for row, priority in priorities:
+        key = (priority.player_id, priority.item_id, priority.raid_party_id)
+        if priority.player_id not in existing_player_ids:
+            errors.append({"row": row, "detail": "Player not found"})
+        elif items[priority.item_id] is None:
+            errors.append({"row": row, "detail": "Item not found"})
+        elif priority.raid_party_id not in existing_raid_party_ids:
+            errors.append({"row": row, "detail": "Raid party not found"})
+        elif key in existing_keys:
+            errors.append({"row": row, "detail": "Priority for this player, item, and raid party already exists"})
+        else:
+            existing_keys.add(key)
+            new_priorities.append(priority)
+
+    crud.player_item_priority.create_player_item_priorities(db, new_priorities)
+    for raid_party_id in {priority.raid_party_id for priority in new_priorities}:
+        after_commit(db, loot_planner.invalidate_plan, raid_party_id)
+    return {"imported": len(new_priorities), "errors": errors}
+
+def import_loot_records(db: Session, records: List[Record]) -> Dict[str, Any]:
+    """
+    Imports loot history. Records without a distribution date are dated now.
+    Records are inserted in date order, so that weekly lockouts and eat-and-go cycles advance as they
+    would have when the loot was recorded one by one. Records older than the latest loot of their raid party
+    cannot be replayed that way; finish_loot_record_import then rebuilds the cycles.
+    """
+    errors = []
+    loot_records = _validate(records, schemas.LootRecordImport, errors)
+    now = datetime.utcnow()
+    for _, loot_record in loot_records:
+        if loot_record.distribution_date is None:
+            loot_record.distribution_date = now
+        elif loot_record.distribution_date.tzinfo is not None:
+            # Dates are stored as naive UTC
+            loot_record.distribution_date = loot_record.distribution_date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    player_ids = {loot_record.player_id for _, loot_record in loot_records}
+    raid_party_ids = {loot_record.raid_party_id for _, loot_record in loot_records}
+    existing_player_ids = _get_existing_values(db, Player.id, player_ids)
+    existing_raid_party_ids = _get_existing_values(db, RaidParty.id, raid_party_ids)
+    items = reference_data.get_items(db, {loot_record.item_id for _, loot_record in loot_records})
+
+    # The same player, item, raid party and date is taken to be the same drop imported twice
+    existing_keys = set()
+    if loot_records:
+        existing_keys = set(db.query(
+            LootRecord.player_id,
+            LootRecord.item_id,
+            LootRecord.raid_party_id,
+            LootRecord.distribution_date
+        ).filter(
+            LootRecord.player_id.in_(player_ids),
+            LootRecord.distribution_date.in_({loot_record.distribution_date for _, loot_record in loot_records})
+        ).all())
+
+    new_loot_records = []
+    for row, loot_record in loot_records:
+        key = (loot_record.player_id, loot_record.item_id, loot_record.raid_party_id, loot_record.distribution_date)
+        if loot_record.player_id not in existing_player_ids:
+            errors.append({"row": row, "detail": "Player not found"})
+        elif items[loot_record.item_id] is None:
+            errors.append({"row": row, "detail": "Item not found"})
+        elif loot_record.raid_party_id not in existing_raid_party_ids:
+            errors.append({"row": row, "detail": "Raid party not found"})
+        elif key in existing_keys:
+            errors.append({"row": row, "detail": "Loot record already exists"})
+        else:
+            existing_keys.add(key)
+            new_loot_records.append(loot_record)
+
+    if not new_loot_records:
+        return {"imported": 0, "errors": errors, "out_of_order": False}
+
+    new_loot_records.sort(key=lambda loot_record: loot_record.distribution_date)
+    latest_dates = dict(db.query(LootRecord.raid_party_id, func.max(LootRecord.distribution_date)).filter(
+        LootRecord.raid_party_id.in_({loot_record.raid_party_id for loot_record in new_loot_records})
+    ).group_by(LootRecord.raid_party_id).all())
+    out_of_order = any(
+        latest_dates.get(loot_record.raid_party_id) is not None
+        and loot_record.distribution_date < latest_dates[loot_record.raid_party_id]
+        for loot_record in new_loot_records
+    )
+
+    crud.loot_record.create_loot_records(db, new_loot_records)
+    for raid_party_id in {loot_record.raid_party_id for loot_record in new_loot_records}:
+        after_commit(db, loot_planner.invalidate_plan, raid_party_id)
+    return {"imported": len(new_loot_records), "errors": errors, "out_of_order": out_of_order}
+
+def finish_loot_record_import(db: Session, chunk_results: List[Dict[str, Any]]):
+    if any(chunk_result["out_of_order"] for chunk_result in chunk_results):
+        crud.loot_record.rebuild_eat_and_go_cycles(db)
+        loot_planner.invalidate_plan()
+        recommendations.invalidate_raid_party()
@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+import threading
+
+from . import invalidation
+
+_caches: List["VersionedCache"] = []
+
+# Prefix invalidations are published under the cache's name with this suffix
+PREFIX_SUFFIX = ":prefix"
+
+class VersionedCache:
+    """
+    Bounded, thread-safe, process-local LRU cache.
+    Every invalidation bumps the version, and values loaded under an older version are not stored,
+    so a read racing with a write can never put stale data back into the cache.
+    None is a valid cached value, e.g. for "no item with this name".
+    Invalidations are published to the other workers under the cache's name (see services.invalidation).
+    Caches with tuple keys can also drop every key starting with a prefix, e.g. everything of one raid party.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024):
+        self.name = name
+        self.maxsize = maxsize
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.append(self)
+        invalidation.register(name, self._invalidate_local)
+        invalidation.register(name + PREFIX_SUFFIX, self._invalidate_local_prefix)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        return self.get_many([key], lambda keys: {key: loader()})[key]
+
+    def get_many(self, keys: Iterable[Hashable], loader: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """
+        Returns the values of all keys, calling loader once with the missing keys.
+        loader must return a value for every key it is given. Values it returns for other keys,
+        e.g. ones it could compute at no extra cost, are cached as well.
+        """
+        if not invalidation.caching_enabled():
+            return loader(list(dict.fromkeys(keys)))
+
+        values = {}
+        missing_keys = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    values[key] = self._entries[key]
+                    self.hits += 1
+                else:
+                    missing_keys.append(key)
+                    self.misses += 1
+            version = self.version
+
+        if missing_keys:
+            loaded_values = loader(missing_keys)
+            with self._lock:
+                if version == self.version:
+                    for key, value in loaded_values.items():
+                        self._entries[key] = value
+                        self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            values.update((key, loaded_values[key]) for key in missing_keys)
+
+        return values
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        # None drops every entry, here and in the other workers
+        self._invalidate_local(key)
+        invalidation.publish(self.name, key)
+
+    def _invalidate_local(self, key: Optional[Hashable] = None):
+        with self._lock:
+            self.version += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix: Tuple):
+        # Drops every tuple key starting with prefix, here and in the other workers
+        self._invalidate_local_prefix(prefix)
+        invalidation.publish(self.name + PREFIX_SUFFIX, prefix)
+
+    def _invalidate_local_prefix(self, prefix: Optional[Tuple] = None):
+        if prefix is None:
+            return self._invalidate_local(None)
+        with self._lock:
+            self.version += 1
+            for key in [key for key in self._entries if isinstance(key, tuple) and key[:len(prefix)] == prefix]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+def get_cache_stats() -> List[Dict[str, Any]]:
+    return [cache.stats() for cache in _caches]
@@ -1,41 +1,71 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable
 
+from ..models.item import ItemSource
+from ..models.loot_record import LootRecord
 from ..models.player import Player
-from ..models.item import Item
 from ..models.raid_party import RaidParty
 from ..crud import loot_record, player_item_priority
-from ..services import gear_calculation
+from ..services import gear_calculation, metrics, reference_data
+from ..services.recommendations import recommendation_cache
+from ..services.assignment import solve_max_weight_assignment
 
-def determine_item_recipient(db: Session, raid_party_id: int, item_id: int) -> Optional[Dict[str, Any]]:
-    raid_party = db.query(RaidParty).filter(RaidParty.id == raid_party_id).first()
+def load_distribution_state(db: Session, raid_party_id: int, item_ids: Iterable[int]) -> Optional[Dict[str, Any]]:
+    """
+    Loads everything the distribution rules need for a raid party and a set of items.
+    The number of queries is fixed, no matter how many players are in the party.
+    """
+    raid_party = reference_data.get_raid_party(db, raid_party_id)
     if not raid_party:
         return None # Raid party not found
 
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
-        return None # Item not found
+    items = {item_id: item for item_id, item in reference_data.get_items(db, item_ids).items() if item is not None}
+
+    players = db.query(Player).filter(Player.raid_party_id == raid_party_id).order_by(Player.id).all()
+    player_ids = [player.id for player in players]
+
+    return {
+        "raid_party": raid_party,
+        "items": items,
+        "players": players,
+        "player_ids": set(player_ids),
+        "weekly_recipient_ids": loot_record.get_players_who_received_item_this_week(db, player_ids),
+        "cycle_member_ids": loot_record.get_eat_and_go_cycle_members(db, raid_party_id, items.keys()),
+        "priority_orders": player_item_priority.get_priority_orders_by_raid_party(db, raid_party_id, items.keys()),
+        "bis_needed_item_ids": gear_calculation.get_bis_needed_item_ids(db, player_ids),
+    }
 
+def rank_candidates(state: Dict[str, Any], item_id: int, outcomes: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    Scores every eligible player of the loaded state for one item, best candidate first.
+    Works purely in memory on the result of load_distribution_state.
+    If outcomes is given, the number of players found eligible or skipped by each rule is added to it.
+    """
     eligible_candidates = []
+    cycle_member_ids = state["cycle_member_ids"].get(item_id, set())
+    skipped_by_weekly_lockout = 0
+    skipped_by_eat_and_go = 0
 
-    for player in raid_party.players:
+    for player in state["players"]:
         # 1. Check "One item per week" rule
-        if loot_record.has_received_item_this_week(db, player.id):
+        if player.id in state["weekly_recipient_ids"]:
+            skipped_by_weekly_lockout += 1
             continue # Player is not eligible this week
 
         # 2. Check "Eat and Go" rule
-        if not loot_record.is_eligible_for_eat_and_go(db, player.id, item.id, raid_party_id):
+        if not loot_record.is_eat_and_go_eligible(player.id, cycle_member_ids, state["player_ids"]):
+            skipped_by_eat_and_go += 1
             continue # Player is not eligible due to Eat and Go rule
 
         # 3. Evaluate Priority and BiS Needs
         priority_score = 0
-        player_priority = player_item_priority.get_player_item_priority(db, player.id, item.id, raid_party_id)
-        if player_priority:
+        priority_order = state["priority_orders"].get((player.id, item_id))
+        if priority_order is not None:
             # Lower priority_order means higher priority (e.g., 1 is highest)
-            priority_score = 100 - player_priority.priority_order # Convert to a score where higher is better
+            priority_score = 100 - priority_order # Convert to a score where higher is better
 
-        bis_needs = gear_calculation.calculate_bis_needs(db, player.id)
-        is_needed_for_bis = any(needed_item['item_id'] == item.id for needed_item in bis_needs)
+        is_needed_for_bis = item_id in state["bis_needed_item_ids"].get(player.id, set())
 
         bis_score = 0
         if is_needed_for_bis:
@@ -47,21 +77,182 @@ def determine_item_recipient(db: Session, raid_party_id: int, item_id: int) -> O
         eligible_candidates.append({
             "player": player,
             "score": total_score,
-            "priority_order": player_priority.priority_order if player_priority else None,
+            "priority_order": priority_order,
             "is_needed_for_bis": is_needed_for_bis
         })
-    
+
+    if outcomes is not None:
+        outcomes["eligible"] = outcomes.get("eligible", 0) + len(eligible_candidates)
+        outcomes["weekly_lockout"] = outcomes.get("weekly_lockout", 0) + skipped_by_weekly_lockout
+        outcomes["eat_and_go"] = outcomes.get("eat_and_go", 0) + skipped_by_eat_and_go
+
     # Sort candidates by score (descending) and then by priority_order (ascending if scores are equal)
     eligible_candidates.sort(key=lambda x: (x['score'], -(x['priority_order'] if x['priority_order'] is not None else float('inf'))), reverse=True)
+    return eligible_candidates
+
+def get_chest_item_ids(db: Session, raid_party_id: int) -> List[int]:
+    """
+    The savage raid drops a BiS set of the raid party still needs: the chest items of the current tier
+    it asks about on raid night, since drops of older tiers are in nobody's BiS set anymore.
+    """
+    player_ids = [player_id for player_id, in db.query(Player.id).filter(Player.raid_party_id == raid_party_id).all()]
+    bis_needs = gear_calculation.calculate_bis_needs_for_players(db, player_ids)
+    return sorted({
+        needed_item['item_id']
+        for needed_items in bis_needs.values()
+        for needed_item in needed_items
+        if needed_item['item_source'] == ItemSource.SAVAGE_RAID
+    })
+
+def _snapshot_candidate(candidate: Dict[str, Any]) -> Dict[str, Any]:
+    # Cached rankings are shared between sessions, so they hold plain values rather than ORM instances
+    player = candidate['player']
+    return {
+        "player_id": player.id,
+        "character_nickname": player.character_nickname,
+        "user_id": player.user_id,
+        "job_id": player.job_id,
+        "score": candidate['score'],
+        "priority_order": candidate['priority_order'],
+        "is_needed_for_bis": candidate['is_needed_for_bis']
+    }
+
+def _get_rankings(db: Session, raid_party_id: int, item_ids: Iterable[int]) -> Optional[Dict[int, Dict[str, Any]]]:
+    # Cached ranking of each existing item: its candidates, and the number of players per outcome of the rules
+    if reference_data.get_raid_party(db, raid_party_id) is None:
+        return None # Raid party not found
+
+    items = {item_id: item for item_id, item in reference_data.get_items(db, item_ids).items() if item is not None}
+    week_number = loot_record.get_week_number()
+
+    def load(keys: List[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        loaded_item_ids = {item_id for _, item_id, _ in keys}
+        if any(items[item_id]["source"] == ItemSource.SAVAGE_RAID for item_id in loaded_item_ids):
+            # The other chest items of the raid party are ranked from the same state,
+            # so that the rest of raid night is served from memory
+            loaded_item_ids.update(get_chest_item_ids(db, raid_party_id))
+        state = load_distribution_state(db, raid_party_id, sorted(loaded_item_ids))
+        rankings = {}
+        for item_id in state["items"]:
+            outcomes = {}
+            candidates = rank_candidates(state, item_id, outcomes)
+            rankings[(raid_party_id, item_id, week_number)] = {
+                "candidates": [_snapshot_candidate(candidate) for candidate in candidates],
+                "outcomes": outcomes,
+            }
+        return rankings
+
+    rankings = recommendation_cache.get_many([(raid_party_id, item_id, week_number) for item_id in items], load)
+    return {item_id: rankings[(raid_party_id, item_id, week_number)] for item_id in items}
+
+def get_ranked_candidates(db: Session, raid_party_id: int, item_ids: Iterable[int]) -> Optional[Dict[int, List[Dict[str, Any]]]]:
+    """
+    Every eligible player of the raid party for each existing item, best candidate first, as rank_candidates orders them.
+    Rankings come from the recommendation cache; the missing ones are computed with a single load_distribution_state.
+    The returned lists are shared with the cache and must not be modified.
+    """
+    rankings = _get_rankings(db, raid_party_id, item_ids)
+    if rankings is None:
+        return None
+    return {item_id: ranking["candidates"] for item_id, ranking in rankings.items()}
+
+def warm_recommendations(db: Session, max_entries: int) -> int:
+    """
+    Ranks the chest items of the raid parties that recorded loot most recently,
+    stopping before the rankings would overflow max_entries. Returns the number of rankings.
+    """
+    latest_loot = func.max(LootRecord.distribution_date)
+    raid_party_ids = db.query(RaidParty.id).outerjoin(
+        LootRecord, LootRecord.raid_party_id == RaidParty.id
+    ).group_by(RaidParty.id).order_by(
+        latest_loot.is_(None), latest_loot.desc(), RaidParty.id
+    ).all()
+
+    count = 0
+    for raid_party_id, in raid_party_ids:
+        item_ids = get_chest_item_ids(db, raid_party_id)
+        if count + len(item_ids) > max_entries:
+            break
+        get_ranked_candidates(db, raid_party_id, item_ids)
+        count += len(item_ids)
+    return count
+
+def _count_candidates(ranking: Dict[str, Any]):
+    # For every decision, whether or not its ranking came from the cache, like DISTRIBUTION_DECISIONS
+    for outcome, count in ranking["outcomes"].items():
+        metrics.DISTRIBUTION_CANDIDATES.inc(count, outcome=outcome)
+
+def determine_item_recipient(db: Session, raid_party_id: int, item_id: int) -> Optional[Dict[str, Any]]:
+    rankings = _get_rankings(db, raid_party_id, [item_id])
+    if rankings is None:
+        return None # Raid party not found
+
+    if item_id not in rankings:
+        return None # Item not found
+
+    eligible_candidates = rankings[item_id]["candidates"]
+    _count_candidates(rankings[item_id])
+    metrics.DISTRIBUTION_DECISIONS.inc(outcome="assigned" if eligible_candidates else "no_recipient")
 
     if eligible_candidates:
         # Return the top candidate's player details
-        top_candidate_player = eligible_candidates[0]['player']
+        top_candidate = eligible_candidates[0]
         return {
-            "player_id": top_candidate_player.id,
-            "character_nickname": top_candidate_player.character_nickname,
-            "user_id": top_candidate_player.user_id,
-            "job_id": top_candidate_player.job_id,
-            "score": eligible_candidates[0]['score']
+            "player_id": top_candidate['player_id'],
+            "character_nickname": top_candidate['character_nickname'],
+            "user_id": top_candidate['user_id'],
+            "job_id": top_candidate['job_id'],
+            "score": top_candidate['score']
         }
     return None
+
+def determine_chest_assignment(db: Session, raid_party_id: int, item_ids: List[int]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Assigns every drop of a clear at once. Each player receives at most one item of the batch,
+    since receiving any item locks them out for the rest of the week.
+    Returns one entry per requested item id, in order, with a player_id of None when nobody is eligible.
+    """
+    rankings = _get_rankings(db, raid_party_id, item_ids)
+    if rankings is None:
+        return None # Raid party not found
+
+    # Players who are eligible for at least one of the items, by id
+    player_ids = sorted({candidate['player_id'] for ranking in rankings.values() for candidate in ranking["candidates"]})
+    player_indexes = {player_id: index for index, player_id in enumerate(player_ids)}
+
+    ranked_candidates = []
+    weights = []
+    for item_id in item_ids:
+        candidates = []
+        if item_id in rankings:
+            candidates = rankings[item_id]["candidates"]
+            _count_candidates(rankings[item_id])
+        ranked_candidates.append({candidate['player_id']: candidate for candidate in candidates})
+
+        # Scores are integers, so this tie-breaker only decides between assignments with the same
+        # total score, in favour of the per-item ranking of rank_candidates
+        row = [None] * len(player_ids)
+        for rank, candidate in enumerate(candidates):
+            tie_breaker = (len(player_ids) - rank) / ((len(player_ids) + 1) * (len(item_ids) + 1))
+            row[player_indexes[candidate['player_id']]] = candidate['score'] + tie_breaker
+        weights.append(row)
+
+    assignment = solve_max_weight_assignment(weights)
+
+    results = []
+    for item_id, candidates, player_index in zip(item_ids, ranked_candidates, assignment):
+        metrics.DISTRIBUTION_DECISIONS.inc(outcome="no_recipient" if player_index is None else "assigned")
+        if player_index is None:
+            results.append({"item_id": item_id, "player_id": None})
+            continue
+
+        candidate = candidates[player_ids[player_index]]
+        results.append({
+            "item_id": item_id,
+            "player_id": candidate['player_id'],
+            "character_nickname": candidate['character_nickname'],
+            "user_id": candidate['user_id'],
+            "job_id": candidate['job_id'],
+            "score": candidate['score']
+        })
+    return results
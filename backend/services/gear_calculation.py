@@ -1,39 +1,77 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Set
 
-from ..models.player import Player
 from ..models.gear_set import GearSet, GearSetType, GearSetItem
 from ..models.item import Item
+from ..services.cache import VersionedCache
+
+# Needed items per player, with the set of their ids for membership tests.
+# Entries are dropped by invalidate_bis_needs whenever a gear set or loot record of the player is written.
+bis_needs_cache = VersionedCache("bis_needs", maxsize=4096)
 
 def calculate_bis_needs(db: Session, player_id: int) -> List[Dict[str, Any]]:
-    player = db.query(Player).filter(Player.id == player_id).first()
-    if not player:
-        return []
-
-    bis_gear_set = db.query(GearSet).filter(
-        GearSet.player_id == player_id,
-        GearSet.set_type == GearSetType.BIS
-    ).first()
-
-    starting_gear_set = db.query(GearSet).filter(
-        GearSet.player_id == player_id,
-        GearSet.set_type == GearSetType.STARTING
-    ).first()
-
-    if not bis_gear_set:
-        return [] # No BiS set defined, so no needs
-
-    bis_items = {gsi.item.name: gsi.item for gsi in bis_gear_set.gear_set_items}
-    starting_items = {gsi.item.name: gsi.item for gsi in starting_gear_set.gear_set_items} if starting_gear_set else {}
-
-    needed_items = []
-    for bis_item_name, bis_item in bis_items.items():
-        if bis_item_name not in starting_items:
-            needed_items.append({
-                "item_id": bis_item.id,
-                "item_name": bis_item.name,
-                "item_slot": bis_item.slot.value,
-                "item_source": bis_item.source.value
-            })
-    
-    return needed_items
+    return calculate_bis_needs_for_players(db, [player_id]).get(player_id, [])
+
+def calculate_bis_needs_for_players(db: Session, player_ids: Iterable[int]) -> Dict[int, List[Dict[str, Any]]]:
+    return {player_id: list(entry["needed_items"]) for player_id, entry in _get_bis_needs_entries(db, player_ids).items()}
+
+def get_bis_needed_item_ids(db: Session, player_ids: Iterable[int]) -> Dict[int, Set[int]]:
+    return {player_id: entry["item_ids"] for player_id, entry in _get_bis_needs_entries(db, player_ids).items()}
+
+def invalidate_bis_needs(player_id: Optional[int] = None):
+    # None drops the needs of every player
+    bis_needs_cache.invalidate(player_id)
+
+def _get_bis_needs_entries(db: Session, player_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    def load(missing_player_ids: List[int]):
+        return {
+            player_id: {
+                "needed_items": needed_items,
+                "item_ids": frozenset(needed_item["item_id"] for needed_item in needed_items),
+            }
+            for player_id, needed_items in _load_bis_needs(db, missing_player_ids).items()
+        }
+
+    return bis_needs_cache.get_many(player_ids, load)
+
+def _load_bis_needs(db: Session, player_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    # Load the starting and BiS sets of every player, with their items, in a single query
+    rows = db.query(GearSet.id, GearSet.player_id, GearSet.set_type, Item).outerjoin(
+        GearSetItem, GearSetItem.gear_set_id == GearSet.id
+    ).outerjoin(
+        Item, Item.id == GearSetItem.item_id
+    ).filter(
+        GearSet.player_id.in_(player_ids)
+    ).order_by(GearSet.id, GearSetItem.id).all()
+
+    # Only the first gear set of each type counts for a player
+    gear_set_ids = {}
+    gear_set_items = {}
+    for gear_set_id, player_id, set_type, item in rows:
+        if gear_set_ids.setdefault((player_id, set_type), gear_set_id) != gear_set_id:
+            continue
+        items = gear_set_items.setdefault((player_id, set_type), {})
+        if item is not None:
+            items[item.name] = item
+
+    bis_needs = {}
+    for player_id in player_ids:
+        bis_items = gear_set_items.get((player_id, GearSetType.BIS))
+        if not bis_items:
+            bis_needs[player_id] = [] # No BiS set defined, so no needs
+            continue
+
+        starting_items = gear_set_items.get((player_id, GearSetType.STARTING), {})
+
+        needed_items = []
+        for bis_item_name, bis_item in bis_items.items():
+            if bis_item_name not in starting_items:
+                needed_items.append({
+                    "item_id": bis_item.id,
+                    "item_name": bis_item.name,
+                    "item_slot": bis_item.slot.value,
+                    "item_source": bis_item.source.value
+                })
+        bis_needs[player_id] = needed_items
+
+    return bis_needs
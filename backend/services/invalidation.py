@@ -0,0 +1,363 @@
+"""
+Invalidation of the in-process caches across workers.
+
+Every cache registers a handler under its name. A worker that changes data invalidates its own cache
+as before, and publishes the invalidation so that the other workers run the handler too. The bus is
+chosen with RAID_MANAGER_INVALIDATION_BUS:
+
+- local (default): nothing is shared, for a single worker
+- sqlite: polls PRAGMA data_version of the SQLite database, and drops every cache whenever any
+  connection committed a change. Needs no setup, but invalidates more than needed.
+- file: appends each invalidation to the file RAID_MANAGER_INVALIDATION_URL, which every worker
+  on the host follows. Past RAID_MANAGER_INVALIDATION_FILE_MAX_BYTES, the file is rotated to
+  RAID_MANAGER_INVALIDATION_URL + ".1", where workers read what they had not seen yet.
+- redis: publishes to a channel of the Redis server RAID_MANAGER_INVALIDATION_URL, for workers on
+  several hosts. Needs redis-py (pip install redis).
+
+Other workers apply an invalidation after at most RAID_MANAGER_INVALIDATION_POLL_MS.
+
+Other messages for the workers, such as the live loot feed, go through the same bus on channels of
+their own (broadcast and listen), and are counted apart from invalidations.
+
+Without a bus, caching is only safe in a single worker. It stays on when WEB_CONCURRENCY is 1, or when it
+is unset and this process was not started by a process manager (uvicorn --workers or --reload, gunicorn).
+"""
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+BUS = os.getenv("RAID_MANAGER_INVALIDATION_BUS", "local").lower()
+BUS_URL = os.getenv("RAID_MANAGER_INVALIDATION_URL", "")
+POLL_INTERVAL = int(os.getenv("RAID_MANAGER_INVALIDATION_POLL_MS", "100")) / 1000
+REDIS_CHANNEL = "raid_manager:invalidation"
+FILE_MAX_BYTES = int(os.getenv("RAID_MANAGER_INVALIDATION_FILE_MAX_BYTES", str(1024 * 1024)))
+
+# Number of worker processes, as set for uvicorn and gunicorn; None when the deployment does not say
+WORKERS = int(os.environ["WEB_CONCURRENCY"]) if os.getenv("WEB_CONCURRENCY") else None
+
+# Stands for every key of every cache, e.g. when the bus cannot tell what changed
+ALL = object()
+
+_handlers: Dict[str, Callable[[Optional[Hashable]], None]] = {}
+_stats = {"published": 0, "received": 0, "full": 0}
+_listeners: Dict[str, Callable[[Optional[Any]], None]] = {}
+_channel_stats: Dict[Tuple[str, str], int] = {}
+_stats_lock = threading.Lock()
+_bus = None
+_listener: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+def is_shared() -> bool:
+    return BUS != "local"
+
+def _started_by_process_manager() -> bool:
+    # uvicorn runs --workers and --reload processes with multiprocessing; gunicorn forks its workers from its arbiter.
+    # Neither sets WEB_CONCURRENCY, and either may run several workers.
+    return multiprocessing.parent_process() is not None or "gunicorn" in sys.modules
+
+def caching_enabled() -> bool:
+    # Without a shared bus, a worker cannot tell the others to drop what it changed
+    if is_shared():
+        return True
+    if WORKERS is not None:
+        return WORKERS <= 1
+    return not _started_by_process_manager()
+
+def register(name: str, invalidate: Callable[[Optional[Hashable]], None]):
+    """invalidate(key) drops one entry of the cache of this worker, invalidate(None) all of them."""
+    _handlers[name] = invalidate
+
+def _origin() -> str:
+    # Computed on every call, as workers forked from a preloaded app share its module state
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def can_broadcast() -> bool:
+    # The sqlite bus only notices that something changed, it carries no messages
+    return _bus is not None and _bus.publishes
+
+def _send(message: Dict[str, Any], description: str) -> bool:
+    if not can_broadcast():
+        return False
+    message["origin"] = _origin()
+    try:
+        _bus.publish(json.dumps(message))
+    except Exception:
+        # The data is committed already; other workers catch up when their bus reconnects
+        logger.exception("Could not publish %s", description)
+        return False
+    return True
+
+def publish(name: str, key: Optional[Hashable] = None):
+    # Tells the other workers; the caller invalidates its own cache
+    if _send({"cache": name, "key": key}, f"the invalidation of {name}"):
+        with _stats_lock:
+            _stats["published"] += 1
+
+def listen(channel: str, receive: Callable[[Optional[Any]], None]):
+    """
+    receive(data) runs, on the bus' listener thread, for what other workers broadcast on the channel.
+    receive(None) means that messages may have been lost, e.g. while the bus reconnected.
+    """
+    _listeners[channel] = receive
+
+def broadcast(channel: str, data: Any):
+    # To the other workers only; the caller handles its own worker
+    if _send({"channel": channel, "data": data}, f"a message on {channel}"):
+        _count_message(channel, "sent")
+
+def _count_message(channel: str, direction: str):
+    with _stats_lock:
+        _channel_stats[(channel, direction)] = _channel_stats.get((channel, direction), 0) + 1
+
+def _invalidate_all():
+    with _stats_lock:
+        _stats["full"] += 1
+    for invalidate in list(_handlers.values()):
+        invalidate(None)
+    if can_broadcast():
+        # A bus that carries messages lost some; the sqlite bus carries none, so there is nothing to catch up on
+        for receive in list(_listeners.values()):
+            receive(None)
+
+def _apply(message):
+    if message is ALL:
+        return _invalidate_all()
+    event = json.loads(message)
+    if event["origin"] == _origin():
+        return
+    if "channel" in event:
+        receive = _listeners.get(event["channel"])
+        if receive is not None:
+            _count_message(event["channel"], "received")
+            receive(event["data"])
+        return
+    invalidate = _handlers.get(event["cache"])
+    if invalidate is None:
+        return
+    with _stats_lock:
+        _stats["received"] += 1
+    key = event["key"]
+    # JSON turns tuple keys into lists
+    invalidate(tuple(key) if isinstance(key, list) else key)
+
+def get_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+def get_channel_stats() -> Dict[Tuple[str, str], int]:
+    # Messages per (channel, direction), sent or received
+    with _stats_lock:
+        return dict(_channel_stats)
+
+class FileBus:
+    """
+    Each invalidation is one line appended to a file; lines this short are written atomically.
+    Past FILE_MAX_BYTES the file is renamed to path + ".1" and a new one is started. Writers hold a shared
+    lock on the file while appending and the rename happens under an exclusive one, so nothing is written to
+    the old file once it is renamed, and readers finish it before following the new one.
+    """
+
+    publishes = True
+
+    def __init__(self, path: str):
+        if not path:
+            raise RuntimeError("The file invalidation bus needs RAID_MANAGER_INVALIDATION_URL set to a file path")
+        self.path = path
+        self.rotated_path = path + ".1"
+        # Only invalidations published after this worker started matter
+        self.inode, self.offset = self._stat(path)
+
+    @staticmethod
+    def _stat(path: str) -> Tuple[Optional[int], int]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    def _open(self) -> int:
+        # The current file, locked against rotation until it is closed
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if self._stat(self.path)[0] == os.fstat(fd).st_ino:
+                return fd
+            os.close(fd) # Rotated since it was opened
+
+    def publish(self, message: str):
+        fd = self._open()
+        try:
+            os.write(fd, message.encode() + b"\n")
+            rotate = os.fstat(fd).st_size > FILE_MAX_BYTES
+        finally:
+            os.close(fd)
+        if rotate:
+            self._rotate()
+
+    def _rotate(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # Another worker may have rotated it while this one waited for the lock
+            if self._stat(self.path)[0] == os.fstat(fd).st_ino and os.fstat(fd).st_size > FILE_MAX_BYTES:
+                os.replace(self.path, self.rotated_path)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_lines(path: str, offset: int) -> Tuple[List[str], int]:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # A line still being written is read on the next poll
+        complete = data[:data.rfind(b"\n") + 1]
+        return [line.decode() for line in complete.splitlines() if line], offset + len(complete)
+
+    def poll(self, timeout: float) -> List:
+        _stop.wait(timeout)
+        inode, size = self._stat(self.path)
+        messages = []
+        if inode != self.inode:
+            if self.inode is not None:
+                if self._stat(self.rotated_path)[0] != self.inode:
+                    # Deleted, replaced, or rotated twice since the last poll, so invalidations may have been missed
+                    self.inode, self.offset = inode, 0
+                    return [ALL]
+                messages, _ = self._read_lines(self.rotated_path, self.offset)
+            self.inode, self.offset = inode, 0
+        if size < self.offset:
+            # Truncated, so invalidations may have been missed
+            self.offset = 0
+            return [ALL]
+        if size > self.offset:
+            lines, self.offset = self._read_lines(self.path, self.offset)
+            messages.extend(lines)
+        return messages
+
+class SQLiteDataVersionBus:
+    """
+    data_version changes when another connection committed to the database, which covers every worker
+    but does not say what changed. Invalidations are therefore not published, only detected.
+    """
+
+    publishes = False
+
+    def __init__(self, database_url: str):
+        url = make_url(database_url)
+        if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+            raise RuntimeError("The sqlite invalidation bus needs a SQLite database file")
+        # Opened here so that commits from the moment the worker starts are seen; then used by the listener thread only
+        self.connection = sqlite3.connect(url.database, check_same_thread=False)
+        self.data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self, timeout: float) -> List:
+        _stop.wait(timeout)
+        data_version = self._read_data_version()
+        changed = data_version != self.data_version
+        self.data_version = data_version
+        return [ALL] if changed else []
+
+    def close(self):
+        self.connection.close()
+
+class RedisBus:
+    publishes = True
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis invalidation bus needs redis-py, install it with: pip install redis")
+        self.redis = redis
+        self.client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self.pubsub = None
+
+    def publish(self, message: str):
+        self.client.publish(REDIS_CHANNEL, message)
+
+    def poll(self, timeout: float) -> List:
+        try:
+            if self.pubsub is None:
+                self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                self.pubsub.subscribe(REDIS_CHANNEL)
+                reconnected = True
+            else:
+                reconnected = False
+            message = self.pubsub.get_message(timeout=timeout)
+        except self.redis.RedisError:
+            logger.exception("Lost the invalidation channel, reconnecting")
+            self.pubsub = None
+            _stop.wait(timeout)
+            return []
+        messages = [ALL] if reconnected else []
+        if message is not None:
+            data = message["data"]
+            messages.append(data.decode() if isinstance(data, bytes) else data)
+        return messages
+
+    def close(self):
+        if self.pubsub is not None:
+            self.pubsub.close()
+        self.client.close()
+
+BUSES = {
+    "file": lambda: FileBus(BUS_URL),
+    "sqlite": lambda: SQLiteDataVersionBus(BUS_URL or _database_url()),
+    "redis": lambda: RedisBus(BUS_URL),
+}
+
+def _database_url() -> str:
+    from ..db.database import SQLALCHEMY_DATABASE_URL
+    return SQLALCHEMY_DATABASE_URL
+
+def _listen():
+    while not _stop.is_set():
+        try:
+            messages = _bus.poll(POLL_INTERVAL)
+        except Exception:
+            logger.exception("Could not poll the invalidation bus")
+            _stop.wait(POLL_INTERVAL)
+            continue
+        for message in messages:
+            try:
+                _apply(message)
+            except Exception:
+                logger.exception("Could not apply the invalidation %r", message)
+
+def start():
+    """Connects this worker to the bus. Called once per worker process, by the app's lifespan."""
+    global _bus, _listener
+    if BUS == "local" or _listener is not None:
+        if not caching_enabled():
+            logger.warning("Caches are disabled: this may be one of several workers, and there is no invalidation bus. Set RAID_MANAGER_INVALIDATION_BUS, or WEB_CONCURRENCY=1 for a single worker")
+        return
+    if BUS not in BUSES:
+        raise RuntimeError(f"Unknown invalidation bus {BUS!r}, expected local, {', '.join(BUSES)}")
+    _bus = BUSES[BUS]()
+    _stop.clear()
+    _listener = threading.Thread(target=_listen, name="cache-invalidation", daemon=True)
+    _listener.start()
+
+def stop():
+    global _bus, _listener
+    if _listener is None:
+        return
+    _stop.set()
+    _listener.join(timeout=5)
+    if hasattr(_bus, "close"):
+        _bus.close()
+    _bus = _listener = None
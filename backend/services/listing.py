@@ -0,0 +1,105 @@
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import base64
+import binascii
+import hashlib
+import json
+
+from ..schemas.orm import from_orm
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+FIELDS_DESCRIPTION = "Comma-separated top-level fields to return, e.g. id,name"
+LEAN_DESCRIPTION = "Return ids instead of nested records, with each referenced record once next to the list"
+
+def encode_cursor(last_id: int) -> str:
+    # Opaque to clients, so the pagination key can change without breaking them
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        kind, _, value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().partition(":")
+        if kind == "id":
+            return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(fields: Optional[str], schema) -> Optional[List[str]]:
+    # "id,name" -> ["id", "name"]; None returns every field
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    available = getattr(schema, "model_fields", None) or schema.__fields__
+    unknown_names = [name for name in names if name not in available]
+    if unknown_names:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown_names)}. Available: {', '.join(available)}")
+    return names
+
+def get_page(db: Session, model, filters: Sequence = (), cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, options: Sequence = ()) -> Tuple[List[Any], Optional[str]]:
+    """
+    Keyset pagination on the primary key: rows after the cursor, in id order, and the cursor of the next page.
+    Reading one row more than the page tells whether there is a next page without a count query.
+    """
+    query = db.query(model).options(*options).filter(*filters)
+    after_id = decode_cursor(cursor)
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    rows = query.order_by(model.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def serialize(schema, rows: Iterable[Any], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    # Rows may be ORM objects or dicts; fields keeps only those top-level keys
+    records = [jsonable_encoder(row if isinstance(row, dict) else from_orm(schema, row)) for row in rows]
+    if fields is not None:
+        records = [{name: record.get(name) for name in fields} for record in records]
+    return records
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as for GET requests
+    return "*" in candidates or etag in [candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates]
+
+def get_data_version(db: Session, models: Sequence) -> Tuple[Optional[int], ...]:
+    """
+    The largest id and the row count of each table, in one query. Listed tables are only ever inserted
+    into, so a page of them can only change when one of the tables it reads gets a new row. The count
+    catches rows that commit after a larger id, which concurrent inserts can do with PostgreSQL.
+    """
+    columns = []
+    for model in models:
+        columns.append(select(func.max(model.id)).scalar_subquery())
+        columns.append(select(func.count(model.id)).scalar_subquery())
+    return tuple(db.query(*columns).one())
+
+def _page_etag(request: Request, data_version: Tuple[Optional[int], ...]) -> str:
+    key = json.dumps([request.url.path, sorted(request.query_params.multi_items()), data_version])
+    return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+async def etag_page(request: Request, db, models: Sequence, load_page: Callable, *args) -> Response:
+    """
+    JSON response of db.run_sync(load_page, *args) with an ETag of the request and of the data version of models,
+    which must be every table the page reads. The ETag is checked before the page is loaded, so a client sending
+    it back in If-None-Match gets an empty 304 for a single cheap query instead of the same page again.
+    """
+    def load(db: Session):
+        etag = _page_etag(request, get_data_version(db, models))
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return etag, None
+        return etag, load_page(db, *args)
+
+    etag, content = await db.run_sync(load)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if content is None:
+        return Response(status_code=304, headers=headers)
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,144 @@
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from datetime import datetime
+import csv
+import io
+import json
+
+from ..models.loot_record import LootRecord
+from ..models.player import Player
+from ..models.item import Item
+from ..models.raid_party import RaidParty
+
+# Rows read per query. Each page is read in its own short session, so a long export
+# never holds a database transaction open while the client is downloading
+EXPORT_PAGE_SIZE = 1000
+
+# Output is sent in blocks of about this size rather than row by row
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+EXPORT_COLUMNS = [
+    "id",
+    "distribution_date",
+    "raid_party_id",
+    "raid_party_name",
+    "player_id",
+    "character_nickname",
+    "item_id",
+    "item_name",
+    "distribution_method",
+]
+
+def _query_page(
+    db: Session,
+    raid_party_id: Optional[int],
+    player_id: Optional[int],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    after: Optional[tuple],
+    undated: bool,
+    page_size: int
+) -> List[Dict[str, Any]]:
+    # Flat rows from a single joined query, no relationship loads
+    query = db.query(
+        LootRecord.id,
+        LootRecord.distribution_date,
+        LootRecord.raid_party_id,
+        RaidParty.name,
+        LootRecord.player_id,
+        Player.character_nickname,
+        LootRecord.item_id,
+        Item.name,
+        LootRecord.distribution_method
+    ).outerjoin(RaidParty, RaidParty.id == LootRecord.raid_party_id) \
+        .outerjoin(Player, Player.id == LootRecord.player_id) \
+        .outerjoin(Item, Item.id == LootRecord.item_id)
+
+    if raid_party_id is not None:
+        query = query.filter(LootRecord.raid_party_id == raid_party_id)
+    if player_id is not None:
+        query = query.filter(LootRecord.player_id == player_id)
+
+    if undated:
+        # Records without a date come first, ordered by id only
+        query = query.filter(LootRecord.distribution_date.is_(None))
+        if after is not None:
+            query = query.filter(LootRecord.id > after[1])
+        query = query.order_by(LootRecord.id)
+    else:
+        query = query.filter(LootRecord.distribution_date.isnot(None))
+        if start_date is not None:
+            query = query.filter(LootRecord.distribution_date >= start_date)
+        if end_date is not None:
+            query = query.filter(LootRecord.distribution_date < end_date)
+        if after is not None:
+            # Keyset pagination: continue after the last (distribution_date, id) of the previous page
+            last_date, last_id = after
+            query = query.filter(or_(
+                LootRecord.distribution_date > last_date,
+                and_(LootRecord.distribution_date == last_date, LootRecord.id > last_id)
+            ))
+        query = query.order_by(LootRecord.distribution_date, LootRecord.id)
+
+    return [dict(zip(EXPORT_COLUMNS, row)) for row in query.limit(page_size).all()]
+
+def iter_loot_record_rows(
+    session_factory: Callable[[], Session],
+    raid_party_id: Optional[int] = None,
+    player_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    page_size: int = EXPORT_PAGE_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the loot records matching the filters as flat dicts, ordered by (distribution_date, id).
+    start_date is inclusive and end_date exclusive; records without a date are only exported without a date filter.
+    """
+    phases = [False]
+    if start_date is None and end_date is None:
+        phases.insert(0, True)
+
+    for undated in phases:
+        after = None
+        while True:
+            with session_factory() as db:
+                rows = _query_page(db, raid_party_id, player_id, start_date, end_date, after, undated, page_size)
+            yield from rows
+            if len(rows) < page_size:
+                break
+            after = (rows[-1]["distribution_date"], rows[-1]["id"])
+
+def _serialize(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"): # Enums
+        return value.value
+    return value
+
+def iter_ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    block = []
+    size = 0
+    for row in rows:
+        line = json.dumps({column: _serialize(value) for column, value in row.items()}, ensure_ascii=False) + "\n"
+        block.append(line)
+        size += len(line)
+        if size >= EXPORT_BLOCK_SIZE:
+            yield "".join(block)
+            block = []
+            size = 0
+    yield "".join(block)
+
+def iter_csv(rows: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    # The byte order mark lets spreadsheet programs detect UTF-8, for the Korean names
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(["" if row[column] is None else _serialize(row[column]) for column in EXPORT_COLUMNS])
+        if buffer.tell() >= EXPORT_BLOCK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
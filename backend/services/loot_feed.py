@@ -0,0 +1,184 @@
+"""
+Live feed of the loot of a raid party, for clients to follow instead of polling.
+
+Viewers subscribe to a raid party. When loot records are committed, their events are fanned out
+in memory to every subscriber of that worker, and to the other workers on the "loot_feed" channel of the
+invalidation bus, when it carries messages.
+Recommendations are computed once per event and worker, whatever the number of viewers.
+
+Events are small JSON objects with a type:
+- loot_record: the new record, with ids only
+- weekly_lock: the weekly lockout of a player after the record
+- recommendation: the recommended recipient of the item, now that it dropped
+- resync: too much changed to send deltas, or the viewer fell behind; clients reload
+"""
+import asyncio
+import contextvars
+import json
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..db.unit_of_work import after_commit
+from ..schemas.loot_record import LootRecordLean
+from ..schemas.orm import from_orm
+from . import invalidation
+
+# Events kept per subscriber; a viewer further behind gets a resync instead
+QUEUE_SIZE = 100
+# A larger batch, e.g. a bulk import, is announced as a resync
+MAX_DELTA_RECORDS = 50
+# Comment lines keep idle connections from being closed by proxies
+HEARTBEAT_SECONDS = 15
+
+RESYNC = {"type": "resync"}
+CHANNEL = "loot_feed"
+
+class Subscription:
+    def __init__(self, raid_party_id: int):
+        self.raid_party_id = raid_party_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(QUEUE_SIZE)
+
+    def put(self, event: Dict[str, Any]):
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+_subscriptions: Dict[int, Set[Subscription]] = {}
+_lock = threading.Lock()
+
+def subscribe(raid_party_id: int) -> Subscription:
+    # Called on the event loop, which delivers the events
+    subscription = Subscription(raid_party_id)
+    with _lock:
+        _subscriptions.setdefault(raid_party_id, set()).add(subscription)
+    return subscription
+
+def unsubscribe(subscription: Subscription):
+    with _lock:
+        subscriptions = _subscriptions.get(subscription.raid_party_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del _subscriptions[subscription.raid_party_id]
+
+def _get_subscriptions(raid_party_id: int) -> List[Subscription]:
+    with _lock:
+        return list(_subscriptions.get(raid_party_id, ()))
+
+def get_subscriber_count() -> int:
+    with _lock:
+        return sum(len(subscriptions) for subscriptions in _subscriptions.values())
+
+def _deliver(raid_party_id: int, events: List[Dict[str, Any]]):
+    # Thread-safe: after_commit callbacks run in the threadpool in sync mode
+    for subscription in _get_subscriptions(raid_party_id):
+        for event in events:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+def record_loot(db: Session, db_loot_records: List, lockouts: Dict[int, Any]):
+    """
+    Queues the events of flushed loot records and of the lockouts they updated,
+    to be published once the transaction is committed.
+    """
+    # Without a bus to carry them, only the viewers of this worker would receive them
+    broadcast = invalidation.can_broadcast()
+    by_raid_party: Dict[int, List] = {}
+    for db_loot_record in db_loot_records:
+        if broadcast or _get_subscriptions(db_loot_record.raid_party_id):
+            by_raid_party.setdefault(db_loot_record.raid_party_id, []).append(db_loot_record)
+
+    for raid_party_id, party_loot_records in by_raid_party.items():
+        if len(party_loot_records) > MAX_DELTA_RECORDS:
+            after_commit(db, publish, raid_party_id, [RESYNC], [])
+            continue
+        events = [
+            {"type": "loot_record", "loot_record": jsonable_encoder(from_orm(LootRecordLean, db_loot_record))}
+            for db_loot_record in party_loot_records
+        ]
+        player_ids = {db_loot_record.player_id for db_loot_record in party_loot_records}
+        events.extend(
+            {
+                "type": "weekly_lock",
+                "player_id": lockout.player_id,
+                "week_number": lockout.week_number,
+                "items_received": lockout.items_received,
+            }
+            for player_id, lockout in lockouts.items()
+            if player_id in player_ids
+        )
+        item_ids = sorted({db_loot_record.item_id for db_loot_record in party_loot_records})
+        after_commit(db, publish, raid_party_id, events, item_ids)
+
+def publish(raid_party_id: int, events: List[Dict[str, Any]], item_ids: Iterable[int]):
+    _deliver(raid_party_id, events)
+    _refresh_recommendations(raid_party_id, item_ids)
+    invalidation.broadcast(CHANNEL, {"raid_party_id": raid_party_id, "events": events, "item_ids": list(item_ids)})
+
+def _receive(message: Optional[Dict[str, Any]]):
+    # Loot recorded by another worker
+    if message is None:
+        # Events may have been lost, so every viewer reloads
+        with _lock:
+            raid_party_ids = list(_subscriptions)
+        for raid_party_id in raid_party_ids:
+            _deliver(raid_party_id, [RESYNC])
+        return
+    _deliver(message["raid_party_id"], message["events"])
+    _refresh_recommendations(message["raid_party_id"], message["item_ids"])
+
+invalidation.listen(CHANNEL, _receive)
+
+def _refresh_recommendations(raid_party_id: int, item_ids: Iterable[int]):
+    subscriptions = _get_subscriptions(raid_party_id)
+    item_ids = list(item_ids)
+    if not subscriptions or not item_ids:
+        return
+    loop = subscriptions[0].loop
+    # In a fresh context, so that the queries are not counted against the request that recorded the loot
+    loop.call_soon_threadsafe(
+        lambda: loop.create_task(_send_recommendations(raid_party_id, item_ids)),
+        context=contextvars.Context()
+    )
+
+async def _send_recommendations(raid_party_id: int, item_ids: List[int]):
+    recipients = await run_in_threadpool(_load_recommendations, raid_party_id, item_ids)
+    _deliver(raid_party_id, [
+        {"type": "recommendation", "item_id": item_id, "recipient": jsonable_encoder(recipient)}
+        for item_id, recipient in recipients.items()
+    ])
+
+def _load_recommendations(raid_party_id: int, item_ids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    from ..db.database import SessionLocal
+    from .distribution_algorithm import determine_item_recipient
+    with SessionLocal() as db:
+        return {item_id: determine_item_recipient(db, raid_party_id, item_id) for item_id in item_ids}
+
+async def next_event(subscription: Subscription, timeout: float = HEARTBEAT_SECONDS) -> Optional[Dict[str, Any]]:
+    # None after timeout seconds without an event
+    try:
+        return await asyncio.wait_for(subscription.queue.get(), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+async def iter_sse(raid_party_id: int) -> AsyncIterator[str]:
+    # Server-sent events, until the client disconnects. Subscribes only once the response is streamed,
+    # so that a response that is never sent leaves no subscription behind.
+    subscription = subscribe(raid_party_id)
+    try:
+        yield ": connected\n\n"
+        while True:
+            event = await next_event(subscription)
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, separators=(',', ':'))}\n\n"
+    finally:
+        unsubscribe(subscription)
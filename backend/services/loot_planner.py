@@ -0,0 +1,285 @@
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any
+from datetime import date, datetime, timedelta
+import threading
+import time
+
+from ..models.item import ItemSource
+from ..models.player import Player
+from ..crud import loot_record, raid_schedule
+from ..services import gear_calculation, invalidation
+from ..services.distribution_algorithm import load_distribution_state
+from ..services.assignment import solve_max_weight_assignment
+
+# Planning horizon when the raid party has no active schedule with an end date
+DEFAULT_HORIZON_WEEKS = 26
+DEFAULT_TIME_BUDGET_MS = 500
+MAX_TIME_BUDGET_MS = 10000
+
+# Only savage drops are handed out through loot distribution; other BiS needs are bought or crafted
+PLANNED_ITEM_SOURCES = {ItemSource.SAVAGE_RAID.value}
+
+# Loaded planning state and last plan per raid party, so that new loot records can be applied
+# without reloading everything from the database. A state is replaced rather than changed, apart from
+# its "plan", so plans are solved outside the lock, which only guards the dict and the plans.
+_plan_states: Dict[int, Dict[str, Any]] = {}
+_plan_states_lock = threading.Lock()
+
+def load_plan_state(db: Session, raid_party_id: int) -> Optional[Dict[str, Any]]:
+    # Needs decide which items to load, so they are read first
+    player_ids = [player_id for player_id, in db.query(Player.id).filter(Player.raid_party_id == raid_party_id).all()]
+    bis_needs = gear_calculation.calculate_bis_needs_for_players(db, player_ids)
+    planned_item_ids = {
+        needed_item['item_id']
+        for needed_items in bis_needs.values()
+        for needed_item in needed_items
+        if needed_item['item_source'] in PLANNED_ITEM_SOURCES
+    }
+
+    state = load_distribution_state(db, raid_party_id, sorted(planned_item_ids))
+    if state is None:
+        return None # Raid party not found
+
+    # Items a player already received in this raid party no longer count as needed
+    item_recipient_ids = loot_record.get_item_recipients_by_raid_party(db, raid_party_id, planned_item_ids)
+    remaining_needs = {}
+    for player in state["players"]:
+        remaining_needs[player.id] = {
+            needed_item['item_id']
+            for needed_item in bis_needs.get(player.id, [])
+            if needed_item['item_id'] in planned_item_ids
+            and player.id not in item_recipient_ids.get(needed_item['item_id'], set())
+        }
+
+    week_start = loot_record.get_start_of_week()
+    return {
+        "raid_party_id": raid_party_id,
+        "players": {player.id: player.character_nickname for player in state["players"]},
+        "item_names": {item_id: item["name"] for item_id, item in state["items"].items()},
+        "remaining_needs": remaining_needs,
+        "cycle_member_ids": state["cycle_member_ids"],
+        "weekly_recipient_ids": set(state["weekly_recipient_ids"]),
+        "priority_orders": state["priority_orders"],
+        "week_start": week_start,
+        "horizon_weeks": _get_horizon_weeks(db, raid_party_id, week_start.date()),
+        "plan": None,
+    }
+
+def _get_horizon_weeks(db: Session, raid_party_id: int, current_week_start: date) -> int:
+    schedules = [
+        schedule for schedule in raid_schedule.get_raid_schedules_by_raid_party(db, raid_party_id)
+        if schedule.is_active and schedule.end_date is not None and schedule.end_date >= current_week_start
+    ]
+    if not schedules:
+        return DEFAULT_HORIZON_WEEKS
+
+    end_date = max(schedule.end_date for schedule in schedules)
+    return (end_date - current_week_start).days // 7 + 1
+
+def _add_cycle_member(cycle_member_ids: Dict[int, set], item_id: int, player_id: int, party_player_ids: set):
+    # Same rule as crud.loot_record.update_eat_and_go_cycles: a complete cycle starts over
+    members = cycle_member_ids.setdefault(item_id, set())
+    members.add(player_id)
+    if members >= party_player_ids:
+        members.clear()
+
+def _get_weeks_left(remaining_needs: Dict[int, set], locked_player_ids: set):
+    # A player receives at most one item a week and is locked out of the current week after looting;
+    # an item drops once a week
+    player_weeks = {
+        player_id: len(needs) + (1 if needs and player_id in locked_player_ids else 0)
+        for player_id, needs in remaining_needs.items()
+    }
+    item_weeks: Dict[int, int] = {}
+    for needs in remaining_needs.values():
+        for item_id in needs:
+            item_weeks[item_id] = item_weeks.get(item_id, 0) + 1
+    return player_weeks, item_weeks
+
+def get_lower_bound_weeks(state: Dict[str, Any]) -> int:
+    """
+    Weeks no plan can beat: the most weeks a single player or item still needs.
+    """
+    player_weeks, item_weeks = _get_weeks_left(state["remaining_needs"], state["weekly_recipient_ids"])
+    return max(list(player_weeks.values()) + list(item_weeks.values()) + [0])
+
+def solve_plan(state: Dict[str, Any], time_budget_ms: int = DEFAULT_TIME_BUDGET_MS) -> Dict[str, Any]:
+    """
+    Plans the coming weeks from the planning state in as few weeks as possible. Every week, each item
+    that is still needed drops once and goes to at most one player, who receives at most one item a week.
+    Needs are edges between players and items, and a plan colors them with weeks. The fewest weeks are
+    the most needs of any player or item (König's theorem), reached by giving every week an assignment that
+    serves each player and item still needing that many weeks. The weekly max-weight assignment does so,
+    as serving them outweighs any priority; priorities only choose between such assignments.
+    Players locked out of the current week can add one week over lower_bound_weeks, and only when no
+    assignment of the current week serves every such player and item, in which case no plan can either.
+    weeks_until_bis is thus the minimum, and "optimal" is only false if eat-and-go blocked a needed item,
+    which happens only when the cycles disagree with the loot records.
+    Stops when every player is BiS, the horizon is reached or the time budget runs out, also within a week.
+    """
+    deadline = time.monotonic() + time_budget_ms / 1000
+    remaining_needs = {player_id: set(needs) for player_id, needs in state["remaining_needs"].items()}
+    cycle_member_ids = {item_id: set(members) for item_id, members in state["cycle_member_ids"].items()}
+    party_player_ids = set(state["players"])
+
+    weeks = []
+    truncated = False
+    blocked = False
+    for week in range(state["horizon_weeks"]):
+        if not any(remaining_needs.values()):
+            break
+        if time.monotonic() > deadline:
+            truncated = True
+            break
+
+        # Players who already looted this week are locked out for the current week only
+        locked_player_ids = state["weekly_recipient_ids"] if week == 0 else set()
+        player_ids = [player_id for player_id in state["players"] if player_id not in locked_player_ids]
+        item_ids = sorted({item_id for needs in remaining_needs.values() for item_id in needs})
+
+        # Players and items that need as many weeks as the whole plan must be served this week
+        player_weeks, item_weeks = _get_weeks_left(remaining_needs, locked_player_ids)
+        weeks_left = max(list(player_weeks.values()) + list(item_weeks.values()))
+
+        cells = []
+        for item_id in item_ids:
+            row = []
+            for player_id in player_ids:
+                if item_id not in remaining_needs[player_id]:
+                    row.append(None)
+                    continue
+                if not loot_record.is_eat_and_go_eligible(player_id, cycle_member_ids.get(item_id, set()), party_player_ids):
+                    blocked = True
+                    row.append(None)
+                    continue
+
+                priority_order = state["priority_orders"].get((player_id, item_id))
+                priority_score = 100 - priority_order if priority_order is not None else 0
+                served = (player_weeks[player_id] == weeks_left) + (item_weeks[item_id] == weeks_left)
+                row.append((served, priority_score))
+            cells.append(row)
+
+        # Serving one more of them must be worth more than any total of priorities
+        served_weight = sum(abs(cell[1]) for row in cells for cell in row if cell is not None) + 1
+        weights = [
+            [cell[0] * served_weight + cell[1] if cell is not None else None for cell in row]
+            for row in cells
+        ]
+
+        try:
+            week_assignment = solve_max_weight_assignment(weights, deadline)
+        except TimeoutError:
+            truncated = True
+            break
+
+        assignments = []
+        for item_id, player_index in zip(item_ids, week_assignment):
+            if player_index is None:
+                continue
+            player_id = player_ids[player_index]
+            remaining_needs[player_id].discard(item_id)
+            _add_cycle_member(cycle_member_ids, item_id, player_id, party_player_ids)
+            assignments.append({
+                "item_id": item_id,
+                "item_name": state["item_names"].get(item_id),
+                "player_id": player_id,
+                "character_nickname": state["players"][player_id],
+            })
+
+        weeks.append({
+            "week": week + 1,
+            "week_start": state["week_start"] + timedelta(weeks=week),
+            "assignments": assignments,
+        })
+
+    complete = not any(remaining_needs.values())
+    return {
+        "raid_party_id": state["raid_party_id"],
+        "horizon_weeks": state["horizon_weeks"],
+        "weeks_until_bis": len(weeks) if complete else None,
+        "lower_bound_weeks": get_lower_bound_weeks(state),
+        "complete": complete,
+        "optimal": complete and not blocked,
+        "truncated": truncated,
+        "weeks": weeks,
+        "remaining_needs": {
+            player_id: sorted(needs) for player_id, needs in remaining_needs.items() if needs
+        },
+    }
+
+def get_loot_plan(db: Session, raid_party_id: int, time_budget_ms: int = DEFAULT_TIME_BUDGET_MS) -> Optional[Dict[str, Any]]:
+    if not invalidation.caching_enabled():
+        state = load_plan_state(db, raid_party_id)
+        return solve_plan(state, time_budget_ms) if state is not None else None
+
+    with _plan_states_lock:
+        state = _plan_states.get(raid_party_id)
+        plan = state["plan"] if state is not None else None
+
+    # A cached state is only valid for the week it was loaded in, since weekly locks reset on Tuesday
+    if state is None or state["week_start"] != loot_record.get_start_of_week():
+        state = load_plan_state(db, raid_party_id)
+        if state is None:
+            return None # Raid party not found
+        plan = None
+        with _plan_states_lock:
+            _plan_states[raid_party_id] = state
+
+    if plan is None or plan["truncated"]:
+        plan = solve_plan(state, time_budget_ms)
+        _store_plan(raid_party_id, state, plan)
+    return plan
+
+def _store_plan(raid_party_id: int, state: Dict[str, Any], plan: Dict[str, Any]):
+    # Unless the state was replaced or dropped while the plan was solved
+    with _plan_states_lock:
+        if _plan_states.get(raid_party_id) is state:
+            state["plan"] = plan
+
+def apply_loot_record(raid_party_id: int, player_id: int, item_id: int, distribution_date: Optional[datetime] = None):
+    """
+    Updates the cached planning state of a raid party with a new loot record, so that the next plan
+    is solved from memory. Solving is left to get_loot_plan, as this runs on the loot write path.
+    Does nothing if no plan was requested for the raid party yet. Other workers drop their plan instead.
+    """
+    invalidation.publish("loot_plans", raid_party_id)
+    with _plan_states_lock:
+        state = _plan_states.get(raid_party_id)
+        if state is None:
+            return
+        if player_id not in state["players"]:
+            # The roster changed since the state was loaded
+            del _plan_states[raid_party_id]
+            return
+
+        # A new state with the record and without a plan, as plans of the old one may still be solving
+        remaining_needs = dict(state["remaining_needs"])
+        remaining_needs[player_id] = remaining_needs[player_id] - {item_id}
+        cycle_member_ids = dict(state["cycle_member_ids"])
+        cycle_member_ids[item_id] = set(cycle_member_ids.get(item_id, set()))
+        _add_cycle_member(cycle_member_ids, item_id, player_id, set(state["players"]))
+        weekly_recipient_ids = state["weekly_recipient_ids"]
+        if distribution_date is None or distribution_date >= state["week_start"]:
+            weekly_recipient_ids = weekly_recipient_ids | {player_id}
+        state = dict(
+            state,
+            remaining_needs=remaining_needs,
+            cycle_member_ids=cycle_member_ids,
+            weekly_recipient_ids=weekly_recipient_ids,
+            plan=None
+        )
+        _plan_states[raid_party_id] = state
+
+def invalidate_plan(raid_party_id: Optional[int] = None):
+    # Needed when gear sets, priorities or the roster change; None drops the plans of every party
+    _drop_plan(raid_party_id)
+    invalidation.publish("loot_plans", raid_party_id)
+
+def _drop_plan(raid_party_id: Optional[int] = None):
+    with _plan_states_lock:
+        if raid_party_id is None:
+            _plan_states.clear()
+        else:
+            _plan_states.pop(raid_party_id, None)
+
+invalidation.register("loot_plans", _drop_plan)
@@ -0,0 +1,192 @@
+"""
+Process-local metrics in the Prometheus text exposition format, served by GET /metrics.
+Only counters, gauges and histograms with fixed label names are supported, which is all the app needs.
+"""
+import bisect
+import math
+import threading
+import weakref
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from . import invalidation
+from .cache import get_cache_stats
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+_metrics: List["Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, list] = {} # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(entry[0]), entry[1], entry[2])) for key, entry in self._values.items())
+        lines = []
+        for key, (bucket_counts, total, count) in values:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (math.inf,), bucket_counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _format_value(float(upper_bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(float(total))}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+class CallbackMetric(Metric):
+    """A gauge or counter whose samples are read when /metrics is scraped, as (label values, value) pairs."""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], collect: Callable[[], Iterable[Tuple[Tuple, float]]], type: str = "gauge"):
+        super().__init__(name, documentation, labels)
+        self.type = type
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in self.collect()]
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+HTTP_REQUESTS = Counter("raid_manager_http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram("raid_manager_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+HTTP_REQUEST_QUERIES = Histogram("raid_manager_http_request_db_queries", "SQL statements executed per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS)
+HTTP_REQUEST_DB_DURATION = Histogram("raid_manager_http_request_db_duration_seconds", "Time spent executing SQL statements per HTTP request.", ("method", "route"))
+
+DB_POOL_CHECKOUT_WAIT = Histogram("raid_manager_db_pool_checkout_wait_seconds", "Time spent waiting for a connection from the pool.", (), POOL_WAIT_BUCKETS)
+
+# Queue pools of the app's engines, registered by instrumentation.TimedQueuePool
+_pools = weakref.WeakSet()
+
+def register_pool(pool):
+    _pools.add(pool)
+
+CallbackMetric("raid_manager_db_pool_checked_out_connections", "Connections currently in use.", (), lambda: [((), sum(pool.checkedout() for pool in list(_pools)))])
+CallbackMetric("raid_manager_db_pool_idle_connections", "Open connections waiting in the pool.", (), lambda: [((), sum(pool.checkedin() for pool in list(_pools)))])
+
+# Phases of this process' startup, set by main.create_app and its lifespan
+_startup_seconds: Dict[str, float] = {}
+
+def record_startup(phase: str, seconds: float):
+    _startup_seconds[phase] = seconds
+
+CallbackMetric(
+    "raid_manager_startup_seconds",
+    "Time this process spent starting, by phase: import, create_app or lifespan.",
+    ("phase",),
+    lambda: [((phase,), seconds) for phase, seconds in list(_startup_seconds.items())]
+)
+
+DISTRIBUTION_CANDIDATES = Counter(
+    "raid_manager_distribution_candidates_total",
+    "Players of the raid party for each item the distribution rules were asked to assign, by outcome: eligible, weekly_lockout or eat_and_go.",
+    ("outcome",)
+)
+DISTRIBUTION_DECISIONS = Counter(
+    "raid_manager_distribution_decisions_total",
+    "Items the distribution rules were asked to assign, by outcome: assigned or no_recipient.",
+    ("outcome",)
+)
+
+def _cache_samples(field: str):
+    return lambda: [((stats["name"],), stats[field]) for stats in get_cache_stats()]
+
+CallbackMetric("raid_manager_cache_hits_total", "In-process cache hits.", ("cache",), _cache_samples("hits"), type="counter")
+CallbackMetric("raid_manager_cache_misses_total", "In-process cache misses.", ("cache",), _cache_samples("misses"), type="counter")
+CallbackMetric("raid_manager_cache_entries", "Entries held by in-process caches.", ("cache",), _cache_samples("size"))
+CallbackMetric(
+    "raid_manager_cache_hit_ratio",
+    "Share of in-process cache lookups served from memory since start.",
+    ("cache",),
+    lambda: [((stats["name"],), stats["hits"] / (stats["hits"] + stats["misses"])) for stats in get_cache_stats() if stats["hits"] + stats["misses"]]
+)
+CallbackMetric(
+    "raid_manager_cache_invalidations_total",
+    "Cache invalidations exchanged with other workers, by direction: published, received or full (every cache dropped).",
+    ("direction",),
+    lambda: [((direction,), count) for direction, count in invalidation.get_stats().items()],
+    type="counter"
+)
+
+CallbackMetric(
+    "raid_manager_bus_messages_total",
+    "Messages other than invalidations exchanged with other workers, by channel and direction: sent or received.",
+    ("channel", "direction"),
+    lambda: list(invalidation.get_channel_stats().items()),
+    type="counter"
+)
+
+def _loot_feed_subscribers():
+    # Imported when scraped, as the feed depends on the models, which depend on the database setup that imports this module
+    from .loot_feed import get_subscriber_count
+    return [((), get_subscriber_count())]
+
+CallbackMetric("raid_manager_loot_feed_subscribers", "Clients following a loot feed on this worker.", (), _loot_feed_subscribers)
@@ -0,0 +1,83 @@
+"""
+Cache of the ranked candidates of the distribution rules, per (raid_party_id, item_id, week_number).
+
+A ranking only changes when loot is recorded for the raid party, or when its priorities, gear sets
+or roster change, so those writes drop the rankings they affect and every other lookup is a memory hit.
+Weekly lockouts end at the weekly reset, which is why the week is part of the key; right after each reset,
+every worker ranks the chest items of the raid parties again, once, ahead of raid night. Until the first reset
+of a worker, the first lookup of a chest item ranks every chest item of its raid party at once.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from . import invalidation
+from .cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("RAID_MANAGER_RECOMMENDATION_CACHE_SIZE", "16384"))
+WARMUP = os.getenv("RAID_MANAGER_RECOMMENDATION_WARMUP", "1").lower() not in ("0", "false", "no")
+# Leaves the weekly reset time to pass before ranking for the new week
+RESET_DELAY_SECONDS = 1
+
+# Full candidate lists as plain dicts, best first; filled by distribution_algorithm.get_ranked_candidates
+recommendation_cache = VersionedCache("recommendations", maxsize=CACHE_SIZE)
+
+_warmer: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+def invalidate_raid_party(raid_party_id: Optional[int] = None):
+    # Loot, gear sets and the roster affect every item of the raid party; None drops every raid party
+    if raid_party_id is None:
+        recommendation_cache.invalidate()
+    else:
+        recommendation_cache.invalidate_prefix((raid_party_id,))
+
+def invalidate_item(raid_party_id: int, item_id: int):
+    # A priority only affects the ranking of its item
+    recommendation_cache.invalidate_prefix((raid_party_id, item_id))
+
+def warm() -> int:
+    """Ranks the chest items of the current week, for as many raid parties as the cache holds."""
+    if not invalidation.caching_enabled():
+        return 0
+    from ..db.database import SessionLocal
+    from .distribution_algorithm import warm_recommendations
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        count = warm_recommendations(db, recommendation_cache.maxsize)
+    logger.info("Ranked candidates for %d raid drops in %.0f ms", count, (time.perf_counter() - started) * 1000)
+    return count
+
+def _warm_after_resets():
+    from ..crud.loot_record import get_start_of_week
+    while True:
+        next_reset = get_start_of_week() + timedelta(weeks=1)
+        if _stop.wait((next_reset - datetime.utcnow()).total_seconds() + RESET_DELAY_SECONDS):
+            return
+        try:
+            warm()
+        except Exception:
+            logger.exception("Could not warm the recommendation cache")
+
+def start():
+    """Warms the cache after every weekly reset. Called once per worker process, by the app's lifespan."""
+    global _warmer
+    if not WARMUP or _warmer is not None:
+        return
+    _stop.clear()
+    _warmer = threading.Thread(target=_warm_after_resets, name="recommendation-warmup", daemon=True)
+    _warmer.start()
+
+def stop():
+    global _warmer
+    if _warmer is None:
+        return
+    _stop.set()
+    _warmer.join(timeout=5)
+    _warmer = None
@@ -0,0 +1,67 @@
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, Iterable, List
+
+from ..models.item import Item
+from ..models.job import Job
+from ..models.raid_party import RaidParty
+from ..services.cache import VersionedCache
+
+# Items, jobs and raid parties change a few times per patch, so lookups are served from memory.
+# Values are plain column snapshots, never ORM objects, so they can be shared between sessions.
+# Each cache is cleared as a whole by the create path of its entity.
+item_cache = VersionedCache("items", maxsize=4096)
+job_cache = VersionedCache("jobs", maxsize=256)
+raid_party_cache = VersionedCache("raid_parties", maxsize=1024)
+
+def _snapshot(instance) -> Optional[Dict[str, Any]]:
+    if instance is None:
+        return None
+    return {column.name: getattr(instance, column.name) for column in instance.__table__.columns}
+
+def get_item(db: Session, item_id: int) -> Optional[Dict[str, Any]]:
+    return get_items(db, [item_id])[item_id]
+
+def get_items(db: Session, item_ids: Iterable[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    def load(keys: List):
+        items = {item.id: item for item in db.query(Item).filter(Item.id.in_([item_id for _, item_id in keys])).all()}
+        return {key: _snapshot(items.get(key[1])) for key in keys}
+
+    values = item_cache.get_many([("id", item_id) for item_id in item_ids], load)
+    return {item_id: value for (_, item_id), value in values.items()}
+
+def get_item_by_name(db: Session, name: str) -> Optional[Dict[str, Any]]:
+    return item_cache.get(("name", name), lambda: _snapshot(db.query(Item).filter(Item.name == name).first()))
+
+def get_jobs(db: Session, job_ids: Iterable[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    def load(keys: List):
+        jobs = {job.id: job for job in db.query(Job).filter(Job.id.in_([job_id for _, job_id in keys])).all()}
+        return {key: _snapshot(jobs.get(key[1])) for key in keys}
+
+    values = job_cache.get_many([("id", job_id) for job_id in job_ids], load)
+    return {job_id: value for (_, job_id), value in values.items()}
+
+def get_job_by_name(db: Session, name: str) -> Optional[Dict[str, Any]]:
+    return job_cache.get(("name", name), lambda: _snapshot(db.query(Job).filter(Job.name == name).first()))
+
+def get_raid_party(db: Session, raid_party_id: int) -> Optional[Dict[str, Any]]:
+    return raid_party_cache.get(("id", raid_party_id), lambda: _snapshot(db.query(RaidParty).filter(RaidParty.id == raid_party_id).first()))
+
+def get_raid_parties(db: Session, raid_party_ids: Iterable[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+    def load(keys: List):
+        raid_parties = {raid_party.id: raid_party for raid_party in db.query(RaidParty).filter(RaidParty.id.in_([raid_party_id for _, raid_party_id in keys])).all()}
+        return {key: _snapshot(raid_parties.get(key[1])) for key in keys}
+
+    values = raid_party_cache.get_many([("id", raid_party_id) for raid_party_id in raid_party_ids], load)
+    return {raid_party_id: value for (_, raid_party_id), value in values.items()}
+
+def get_raid_party_by_name(db: Session, name: str) -> Optional[Dict[str, Any]]:
+    return raid_party_cache.get(("name", name), lambda: _snapshot(db.query(RaidParty).filter(RaidParty.name == name).first()))
+
+def invalidate_items():
+    item_cache.invalidate()
+
+def invalidate_jobs():
+    job_cache.invalidate()
+
+def invalidate_raid_parties():
+    raid_party_cache.invalidate()
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+from ..db import instrumentation
+from . import metrics as prometheus
+
+# Adds the statement count and database time of each request as X-DB-* response headers
+DEBUG_HEADERS_ENABLED = os.getenv("RAID_MANAGER_DEBUG", "0").lower() in ("1", "true", "yes")
+# Slowest statements kept across all requests
+SLOWEST_STATEMENTS = 20
+
+class RouteMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+        self.total_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "queries": self.queries,
+            "queries_per_request": round(self.queries / self.requests, 2),
+            "max_queries": self.max_queries,
+            "db_ms_per_request": round(self.db_ms / self.requests, 3),
+            "ms_per_request": round(self.total_ms / self.requests, 3),
+        }
+
+_lock = threading.Lock()
+_routes: Dict[str, RouteMetrics] = {}
+_slowest: List[Dict[str, Any]] = []
+
+def record_request(method: str, route_path: str, status_code: int, stats: instrumentation.QueryStats, duration_ms: float):
+    prometheus.HTTP_REQUESTS.inc(method=method, route=route_path, status=status_code)
+    prometheus.HTTP_REQUEST_DURATION.observe(duration_ms / 1000, method=method, route=route_path)
+    prometheus.HTTP_REQUEST_QUERIES.observe(stats.count, method=method, route=route_path)
+    prometheus.HTTP_REQUEST_DB_DURATION.observe(stats.total_ms / 1000, method=method, route=route_path)
+
+    route = f"{method} {route_path}"
+    with _lock:
+        metrics = _routes.get(route)
+        if metrics is None:
+            metrics = _routes[route] = RouteMetrics()
+        metrics.requests += 1
+        metrics.errors += status_code >= 500
+        metrics.queries += stats.count
+        metrics.max_queries = max(metrics.max_queries, stats.count)
+        metrics.db_ms += stats.total_ms
+        metrics.total_ms += duration_ms
+
+        slowest = stats.slowest
+        if slowest and (len(_slowest) < SLOWEST_STATEMENTS or slowest[0]["duration_ms"] > _slowest[-1]["duration_ms"]):
+            _slowest.extend(dict(statement, route=route) for statement in slowest)
+            _slowest.sort(key=lambda statement: statement["duration_ms"], reverse=True)
+            del _slowest[SLOWEST_STATEMENTS:]
+
+def get_metrics() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "routes": {route: metrics.as_dict() for route, metrics in sorted(_routes.items())},
+            "slowest_statements": list(_slowest),
+        }
+
+def reset_metrics():
+    with _lock:
+        _routes.clear()
+        _slowest.clear()
+
+def _route_path(scope) -> str:
+    # The route template, so that /players/1 and /players/2 are aggregated together
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+class RequestMetricsMiddleware:
+    """
+    Tracks the latency and the statements executed by each HTTP request, including lazy loads inside services,
+    and adds them to the per-route aggregates of get_metrics and the Prometheus metrics.
+    Requests going over instrumentation.QUERY_BUDGET fail with QueryBudgetExceeded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if DEBUG_HEADERS_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(stats.count).encode()))
+                    headers.append((b"x-db-query-time-ms", f"{stats.total_ms:.3f}".encode()))
+                    slowest = stats.slowest
+                    if slowest:
+                        headers.append((b"x-db-slowest-query-ms", f"{slowest[0]['duration_ms']:.3f}".encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        with instrumentation.track_queries(instrumentation.QUERY_BUDGET or None) as stats:
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                record_request(scope["method"], _route_path(scope), status_code, stats, (time.perf_counter() - started) * 1000)
@@ -0,0 +1,34 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable
+
+from ..models.player import Player
+from ..services import reference_data
+
+def _present(values: Dict[int, Any]) -> Dict[int, Any]:
+    return {key: value for key, value in values.items() if value is not None}
+
+def sideload(
+    db: Session,
+    player_ids: Iterable[int] = (),
+    item_ids: Iterable[int] = (),
+    raid_party_ids: Iterable[int] = (),
+    job_ids: Iterable[int] = ()
+) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """
+    Loads the records a lean list refers to by id, each once, in the shape of schemas.Sideloaded.
+    Players take one query; jobs (including those of the players), items and raid parties come from the reference data caches.
+    """
+    players = {}
+    player_ids = set(player_ids)
+    if player_ids:
+        rows = db.query(Player.id, Player.user_id, Player.job_id, Player.raid_party_id, Player.character_nickname).filter(
+            Player.id.in_(player_ids)
+        ).all()
+        players = {row.id: row._asdict() for row in rows}
+
+    return {
+        "players": players,
+        "jobs": _present(reference_data.get_jobs(db, set(job_ids) | {player["job_id"] for player in players.values()})),
+        "items": _present(reference_data.get_items(db, set(item_ids))),
+        "raid_parties": _present(reference_data.get_raid_parties(db, set(raid_party_ids))),
+    }